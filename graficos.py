@@ -0,0 +1,206 @@
+"""
+Gráficos del sistema para la GUI (solo matplotlib, sin tkinter): los usa app.py y el
+benchmark de render (sonda_lambda.benchmark) sobre un canvas Agg fuera de pantalla.
+"""
+import time
+
+
+class PanelGraficos:
+    """ Los 7 gráficos del sistema: los artistas se crean una sola vez y cada frame
+    solo actualiza los datos de las curvas (set_data) y las redibuja con blitting """
+
+    VENTANA_S = 15.0  # Ancho de la ventana de tiempo visible (750 puntos a 20 ms)
+    AVANCE_S = 3.0  # Cuando los datos llegan al borde derecho, la ventana salta este tiempo
+
+    def __init__(self, fig, axes, setpoint_v, base_pulse_width_ms, scan_time_s):
+        self.fig = fig
+        self.axes = axes
+        self.canvas = fig.canvas
+        # Puntos necesarios para llenar la ventana completa (incluye el avance)
+        self.max_puntos = int(round((self.VENTANA_S + self.AVANCE_S) / scan_time_s)) + 1
+        self.setpoint_v = setpoint_v
+        self.necesita_redibujar = True  # Dibujo completo pendiente (límites, leyendas, layout)
+        self.ultimo_render_s = 0.0
+        self._fondo = None
+        self.perfil = None  # Perfil opcional: fases "graficos" (datos y límites) y "canvas" (dibujo)
+
+        for ax in self.axes:
+            ax.grid(True, alpha=0.3)
+
+        # Gráfico 1: Voltaje de Entrada (Setpoint/Referencia)
+        self.linea_setpoint, = self.axes[0].plot([], [], label="r(t) - Setpoint (Entrada de Referencia)",
+                                                 color="red", linewidth=2, linestyle="--", animated=True)
+        self.axes[0].set_ylabel("Voltaje (V)", fontweight='bold')
+        self.axes[0].set_ylim(0.0, 1.0)
+        self.axes[0].set_title("Sistema de Control de Inyección Electrónica - TP Teoría de Control",
+                               fontweight='bold', fontsize=11)
+
+        # Gráfico 2: Salida del Sistema (Lambda - Proceso de Combustión)
+        self.linea_lambda, = self.axes[1].plot([], [], label="y(t) - Lambda (λ) - Salida del Sistema G(s)",
+                                               color="purple", linewidth=1.8, animated=True)
+        self.axes[1].axhline(1.0, label="λ=1 (Estequiométrico)", color="black", linestyle="--", linewidth=1.5)
+        self.axes[1].axhspan(0.98, 1.02, color='green', alpha=0.15, label='Banda óptima')
+        self.axes[1].set_ylabel("Lambda (λ)", fontweight='bold')
+        self.axes[1].set_ylim(0.85, 1.15)
+
+        # Gráfico 3: Error (Setpoint - Realimentación)
+        self.linea_error, = self.axes[2].plot([], [], label="e(t) - Error del Sistema", color="darkred",
+                                              linewidth=1.5, animated=True)
+        self.axes[2].axhline(0, color="gray", linestyle=":", linewidth=1.5)
+        self.axes[2].set_ylabel("Error (V)", fontweight='bold')
+
+        # Gráfico 4: Voltaje del Elemento de Medición (Sonda Lambda)
+        self.linea_voltaje, = self.axes[3].plot([], [], label="f(t) - Voltaje Sonda Lambda H(s) (Realimentación)",
+                                                color="blue", linewidth=1.5, animated=True)
+        self.setpoint_axhline = self.axes[3].axhline(setpoint_v, label=f"Setpoint ({setpoint_v}V)",
+                                                     color="red", linestyle="--", linewidth=1.5)
+        self.setpoint_banda = self.axes[3].axhspan(setpoint_v - 0.015, setpoint_v + 0.015,
+                                                   color='red', alpha=0.1, label='Exactitud (±15mV)')
+        self.axes[3].set_ylabel("Voltaje (V)", fontweight='bold')
+        self.axes[3].set_ylim(0.0, 1.0)
+
+        # Gráfico 5: Salida del Controlador (Ancho de Pulso)
+        self.linea_pulso, = self.axes[4].plot([], [], label="u(t) - Ancho de Pulso (Salida Controlador PI)",
+                                              color="green", linewidth=1.5, animated=True)
+        self.axes[4].axhline(base_pulse_width_ms, label=f"Pulso Base ({base_pulse_width_ms}ms)",
+                             color="gray", linestyle=":", linewidth=1.5)
+        self.axes[4].set_ylabel("Pulso (ms)", fontweight='bold')
+
+        # Gráfico 6: Perturbación (Caudal de Aire Extra)
+        self.linea_perturbacion, = self.axes[5].plot([], [], label="d(t) - Perturbación (Escalón de Aire)",
+                                                     color="orange", linewidth=2, drawstyle='steps-post',
+                                                     animated=True)
+        self.axes[5].axhline(0, color="gray", linestyle=":", linewidth=1)
+        self.axes[5].set_ylabel("Pert. (g/s)", fontweight='bold')
+
+        # Gráfico 7: %O2 en Gases de Escape (Salida del Motor)
+        self.linea_o2, = self.axes[6].plot([], [], label="%O2 - Salida del Motor (Gases de Escape)",
+                                           color="brown", linewidth=1.8, animated=True)
+        self.axes[6].axhline(0.5, label="%O2 Estequiométrico (~0.5%)",
+                             color="black", linestyle="--", linewidth=1.5)
+        self.axes[6].axhspan(0.4, 0.6, color='green', alpha=0.15, label='Banda óptima')
+        self.axes[6].set_ylabel("%O2", fontweight='bold')
+        self.axes[6].set_xlabel("Tiempo (s)", fontweight='bold', fontsize=11)
+        self.axes[6].set_ylim(0.3, 0.8)
+
+        # Canal del historial -> curva
+        self.lineas = {
+            "setpoint": self.linea_setpoint,
+            "lambda": self.linea_lambda,
+            "error": self.linea_error,
+            "voltaje_sonda": self.linea_voltaje,
+            "pulse_width": self.linea_pulso,
+            "perturbacion_aplicada": self.linea_perturbacion,
+            "o2_percent": self.linea_o2,
+        }
+        # Ejes sin límites fijos: se reajustan a los datos visibles
+        self.ejes_autoescala = {"error": self.axes[2], "pulse_width": self.axes[4],
+                                "perturbacion_aplicada": self.axes[5]}
+
+        self.leyendas = [ax.legend(loc='upper right', fontsize=9) for ax in self.axes]
+        self._regiones_leyenda = []
+        self.axes[0].set_xlim(0.0, self.VENTANA_S)
+
+        # El layout solo se recalcula al cambiar el tamaño; el fondo se captura en cada dibujo completo
+        self.canvas.mpl_connect("resize_event", self._on_resize)
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+        self.fig.tight_layout()
+
+    def _on_resize(self, event):
+        self.fig.tight_layout()
+        self.necesita_redibujar = True
+
+    def _on_draw(self, event):
+        if self.canvas.is_saving():
+            # Al guardar la figura se dibujan también las curvas: el fondo se recaptura después
+            self.necesita_redibujar = True
+            return
+        # Fondo sin las curvas animadas, para restaurarlo en cada frame
+        # y las leyendas ya rasterizadas, para volver a pegarlas por encima de las curvas
+        self._fondo = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._regiones_leyenda = [self.canvas.copy_from_bbox(leyenda.get_window_extent())
+                                  for leyenda in self.leyendas]
+        self._dibujar_animados()
+
+    def _dibujar_animados(self):
+        for linea in self.lineas.values():
+            linea.axes.draw_artist(linea)
+        for region in self._regiones_leyenda:
+            self.canvas.restore_region(region)
+
+    def _set_setpoint(self, setpoint_v):
+        self.setpoint_v = setpoint_v
+        self.setpoint_axhline.set_ydata([setpoint_v, setpoint_v])
+        self.setpoint_axhline.set_label(f"Setpoint ({setpoint_v}V)")
+        self.setpoint_banda.remove()
+        self.setpoint_banda = self.axes[3].axhspan(setpoint_v - 0.015, setpoint_v + 0.015,
+                                                   color='red', alpha=0.1, label='Exactitud (±15mV)')
+        self.leyendas[3] = self.axes[3].legend(loc='upper right', fontsize=9)
+        self.necesita_redibujar = True
+
+    def _ajustar_limites(self, datos, redibujar):
+        """ Ajusta los límites de los ejes; devuelve True si cambió alguno """
+        tiempo = datos["time"]
+        if len(tiempo) == 0:
+            return False
+        x_min, x_max = self.axes[0].get_xlim()
+        cambio = False
+        if tiempo[-1] > x_max:
+            x_max = tiempo[-1] + self.AVANCE_S
+            self.axes[0].set_xlim(x_max - self.VENTANA_S, x_max)
+            redibujar = True
+            cambio = True
+
+        for canal, ax in self.ejes_autoescala.items():
+            y = datos[canal]
+            y_min, y_max = float(y.min()), float(y.max())
+            margen = max(0.1 * (y_max - y_min), 0.05)
+            lim_min, lim_max = ax.get_ylim()
+            # Se amplía si los datos salen del eje; se reajusta a los datos en cada dibujo completo
+            if redibujar or y_min < lim_min or y_max > lim_max:
+                ax.set_ylim(y_min - margen, y_max + margen)
+                cambio = True
+        return cambio
+
+    def mostrar_series(self, series, setpoint_v):
+        """ Modo replay: muestra series ya decimadas (canal -> (tiempo, valores)) con un dibujo completo.
+        Los límites en x los define la navegación (zoom/desplazamiento) """
+        if setpoint_v != self.setpoint_v:
+            self._set_setpoint(setpoint_v)
+        for canal, linea in self.lineas.items():
+            linea.set_data(*series[canal])
+        for canal, ax in self.ejes_autoescala.items():
+            y = series[canal][1]
+            if len(y):
+                y_min, y_max = float(y.min()), float(y.max())
+                margen = max(0.1 * (y_max - y_min), 0.05)
+                ax.set_ylim(y_min - margen, y_max + margen)
+        self.canvas.draw_idle()
+
+    def dibujar(self, datos, setpoint_v):
+        """ Actualiza las curvas con las últimas muestras (dict canal -> arreglo) y las dibuja """
+        inicio = time.perf_counter()
+        if setpoint_v != self.setpoint_v:
+            self._set_setpoint(setpoint_v)
+
+        tiempo = datos["time"]
+        for canal, linea in self.lineas.items():
+            linea.set_data(tiempo, datos[canal])
+
+        redibujar = self._ajustar_limites(datos, self.necesita_redibujar) or self.necesita_redibujar \
+            or self._fondo is None
+        if self.perfil is not None:
+            inicio_canvas = time.perf_counter()
+            self.perfil.registrar("graficos", int(1e9 * (inicio_canvas - inicio)))
+        if redibujar:
+            # Dibujo completo: ejes, leyendas y fondo (las curvas se agregan en _on_draw)
+            self.canvas.draw()
+            self.necesita_redibujar = False
+        else:
+            self.canvas.restore_region(self._fondo)
+            self._dibujar_animados()
+            self.canvas.blit(self.fig.bbox)
+        fin = time.perf_counter()
+        self.ultimo_render_s = fin - inicio
+        if self.perfil is not None:
+            self.perfil.registrar("canvas", int(1e9 * (fin - inicio_canvas)))
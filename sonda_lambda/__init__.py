@@ -0,0 +1,8 @@
+"""
+Núcleo del simulador de inyección electrónica con sonda lambda.
+
+Solo depende de NumPy: se puede importar y ejecutar sin tkinter ni matplotlib.
+"""
+from sonda_lambda.simulador import SondaLambdaSimulator, SondaLambdaBatchSimulator, semillas_por_instancia
+
+__all__ = ["SondaLambdaSimulator", "SondaLambdaBatchSimulator", "semillas_por_instancia"]
@@ -0,0 +1,199 @@
+"""
+Barrido de parámetros del controlador (Kp, Ki, setpoint, anti-windup, perturbaciones).
+
+Cada combinación de la grilla es un punto. Los puntos se agrupan en bloques que se
+simulan juntos con SondaLambdaBatchSimulator, y los bloques se reparten en un pool
+de procesos: el tamaño de bloque sale de la grilla (los puntos divididos por los
+procesos, con un tope), así también una grilla chica usa todos los núcleos. Cada punto
+tiene su propia semilla (derivada de la del barrido y de su índice), de modo que los
+resultados no dependen de cómo se agrupan. Los resultados se agregan a un archivo JSONL
+a medida que terminan, así un barrido interrumpido se puede reanudar sin repetir los
+puntos ya hechos.
+
+Con un checkpoint (ver sonda_lambda.checkpoint), todos los puntos arrancan desde ese
+estado ya asentado en lugar del estado inicial, sin repetir el calentamiento en cada punto.
+"""
+import csv
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from sonda_lambda import eventos
+from sonda_lambda.estadisticas import BANDA_LAMBDA
+from sonda_lambda.simulador import SondaLambdaBatchSimulator
+
+VENTANA_FILTRO_S = 0.5  # Media móvil para separar la respuesta al escalón del ciclo límite
+
+CANALES_METRICAS = ("lambda", "voltaje_sonda", "error", "pulse_width")
+
+METRICAS = (
+    "iae", "ise", "pct_en_banda", "sobrepico_pct", "tiempo_establecimiento_s",
+    "frecuencia_conmutacion_hz", "pct_saturado_min", "pct_saturado_max",
+)
+
+
+def puntos_grilla(grilla):
+    """ Producto cartesiano de la grilla (nombre -> lista de valores) como lista de dicts """
+    nombres = list(grilla)
+    valores = [np.atleast_1d(grilla[nombre]).tolist() for nombre in nombres]
+    return [dict(zip(nombres, combinacion)) for combinacion in itertools.product(*valores)]
+
+
+def calcular_metricas(tiempo, historial, lote):
+    """ Métricas de lazo cerrado de cada instancia del lote (arreglos de largo N) """
+    dt = lote.scan_time_s
+    duracion = tiempo[-1] - tiempo[0] + dt
+    error = historial["error"]
+    lambda_ = historial["lambda"]
+    voltaje = historial["voltaje_sonda"]
+    pulso = historial["pulse_width"]
+
+    metricas = {
+        "iae": np.abs(error).sum(axis=0) * dt,
+        "ise": (error ** 2).sum(axis=0) * dt,
+        "pct_en_banda": 100.0 * ((lambda_ >= BANDA_LAMBDA[0]) & (lambda_ <= BANDA_LAMBDA[1])).mean(axis=0),
+        "pct_saturado_min": 100.0 * (pulso <= lote.min_pulse_width_ms).mean(axis=0),
+        "pct_saturado_max": 100.0 * (pulso >= lote.max_pulse_width_ms).mean(axis=0),
+    }
+
+    # Conmutación rica/pobre del sensor: dos transiciones por período, con la misma banda de
+    # histéresis que el registro de eventos (el ruido EMI alrededor del setpoint no cuenta)
+    mezcla = eventos.mezcla_con_histeresis(voltaje, lote.setpoint_v)
+    transiciones = ((mezcla[1:] != mezcla[:-1]) & (mezcla[:-1] != 0)).sum(axis=0)
+    metricas["frecuencia_conmutacion_hz"] = transiciones / 2.0 / duracion
+
+    # Respuesta al escalón de perturbación, sobre lambda filtrado (media móvil)
+    w = max(1, int(round(VENTANA_FILTRO_S / dt)))
+    acumulado = np.cumsum(np.vstack([np.zeros((1, lote.n)), lambda_]), axis=0)
+    filtrado = (acumulado[w:] - acumulado[:-w]) / w
+    t_filtrado = tiempo[w - 1:]
+    sobrepico = np.full(lote.n, np.nan)
+    establecimiento = np.full(lote.n, np.nan)
+    for i in range(lote.n):
+        despues = t_filtrado >= lote.perturbacion_inicio[i]
+        if not despues.any():
+            continue
+        desvio = np.abs(filtrado[despues, i] - 1.0)
+        sobrepico[i] = 100.0 * desvio.max()
+        fuera = np.flatnonzero(desvio > BANDA_LAMBDA[1] - 1.0)
+        if len(fuera) == 0:
+            establecimiento[i] = 0.0
+        elif fuera[-1] < len(desvio) - 1:
+            establecimiento[i] = t_filtrado[despues][fuera[-1] + 1] - lote.perturbacion_inicio[i]
+        # Si sigue fuera de la banda al final de la corrida, no se estableció (nan)
+    metricas["sobrepico_pct"] = sobrepico
+    metricas["tiempo_establecimiento_s"] = establecimiento
+    return metricas
+
+
+def _ejecutar_bloque(indices, puntos, duracion_s, seed, fijos, checkpoint=None):
+    """ Simula un bloque de puntos en un lote vectorizado (se ejecuta en un proceso del pool) """
+    parametros = dict(fijos)
+    for nombre in puntos[0]:
+        parametros[nombre] = [punto[nombre] for punto in puntos]
+    # La semilla de cada punto depende solo de la semilla del barrido y del índice del punto
+    lote = SondaLambdaBatchSimulator(len(puntos), semillas=[np.random.SeedSequence([seed, i]) for i in indices],
+                                     **parametros)
+    if checkpoint is not None:
+        lote.restaurar(checkpoint)
+    n_steps = int(round(duracion_s / lote.scan_time_s))
+    historial = lote.run(n_steps, canales=CANALES_METRICAS)
+    metricas = calcular_metricas(historial["time"], historial, lote)
+    return indices, [{nombre: float(metricas[nombre][i]) for nombre in METRICAS} for i in range(len(puntos))]
+
+
+def _leer_resultados(archivo, configuracion):
+    """ Lee un archivo de barrido existente; verifica que corresponda a la misma configuración """
+    resultados = {}
+    with open(archivo, encoding="utf-8") as f:
+        encabezado = json.loads(f.readline() or "null")
+        if encabezado != {"barrido": configuracion}:
+            raise ValueError(f"{archivo} corresponde a otro barrido; use otro archivo de salida")
+        for linea in f:
+            try:
+                fila = json.loads(linea)
+            except ValueError:
+                break  # Última línea incompleta (barrido interrumpido mientras escribía)
+            resultados[fila["indice"]] = fila
+    return resultados
+
+
+def _repartir(pendientes, procesos, tamano_bloque):
+    """ Índices pendientes en bloques iguales, uno o más por proceso, de como mucho tamano_bloque puntos """
+    tamano = max(1, min(tamano_bloque, -(-len(pendientes) // procesos)))
+    return [pendientes[i:i + tamano] for i in range(0, len(pendientes), tamano)]
+
+
+def ejecutar_barrido(grilla, duracion_s=60.0, seed=0, procesos=None, archivo=None,
+                     tamano_bloque=64, checkpoint=None, **fijos):
+    """
+    Ejecuta todas las combinaciones de la grilla y devuelve una fila (dict) por punto,
+    con los parámetros y las métricas. grilla: nombre de parámetro -> lista de valores.
+    Con archivo, los resultados se guardan a medida que terminan y el barrido se reanuda.
+    Con checkpoint, cada punto arranca (en t=0) desde ese estado.
+    tamano_bloque es el tope de puntos por lote: los pendientes se reparten en bloques
+    iguales entre los procesos (por defecto, todos los núcleos).
+    """
+    puntos = puntos_grilla(grilla)
+    configuracion = {"grilla": {nombre: np.atleast_1d(valores).tolist() for nombre, valores in grilla.items()},
+                     "duracion_s": duracion_s, "seed": seed, "fijos": fijos}
+    if checkpoint is not None:
+        configuracion["checkpoint"] = checkpoint["estado"]
+
+    resultados = {}
+    salida = None
+    if archivo is not None:
+        if os.path.exists(archivo) and os.path.getsize(archivo) > 0:
+            resultados = _leer_resultados(archivo, configuracion)
+        # Las filas válidas (sin una posible línea incompleta) se escriben en un temporal que
+        # reemplaza al archivo de una vez: si se interrumpe, el original queda intacto
+        temporal = archivo + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"barrido": configuracion}) + "\n")
+            for indice in sorted(resultados):
+                f.write(json.dumps(resultados[indice]) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, archivo)
+        salida = open(archivo, "a", encoding="utf-8")
+
+    procesos = procesos or os.cpu_count() or 1
+    bloques = _repartir([i for i in range(len(puntos)) if i not in resultados], procesos, tamano_bloque)
+
+    def registrar(indices, metricas):
+        for i, valores in zip(indices, metricas):
+            fila = {"indice": i, **puntos[i], **valores}
+            resultados[i] = fila
+            if salida is not None:
+                salida.write(json.dumps(fila) + "\n")
+        if salida is not None:
+            salida.flush()
+
+    try:
+        if procesos == 1 or len(bloques) <= 1:
+            for indices in bloques:
+                registrar(*_ejecutar_bloque(indices, [puntos[i] for i in indices], duracion_s, seed, fijos,
+                                            checkpoint))
+        else:
+            with ProcessPoolExecutor(max_workers=procesos) as pool:
+                futuros = [pool.submit(_ejecutar_bloque, indices, [puntos[i] for i in indices], duracion_s, seed,
+                                       fijos, checkpoint)
+                           for indices in bloques]
+                for futuro in as_completed(futuros):
+                    registrar(*futuro.result())
+    finally:
+        if salida is not None:
+            salida.close()
+
+    return [resultados[i] for i in sorted(resultados)]
+
+
+def guardar_csv(filas, archivo):
+    """ Guarda la tabla de resultados como CSV """
+    with open(archivo, "w", newline="", encoding="utf-8") as f:
+        escritor = csv.DictWriter(f, fieldnames=list(filas[0]))
+        escritor.writeheader()
+        escritor.writerows(filas)
@@ -0,0 +1,277 @@
+"""
+Benchmarks de los caminos críticos (sin GUI, para Linux).
+
+Mide:
+    - scans/s de step(), de step_many() y del simulador por lotes,
+    - memoria (RSS y asignaciones) por hora simulada, con el historial ya lleno,
+    - tiempo por frame del dibujo de graficos.PanelGraficos sobre un canvas Agg fuera de pantalla,
+    - tiempo de importación y arranque del módulo app.
+
+Los resultados se guardan como JSON y se pueden comparar con una línea base guardada:
+cada medición indica si un valor mayor es mejor, y la comparación marca como regresión
+todo empeoramiento mayor que la tolerancia.
+
+Las mediciones de memoria y de arranque corren en un intérprete nuevo, para no
+arrastrar lo que ya cargaron las otras mediciones. La de render requiere matplotlib
+(no tkinter) y la de arranque, además, tkinter; el resto solo NumPy.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from sonda_lambda.simulador import BLOQUE_STEP_MANY, SondaLambdaBatchSimulator, SondaLambdaSimulator
+
+# Carpeta del proyecto (donde están app.py y graficos.py)
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GRUPOS = ("step", "lote", "memoria", "render", "arranque")
+
+TOLERANCIA = 0.10  # Empeoramiento relativo aceptado al comparar con la línea base
+# Los tiempos de arranque en un intérprete nuevo dependen del caché de disco y del sistema:
+# varían ~30% entre corridas aunque se tome el menor de varias repeticiones
+TOLERANCIA_ARRANQUE = 0.35
+
+
+def _medicion(valor, unidad, mayor_es_mejor, tolerancia=None):
+    """ tolerancia: empeoramiento aceptado para esta medición, si es más ruidosa que la general """
+    medicion = {"valor": float(valor), "unidad": unidad, "mayor_es_mejor": mayor_es_mejor}
+    if tolerancia is not None:
+        medicion["tolerancia"] = tolerancia
+    return medicion
+
+
+def _mejor_tiempo(funcion, repeticiones):
+    """ Menor tiempo (s) de varias ejecuciones de funcion() """
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def _rss_bytes():
+    """ Memoria residente actual del proceso (Linux, /proc/self/statm) """
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def bench_step(segundos=300.0, repeticiones=5):
+    """ scans/s de step() y de step_many() sobre el mismo tiempo simulado """
+    n = int(round(segundos / (SondaLambdaSimulator.SCAN_TIME_MS / 1000.0)))
+
+    def con_step():
+        sim = SondaLambdaSimulator(seed=0)
+        for _ in range(n):
+            sim.step()
+
+    def con_step_many():
+        sim = SondaLambdaSimulator(seed=0)
+        for hecho in range(0, n, BLOQUE_STEP_MANY):
+            sim.step_many(min(BLOQUE_STEP_MANY, n - hecho))
+
+    return {
+        "step_scans_s": _medicion(n / _mejor_tiempo(con_step, repeticiones), "scans/s", True),
+        "step_many_scans_s": _medicion(n / _mejor_tiempo(con_step_many, repeticiones), "scans/s", True),
+    }
+
+
+def bench_lote(instancias=256, segundos=30.0, repeticiones=3):
+    """ scans/s del simulador por lotes (instancias x pasos por segundo) """
+    n_steps = int(round(segundos / (SondaLambdaSimulator.SCAN_TIME_MS / 1000.0)))
+
+    def correr():
+        SondaLambdaBatchSimulator(instancias, seed=0).run(n_steps)
+
+    tiempo = _mejor_tiempo(correr, repeticiones)
+    return {
+        "lote_scans_s": _medicion(instancias * n_steps / tiempo, "scans/s", True),
+        "lote_pasos_s": _medicion(n_steps / tiempo, "pasos/s", True),
+    }
+
+
+def memoria_por_hora(horas=1.0):
+    """
+    Crecimiento de memoria por hora simulada con el historial circular ya lleno
+    (se simula una hora de calentamiento antes de medir). Conviene llamarla en un
+    proceso nuevo: ver bench_memoria().
+    """
+    sim = SondaLambdaSimulator(seed=0)
+    n = int(round(3600.0 * horas / sim.scan_time_s))
+
+    def correr():
+        for hecho in range(0, n, BLOQUE_STEP_MANY):
+            sim.step_many(min(BLOQUE_STEP_MANY, n - hecho))
+
+    correr()  # Calentamiento: el buffer circular queda lleno
+    rss_antes = _rss_bytes()
+    correr()
+    rss_despues = _rss_bytes()
+
+    tracemalloc.start()
+    asignado_antes = tracemalloc.get_traced_memory()[0]
+    correr()
+    asignado_despues, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    mb = 1024.0 * 1024.0
+    return {
+        "memoria_rss_mb_por_hora": _medicion((rss_despues - rss_antes) / mb / horas, "MB/h", False),
+        "memoria_asignada_mb_por_hora": _medicion((asignado_despues - asignado_antes) / mb / horas, "MB/h", False),
+        "memoria_pico_mb": _medicion((pico - asignado_antes) / mb, "MB", False),
+        "memoria_rss_mb": _medicion(rss_despues / mb, "MB", False),
+    }
+
+
+def _en_proceso_nuevo(codigo, entorno=None):
+    """ Ejecuta codigo en un intérprete nuevo (desde la raíz del proyecto) y devuelve el JSON que imprime """
+    env = dict(os.environ, **(entorno or {}))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [RAIZ, env.get("PYTHONPATH")]))
+    salida = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def bench_memoria(horas=1.0):
+    return _en_proceso_nuevo("import json; from sonda_lambda import benchmark; "
+                             f"print(json.dumps(benchmark.memoria_por_hora({horas!r})))")
+
+
+def bench_render(frames=300, repeticiones=5):
+    """
+    Tiempo por frame del dibujo de la GUI (graficos.PanelGraficos) sobre un canvas Agg:
+    cada frame avanza un scan y dibuja, como SondaLambdaGUI.update_plot.
+    """
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from graficos import PanelGraficos
+
+    sim = SondaLambdaSimulator(seed=0)
+    fig = Figure(figsize=(14, 12))
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(7, 1, sharex=True)
+    panel = PanelGraficos(fig, axes, sim.setpoint_v, sim.base_pulse_width_ms, sim.scan_time_s)
+
+    def dibujo_completo():
+        panel.necesita_redibujar = True
+        panel.dibujar(sim.historial.columnas(panel.max_puntos), sim.setpoint_v)
+
+    completo = _mejor_tiempo(dibujo_completo, repeticiones)
+
+    tiempos = np.empty(frames)
+    for i in range(frames):
+        inicio = time.perf_counter()
+        sim.step()
+        panel.dibujar(sim.historial.columnas(panel.max_puntos), sim.setpoint_v)
+        tiempos[i] = time.perf_counter() - inicio
+
+    return {
+        "render_frame_ms_p50": _medicion(1000.0 * np.percentile(tiempos, 50), "ms", False),
+        "render_frame_ms_p99": _medicion(1000.0 * np.percentile(tiempos, 99), "ms", False),
+        "render_frame_ms_media": _medicion(1000.0 * tiempos.mean(), "ms", False),
+        "render_completo_ms": _medicion(1000.0 * completo, "ms", False),
+    }
+
+
+_CODIGO_ARRANQUE = """
+import json, time
+inicio = time.perf_counter()
+import sonda_lambda
+nucleo = time.perf_counter() - inicio
+inicio = time.perf_counter()
+import matplotlib.pyplot as plt
+import app
+importacion = time.perf_counter() - inicio
+inicio = time.perf_counter()
+sim = app.SondaLambdaSimulator()
+fig, axes = plt.subplots(7, 1, figsize=(14, 12), sharex=True)
+panel = app.PanelGraficos(fig, axes, sim.setpoint_v, sim.base_pulse_width_ms, sim.scan_time_s)
+panel.dibujar(sim.historial.columnas(panel.max_puntos), sim.setpoint_v)
+arranque = time.perf_counter() - inicio
+print(json.dumps([nucleo, importacion, arranque]))
+"""
+
+
+def bench_arranque(repeticiones=7):
+    """
+    Importación del núcleo y de app, y arranque (simulador, figura y primer dibujo),
+    cada uno en un intérprete nuevo con el backend Agg; se toma el menor de las repeticiones.
+    """
+    tiempos = np.array([_en_proceso_nuevo(_CODIGO_ARRANQUE, {"MPLBACKEND": "Agg"})
+                        for _ in range(repeticiones)]).min(axis=0)
+    return {
+        "import_nucleo_ms": _medicion(1000.0 * tiempos[0], "ms", False, TOLERANCIA_ARRANQUE),
+        "import_app_ms": _medicion(1000.0 * tiempos[1], "ms", False, TOLERANCIA_ARRANQUE),
+        "arranque_app_ms": _medicion(1000.0 * tiempos[2], "ms", False, TOLERANCIA_ARRANQUE),
+    }
+
+
+BENCHMARKS = {
+    "step": bench_step,
+    "lote": bench_lote,
+    "memoria": bench_memoria,
+    "render": bench_render,
+    "arranque": bench_arranque,
+}
+
+
+def entorno():
+    """ Datos de la máquina y versiones, para saber si dos resultados son comparables """
+    try:
+        import matplotlib
+        version_matplotlib = matplotlib.__version__
+    except ImportError:
+        version_matplotlib = None
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "matplotlib": version_matplotlib,
+        "plataforma": platform.platform(),
+        "procesador": platform.processor() or platform.machine(),
+        "nucleos": os.cpu_count(),
+    }
+
+
+def ejecutar(grupos=GRUPOS, al_terminar=None):
+    """ Ejecuta los grupos pedidos y devuelve {"entorno": ..., "resultados": nombre -> medición} """
+    desconocidos = set(grupos) - set(GRUPOS)
+    if desconocidos:
+        raise ValueError(f"Benchmarks desconocidos: {', '.join(sorted(desconocidos))}")
+    resultados = {}
+    for grupo in grupos:
+        inicio = time.perf_counter()
+        resultados.update(BENCHMARKS[grupo]())
+        if al_terminar is not None:
+            al_terminar(grupo, time.perf_counter() - inicio)
+    return {"fecha": time.strftime("%Y-%m-%dT%H:%M:%S"), "entorno": entorno(), "resultados": resultados}
+
+
+def comparar(actual, base, tolerancia=TOLERANCIA):
+    """
+    Compara dos resultados de ejecutar(). Devuelve una fila por medición presente en ambos:
+    (nombre, valor base, valor actual, cambio relativo, regresión). El cambio es positivo
+    cuando la medición mejoró; es regresión si empeoró más que la tolerancia (o que la
+    tolerancia propia de la medición, si es mayor).
+    """
+    filas = []
+    for nombre, medicion in actual["resultados"].items():
+        if nombre not in base["resultados"]:
+            continue
+        valor_base = base["resultados"][nombre]["valor"]
+        valor = medicion["valor"]
+        # Las mediciones de memoria pueden ser ~0: se comparan contra al menos 1 unidad
+        referencia = max(abs(valor_base), 1.0) if medicion["unidad"] in ("MB/h", "MB") else abs(valor_base)
+        cambio = (valor - valor_base) / referencia if referencia else 0.0
+        if not medicion["mayor_es_mejor"]:
+            cambio = -cambio
+        limite = max(tolerancia, medicion.get("tolerancia", 0.0))
+        filas.append((nombre, valor_base, valor, cambio, cambio < -limite))
+    return filas
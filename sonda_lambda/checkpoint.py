@@ -0,0 +1,158 @@
+"""
+Checkpoints del estado dinámico del simulador, para arrancar corridas ya asentadas.
+
+Un checkpoint guarda lo necesario para continuar una corrida exactamente donde quedó:
+integrador, estados del sensor (ideal, filtrado y realimentación), pulso, tiempo,
+estado del generador aleatorio, el seguimiento del registro de eventos, los parámetros
+y, opcionalmente, las últimas muestras del historial. Es un dict con valores de Python
+(se puede pasar a otro proceso tal cual) y se serializa a bytes o a un archivo .npz.
+
+Uso típico: asentar el ciclo límite una vez y bifurcar muchas corridas desde ahí.
+
+    base = checkpoint.asentar(segundos=30, Kp=3, Ki=6)
+    sim = SondaLambdaSimulator()
+    sim.restaurar(base)               # Continúa igual que la corrida original
+    sim.restaurar(base, seed=7)       # Mismo estado, otro ruido
+    checkpoint.guardar(base, "asentado.npz")
+
+Las estadísticas en línea se reinician al restaurar (miden desde la bifurcación). El
+escenario de perturbaciones no se guarda, solo cuánto había avanzado: si el simulador ya
+tiene el escenario cargado al restaurar, sigue desde ese punto (un escenario cargado
+después arranca de cero). Si el checkpoint trae historial, reemplaza al historial del
+simulador (y a su archivo de telemetría).
+"""
+import io
+import json
+
+import numpy as np
+
+VERSION = 1
+
+# Variables de estado de SondaLambdaSimulator (y por instancia en SondaLambdaBatchSimulator)
+ESTADO = ("integral_term", "pulse_width_ms", "voltaje_sonda_ideal", "voltaje_sonda_filtrado",
+          "voltaje_sonda_realimentacion", "voltaje_anterior")
+# Último valor informado por el registro de eventos (para no repetir eventos al continuar)
+ESTADO_EVENTOS = ("_estado_evento", "_mezcla_evento", "_t_mezcla_evento", "_perturbacion_evento",
+                  "_saturacion_evento")
+
+
+def tomar(sim, historial=0):
+    """ Checkpoint de un SondaLambdaSimulator, con las últimas 'historial' muestras (0: ninguna) """
+    checkpoint = {
+        "version": VERSION,
+        "parametros": sim.parametros(),
+        "current_time": float(sim.current_time),
+        "estado": {nombre: float(getattr(sim, nombre)) for nombre in ESTADO},
+        "eventos": {nombre: getattr(sim, nombre) for nombre in ESTADO_EVENTOS},
+        "rng": sim.rng.bit_generator.state,
+        # Tiempo transcurrido del escenario (None: sin escenario)
+        "escenario_t": None if sim.escenario is None else float(sim.current_time - sim._escenario_t0),
+        "historial": None,
+    }
+    if historial:
+        checkpoint["historial"] = {canal: valores.copy()
+                                   for canal, valores in sim.historial.columnas(historial).items()}
+    return checkpoint
+
+
+def _verificar(checkpoint):
+    if checkpoint.get("version") != VERSION:
+        raise ValueError(f"Versión de checkpoint no soportada: {checkpoint.get('version')!r} (se espera {VERSION})")
+
+
+def _generador(estado):
+    """ Generador de NumPy con el estado guardado (del mismo tipo de bit generator) """
+    bit_generator = getattr(np.random, estado["bit_generator"])()
+    bit_generator.state = estado
+    return np.random.Generator(bit_generator)
+
+
+def restaurar(sim, checkpoint, parametros=True, seed=None, reiniciar_tiempo=False):
+    """
+    Lleva un SondaLambdaSimulator al estado del checkpoint.
+        parametros: aplicar también los parámetros guardados (False: conservar los de sim,
+            por ejemplo para bifurcar con otras ganancias),
+        seed: si se indica, un generador nuevo con esa semilla en lugar del estado guardado,
+        reiniciar_tiempo: arrancar en t=0 (la ventana de perturbación es en tiempo absoluto).
+    """
+    _verificar(checkpoint)
+    if parametros:
+        sim.configurar(**checkpoint["parametros"])
+    for nombre, valor in checkpoint["estado"].items():
+        setattr(sim, nombre, valor)
+    for nombre, valor in checkpoint["eventos"].items():
+        setattr(sim, nombre, valor)
+    sim.current_time = 0.0 if reiniciar_tiempo else checkpoint["current_time"]
+    sim.rng = np.random.default_rng(seed) if seed is not None else _generador(checkpoint["rng"])
+    historial = sim.historial
+    # El historial no puede retroceder en el tiempo: la cola del checkpoint (o un tiempo
+    # anterior a la última muestra) lo reemplaza en lugar de agregarse a continuación
+    cola = checkpoint["historial"] is not None and not reiniciar_tiempo
+    if len(historial) and (cola or sim.current_time <= historial.ultimos("time", 1)[0]):
+        historial.reiniciar()
+    if cola:
+        columnas = checkpoint["historial"]
+        historial.agregar_bloque(np.array([columnas[canal] for canal in historial.canales]))
+    if sim.escenario is not None:
+        # El escenario sigue donde estaba al tomar el checkpoint (o empieza ahora si no había)
+        sim._escenario_t0 = sim.current_time - (checkpoint.get("escenario_t") or 0.0)
+    if sim.estadisticas is not None:
+        sim.estadisticas.reiniciar()
+    return sim
+
+
+def restaurar_lote(lote, checkpoint, reiniciar_tiempo=True):
+    """
+    Copia el estado del checkpoint a todas las instancias de un SondaLambdaBatchSimulator.
+    El lote conserva sus parámetros y su generador (cada instancia sigue con su propio ruido);
+    por defecto arranca en t=0, así las perturbaciones quedan en el mismo instante relativo.
+    """
+    _verificar(checkpoint)
+    for nombre, valor in checkpoint["estado"].items():
+        setattr(lote, nombre, np.full(lote.n, valor))
+    lote.current_time = 0.0 if reiniciar_tiempo else checkpoint["current_time"]
+    return lote
+
+
+def asentar(segundos=30.0, seed=0, **parametros):
+    """ Simula 'segundos' desde el estado inicial (sin perturbación) y devuelve el checkpoint """
+    from sonda_lambda.simulador import SondaLambdaSimulator
+
+    parametros.setdefault("perturbacion_amplitud", 0.0)
+    sim = SondaLambdaSimulator(seed=seed, capacidad_historial=1, **parametros)
+    sim.estadisticas = None
+    sim.step_many(int(round(segundos / sim.scan_time_s)))
+    return tomar(sim)
+
+
+def a_bytes(checkpoint):
+    """ Serializa el checkpoint (formato .npz: el estado en JSON y el historial como arreglos) """
+    meta = {clave: valor for clave, valor in checkpoint.items() if clave != "historial"}
+    arreglos = {}
+    if checkpoint["historial"] is not None:
+        meta["canales"] = list(checkpoint["historial"])
+        arreglos = {f"historial_{canal}": valores for canal, valores in checkpoint["historial"].items()}
+    buffer = io.BytesIO()
+    # El JSON va como bytes UTF-8 (un arreglo de texto de NumPy ocupa 4 bytes por carácter)
+    np.savez(buffer, checkpoint=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8), **arreglos)
+    return buffer.getvalue()
+
+
+def desde_bytes(datos):
+    with np.load(io.BytesIO(datos)) as archivo:
+        checkpoint = json.loads(archivo["checkpoint"].tobytes().decode("utf-8"))
+        canales = checkpoint.pop("canales", None)
+        checkpoint["historial"] = None if canales is None else {
+            canal: archivo[f"historial_{canal}"] for canal in canales}
+    _verificar(checkpoint)
+    return checkpoint
+
+
+def guardar(checkpoint, ruta):
+    with open(ruta, "wb") as f:
+        f.write(a_bytes(checkpoint))
+
+
+def cargar(ruta):
+    with open(ruta, "rb") as f:
+        return desde_bytes(f.read())
@@ -0,0 +1,407 @@
+"""
+Interfaz de línea de comandos (sin GUI).
+
+Uso:
+    python -m sonda_lambda run --duration 3600 --kp 3 --ki 6 --out run.npz
+    python -m sonda_lambda run --duration 1800 --escenario urbano
+    python -m sonda_lambda run --duration 30 --checkpoint asentado.npz
+    python -m sonda_lambda sweep --kp 1 2 3 --ki 2 4 6 --out barrido.jsonl
+    python -m sonda_lambda bench --out bench.json --baseline base.json
+    python -m sonda_lambda realtime --duration 60 --entrada 127.0.0.1:9000 --salida 127.0.0.1:9001
+    python -m sonda_lambda serve --puerto 8765 --escenario urbano
+    python -m sonda_lambda linear --kp 0.5 1 2 3 --ki 2 6 10 --csv mapa.csv
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+import numpy as np
+
+from sonda_lambda import barrido, benchmark, checkpoint, escenarios, eventos, lineal, servidor, tiempo_real
+from sonda_lambda.perfil import Perfil
+from sonda_lambda.simulador import BLOQUE_STEP_MANY, CAPACIDAD_HISTORIAL, SondaLambdaSimulator
+
+# Opción de la CLI -> (parámetro del simulador, ayuda)
+OPCIONES_SIMULADOR = {
+    "--scan-time-ms": ("scan_time_ms", "Tiempo de scan de la ECU (ms)"),
+    "--setpoint": ("setpoint_v", "Setpoint del controlador (V)"),
+    "--kp": ("Kp", "Ganancia proporcional"),
+    "--ki": ("Ki", "Ganancia integral"),
+    "--integral-max": ("integral_max", "Límite anti-windup del término integral"),
+    "--base-pulse": ("base_pulse_width_ms", "Pulso base del inyector (ms)"),
+    "--min-pulse": ("min_pulse_width_ms", "Pulso mínimo del inyector (ms)"),
+    "--max-pulse": ("max_pulse_width_ms", "Pulso máximo del inyector (ms)"),
+    "--k-injector": ("K_injector", "Ganancia del inyector (g/s por ms)"),
+    "--caudal-aire": ("caudal_aire_base_gs", "Caudal de aire base (g/s)"),
+    "--stoich-ratio": ("stoich_ratio", "Relación estequiométrica aire/combustible"),
+    "--rpm": ("rpm", "RPM del motor"),
+    "--temperatura": ("temperatura_ambiente_c", "Temperatura ambiente (°C)"),
+    "--presion": ("presion_atmosferica_hpa", "Presión atmosférica (hPa)"),
+    "--amplitud": ("perturbacion_amplitud", "Amplitud de la perturbación de aire (g/s)"),
+    "--inicio": ("perturbacion_inicio", "Tiempo de inicio de la perturbación (s)"),
+    "--duracion-perturbacion": ("perturbacion_duracion", "Duración de la perturbación (s)"),
+    "--calidad-combustible": ("pert_comb_calidad", "Factor de calidad del combustible (1.0 = ideal)"),
+    "--ruido-emi": ("pert_ruido_emi_v", "Amplitud del ruido EMI (V)"),
+    "--tau-rica-pobre": ("tau_rica_pobre_s", "Constante de tiempo rica -> pobre (s)"),
+    "--tau-pobre-rica": ("tau_pobre_rica_s", "Constante de tiempo pobre -> rica (s)"),
+}
+
+
+def agregar_opciones_simulador(parser):
+    """ Agrega al parser una opción por cada parámetro del simulador """
+    grupo = parser.add_argument_group("parámetros del simulador")
+    grupo.add_argument("--config", help="Archivo JSON con parámetros del simulador (por nombre de atributo)")
+    for opcion, (nombre, ayuda) in OPCIONES_SIMULADOR.items():
+        grupo.add_argument(opcion, dest=nombre, type=float, default=None, help=ayuda)
+
+
+def parametros_desde_args(args):
+    """ Combina el archivo de configuración con las opciones (las opciones tienen prioridad) """
+    parametros = {}
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            parametros.update(json.load(f))
+    for nombre, _ in OPCIONES_SIMULADOR.values():
+        valor = getattr(args, nombre)
+        if valor is not None:
+            parametros[nombre] = valor
+    return parametros
+
+
+def cmd_run(args):
+    parametros = parametros_desde_args(args)
+    scan_time_s = parametros.get("scan_time_ms", SondaLambdaSimulator.SCAN_TIME_MS) / 1000.0
+    n_scans = int(round(args.duration / scan_time_s))
+    # Con --out el historial se dimensiona para retener la corrida completa en memoria;
+    # con --telemetria se escribe a disco por chunks y la memoria queda acotada
+    capacidad = max(n_scans, 1) if args.out else CAPACIDAD_HISTORIAL
+    sim = SondaLambdaSimulator(seed=args.seed, capacidad_historial=capacidad,
+                               archivo_historial=args.telemetria, **parametros)
+    if args.desde:
+        # Estado y parámetros del checkpoint; las opciones de la línea de comandos tienen prioridad
+        sim.restaurar(args.desde, seed=args.seed)
+        sim.configurar(**parametros)
+    if args.log:
+        sim.eventos = eventos.RegistroEventos([eventos.handler_archivo(args.log)],
+                                              nivel=getattr(logging, args.log_nivel), eventos=args.log_eventos)
+    if args.perfil:
+        sim.perfil = Perfil()
+    if args.escenario:
+        escenario = (escenarios.ciclo_urbano(args.duration, seed=args.seed or 0) if args.escenario == "urbano"
+                     else escenarios.cargar(args.escenario))
+        if args.guardar_escenario:
+            escenarios.guardar(escenario, args.guardar_escenario)
+        sim.cargar_escenario(escenario)
+
+    inicio = time.perf_counter()
+    if args.perfil_por_scan:
+        for _ in range(n_scans):
+            sim.step()
+    else:
+        for hecho in range(0, n_scans, BLOQUE_STEP_MANY):
+            sim.step_many(min(BLOQUE_STEP_MANY, n_scans - hecho))
+    sim.cerrar()
+    transcurrido = time.perf_counter() - inicio
+    if args.checkpoint:
+        checkpoint.guardar(sim.checkpoint(args.checkpoint_historial), args.checkpoint)
+    if sim.eventos is not None:
+        sim.eventos.cerrar()
+
+    if args.out:
+        np.savez(args.out, parametros=json.dumps(sim.parametros()),
+                 estadisticas=json.dumps(sim.estadisticas.resumen()), **sim.historial_arrays())
+
+    if not args.quiet:
+        print(f"Simulados {n_scans} scans ({n_scans * sim.scan_time_s:.2f}s) en {transcurrido:.3f}s "
+              f"({n_scans / max(transcurrido, 1e-9):.0f} scans/s)")
+        print(sim.estadisticas.texto())
+        if args.out:
+            print(f"Historial guardado en {args.out}")
+        if args.telemetria:
+            print(f"Telemetría guardada en {args.telemetria}")
+        if args.checkpoint:
+            print(f"Checkpoint guardado en {args.checkpoint}")
+    if args.perfil:
+        sim.perfil.exportar(args.perfil)
+        if not args.quiet:
+            print(sim.perfil.texto())
+            print(f"Perfil guardado en {args.perfil}")
+    return 0
+
+
+# Opción de la CLI -> parámetro barrible (acepta una lista de valores)
+OPCIONES_BARRIDO = {
+    "--kp": "Kp",
+    "--ki": "Ki",
+    "--setpoint": "setpoint_v",
+    "--integral-max": "integral_max",
+    "--amplitud": "perturbacion_amplitud",
+    "--calidad-combustible": "pert_comb_calidad",
+}
+
+
+def cmd_sweep(args):
+    grilla = {nombre: getattr(args, nombre) for nombre in OPCIONES_BARRIDO.values()
+              if getattr(args, nombre) is not None}
+    if not grilla:
+        raise SystemExit("Indique al menos un parámetro a barrer (por ejemplo --kp 1 2 3)")
+    fijos = {}
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            fijos = json.load(f)
+
+    estado = None
+    if args.desde:
+        estado = checkpoint.cargar(args.desde)
+    elif args.asentar:
+        # Un solo calentamiento con los parámetros fijos, compartido por todos los puntos
+        estado = checkpoint.asentar(args.asentar, seed=args.seed, **fijos)
+
+    inicio = time.perf_counter()
+    filas = barrido.ejecutar_barrido(grilla, duracion_s=args.duration, seed=args.seed, procesos=args.procesos,
+                                     archivo=args.out, tamano_bloque=args.bloque, checkpoint=estado, **fijos)
+    transcurrido = time.perf_counter() - inicio
+    if args.csv:
+        barrido.guardar_csv(filas, args.csv)
+
+    if not args.quiet:
+        print(f"Barrido de {len(filas)} puntos en {transcurrido:.2f}s")
+        mejor = min(filas, key=lambda fila: fila["iae"])
+        print("Menor IAE: " + ", ".join(f"{nombre}={mejor[nombre]}" for nombre in grilla)
+              + f" (IAE={mejor['iae']:.4f}, en banda={mejor['pct_en_banda']:.1f}%)")
+    return 0
+
+
+def cmd_realtime(args):
+    sim = SondaLambdaSimulator(seed=args.seed, **parametros_desde_args(args))
+    if args.desde:
+        sim.restaurar(args.desde, seed=args.seed)
+        sim.configurar(**parametros_desde_args(args))
+    ejecutor = tiempo_real.EjecutorTiempoReal(sim, politica=args.politica, entrada=args.entrada, salida=args.salida,
+                                              espera_activa_us=args.espera_activa_us)
+    try:
+        ejecutor.correr(duracion_s=args.duration)
+    except KeyboardInterrupt:
+        pass  # Ctrl+C termina la corrida y muestra el resumen igual
+    finally:
+        ejecutor.cerrar()
+        sim.cerrar()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(dict(ejecutor.resumen(), perfil=ejecutor.medicion.exportar()), f, indent=2)
+    if not args.quiet:
+        print(ejecutor.texto())
+        print(sim.estadisticas.texto())
+    return 0
+
+
+def cmd_serve(args):
+    sim = SondaLambdaSimulator(seed=args.seed, **parametros_desde_args(args))
+    if args.desde:
+        sim.restaurar(args.desde, seed=args.seed)
+        sim.configurar(**parametros_desde_args(args))
+    if args.escenario:
+        sim.cargar_escenario(escenarios.ciclo_urbano(seed=args.seed or 0) if args.escenario == "urbano"
+                             else escenarios.cargar(args.escenario))
+    telemetria = servidor.ServidorTelemetria(sim, host=args.host, puerto=args.puerto, velocidad=args.velocidad,
+                                             politica=args.politica)
+
+    async def servir():
+        await telemetria.iniciar()
+        if not args.quiet:
+            print(f"Servidor de telemetría en {args.host}:{telemetria.puerto} (Ctrl+C para terminar)")
+        await telemetria.correr(args.duration)
+
+    try:
+        asyncio.run(servir())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sim.cerrar()
+    if not args.quiet:
+        print(f"Simulados {telemetria.scans} scans")
+        print(sim.estadisticas.texto())
+    return 0
+
+
+def cmd_linear(args):
+    fijos = {}
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            fijos = json.load(f)
+    sim = SondaLambdaSimulator(capacidad_historial=1, **fijos)
+    # Un solo valor se analiza como escalar (detalle por constante de tiempo); varios, como grilla
+    kp = sim.Kp if args.kp is None else (args.kp[0] if len(args.kp) == 1 else args.kp)
+    ki = sim.Ki if args.ki is None else (args.ki[0] if len(args.ki) == 1 else args.ki)
+
+    inicio = time.perf_counter()
+    mapa = lineal.mapa_estabilidad(sim, kp, ki)
+    transcurrido = time.perf_counter() - inicio
+    columnas = ("Kp", "Ki", "estable", "radio_espectral", "margen_ganancia_db", "margen_fase_deg")
+    filas = [{nombre: mapa[nombre].flat[i].item() for nombre in columnas} for i in range(mapa["Kp"].size)]
+    if args.csv:
+        barrido.guardar_csv(filas, args.csv)
+    if args.quiet:
+        return 0
+
+    if len(filas) == 1:
+        punto = lineal.punto_operacion(sim)
+        print(f"Equilibrio en λ=1: pulso {punto['pulse_width_ms']:.3f} ms, caudal {punto['caudal_aire_gs']:.2f} g/s")
+        for nombre, modelo in lineal.modelos(sim, kp, ki).items():
+            margenes = modelo.margenes()
+            polos = ", ".join(f"{p:.4f}" for p in np.ravel(modelo.polos()))
+            print(f"tau {nombre} ({modelo.tau_s * 1000:.0f} ms): {'estable' if modelo.estable() else 'INESTABLE'} | "
+                  f"polos: {polos} | MG: {float(margenes['margen_ganancia_db']):.2f} dB "
+                  f"({float(margenes['frecuencia_cruce_fase_hz']):.2f} Hz) | "
+                  f"MF: {float(margenes['margen_fase_deg']):.1f}° "
+                  f"({float(margenes['frecuencia_cruce_ganancia_hz']):.2f} Hz)")
+    else:
+        estables = int(mapa["estable"].sum())
+        print(f"Grilla de {len(filas)} puntos evaluada en {1000.0 * transcurrido:.1f} ms: "
+              f"{estables} estables con ambas constantes de tiempo del sensor")
+        if estables:
+            mejor = max((fila for fila in filas if fila["estable"]), key=lambda fila: np.nan_to_num(fila["margen_fase_deg"], nan=-np.inf))
+            print(f"Mayor margen de fase: Kp={mejor['Kp']}, Ki={mejor['Ki']} "
+                  f"(MF={mejor['margen_fase_deg']:.1f}°, MG={mejor['margen_ganancia_db']:.2f} dB)")
+    return 0
+
+
+def cmd_bench(args):
+    def al_terminar(grupo, segundos):
+        if not args.quiet:
+            print(f"  {grupo}: {segundos:.1f}s")
+
+    if not args.quiet:
+        print("Ejecutando benchmarks...")
+    resultado = benchmark.ejecutar(args.solo, al_terminar)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2)
+
+    if not args.quiet:
+        for nombre, medicion in resultado["resultados"].items():
+            print(f"{nombre:32s} {medicion['valor']:14.3f} {medicion['unidad']}")
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        base = json.load(f)
+    filas = benchmark.comparar(resultado, base, args.tolerancia / 100.0)
+    regresiones = [fila for fila in filas if fila[4]]
+    if not args.quiet:
+        print(f"\nComparación con {args.baseline} (tolerancia {args.tolerancia:.0f}%):")
+        for nombre, valor_base, valor, cambio, regresion in filas:
+            print(f"{nombre:32s} {valor_base:14.3f} -> {valor:14.3f} {100.0 * cambio:+7.1f}%"
+                  + ("  REGRESIÓN" if regresion else ""))
+    if regresiones:
+        print(f"{len(regresiones)} regresiones: {', '.join(fila[0] for fila in regresiones)}")
+        return 1
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m sonda_lambda",
+                                     description="Simulador de inyección electrónica con sonda lambda (sin GUI)")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    run = subparsers.add_parser("run", help="Ejecuta una corrida a máxima velocidad y guarda el historial")
+    run.add_argument("--duration", type=float, default=60.0, help="Tiempo simulado (s)")
+    run.add_argument("--seed", type=int, default=None, help="Semilla del generador de ruido")
+    run.add_argument("--out", help="Archivo .npz de salida con el historial completo")
+    run.add_argument("--telemetria", help="Archivo de telemetría donde se escribe la corrida completa por chunks")
+    run.add_argument("--quiet", action="store_true", help="No imprimir el resumen")
+    run.add_argument("--log", help="Registrar eventos en un archivo ('-' para la salida estándar)")
+    run.add_argument("--log-nivel", choices=("DEBUG", "INFO", "WARNING"), default="INFO",
+                     help="Nivel mínimo de los eventos registrados (DEBUG incluye la traza de cada scan)")
+    run.add_argument("--log-eventos", nargs="+", choices=eventos.EVENTOS, default=list(eventos.EVENTOS_POR_DEFECTO),
+                     help="Eventos a registrar")
+    run.add_argument("--desde", help="Continuar desde un checkpoint (.npz) en lugar del estado inicial")
+    run.add_argument("--checkpoint", help="Guardar el estado final como checkpoint (.npz)")
+    run.add_argument("--checkpoint-historial", type=int, default=0,
+                     help="Muestras del historial incluidas en el checkpoint (por defecto, ninguna)")
+    run.add_argument("--escenario", help="Escenario de perturbaciones (JSON, ver sonda_lambda.escenarios) "
+                     "o 'urbano' para un ciclo de manejo urbano sintético")
+    run.add_argument("--guardar-escenario", help="Guardar el escenario usado como JSON (por ejemplo, el ciclo urbano)")
+    run.add_argument("--perfil", help="Medir el tiempo de cada etapa y guardar el perfil (JSON) en este archivo")
+    run.add_argument("--perfil-por-scan", action="store_true",
+                     help="Simular scan por scan con step() para perfilar cada etapa del scan (más lento); "
+                          "sin esta opción se perfilan los bloques de step_many()")
+    agregar_opciones_simulador(run)
+    run.set_defaults(func=cmd_run)
+
+    sweep = subparsers.add_parser("sweep", help="Barrido paralelo de parámetros con métricas de lazo cerrado")
+    for opcion, nombre in OPCIONES_BARRIDO.items():
+        sweep.add_argument(opcion, dest=nombre, type=float, nargs="+", default=None,
+                           help=f"Valores de {nombre} a barrer")
+    sweep.add_argument("--config", help="Archivo JSON con parámetros fijos del lote (por nombre de atributo)")
+    sweep.add_argument("--duration", type=float, default=30.0, help="Tiempo simulado por punto (s)")
+    sweep.add_argument("--seed", type=int, default=0, help="Semilla del barrido")
+    sweep.add_argument("--procesos", type=int, default=None, help="Procesos del pool (por defecto, todos los núcleos)")
+    sweep.add_argument("--bloque", type=int, default=64, help="Máximo de puntos simulados juntos en cada lote vectorizado")
+    sweep.add_argument("--out", help="Archivo JSONL de resultados (permite reanudar el barrido)")
+    sweep.add_argument("--csv", help="Guardar además la tabla de resultados como CSV")
+    sweep.add_argument("--desde", help="Arrancar todos los puntos desde un checkpoint (.npz)")
+    sweep.add_argument("--asentar", type=float, default=None,
+                       help="Simular estos segundos una sola vez y arrancar todos los puntos desde ese estado")
+    sweep.add_argument("--quiet", action="store_true", help="No imprimir el resumen")
+    sweep.set_defaults(func=cmd_sweep)
+
+    linear = subparsers.add_parser("linear", help="Análisis lineal alrededor de λ=1: estabilidad, polos y márgenes")
+    linear.add_argument("--kp", type=float, nargs="+", default=None, help="Valores de Kp (por defecto, el del simulador)")
+    linear.add_argument("--ki", type=float, nargs="+", default=None, help="Valores de Ki (por defecto, el del simulador)")
+    linear.add_argument("--config", help="Archivo JSON con los demás parámetros del simulador (por nombre de atributo)")
+    linear.add_argument("--csv", help="Guardar la grilla (estabilidad, radio espectral y márgenes) como CSV")
+    linear.add_argument("--quiet", action="store_true", help="No imprimir el resumen")
+    linear.set_defaults(func=cmd_linear)
+
+    realtime = subparsers.add_parser("realtime", help="Ejecuta un scan cada scan_time_ms de reloj (hardware en el lazo)")
+    realtime.add_argument("--duration", type=float, default=None, help="Tiempo a ejecutar (s); sin él, hasta Ctrl+C")
+    realtime.add_argument("--seed", type=int, default=None, help="Semilla del generador de ruido")
+    realtime.add_argument("--politica", choices=tiempo_real.POLITICAS, default="recuperar",
+                          help="Qué hacer con los scans atrasados: ejecutarlos seguidos o saltarlos")
+    realtime.add_argument("--entrada", help="Recibir el voltaje de sonda por datagramas ('host:puerto' UDP o ruta "
+                          "de socket Unix)")
+    realtime.add_argument("--salida", help="Enviar el ancho de pulso de cada scan ('host:puerto' UDP o ruta de "
+                          "socket Unix)")
+    realtime.add_argument("--espera-activa-us", type=float, default=tiempo_real.ESPERA_ACTIVA_US,
+                          help="Último tramo de la espera sin sleep, en µs (más preciso, usa CPU)")
+    realtime.add_argument("--desde", help="Arrancar desde un checkpoint (.npz)")
+    realtime.add_argument("--out", help="Guardar latencias, jitter y contadores en este archivo JSON")
+    realtime.add_argument("--quiet", action="store_true", help="No imprimir el resumen")
+    agregar_opciones_simulador(realtime)
+    realtime.set_defaults(func=cmd_realtime)
+
+    serve = subparsers.add_parser("serve", help="Servidor de telemetría: una corrida, muchos clientes locales (TCP)")
+    serve.add_argument("--host", default="127.0.0.1", help="Dirección local donde escuchar")
+    serve.add_argument("--puerto", type=int, default=servidor.PUERTO, help="Puerto TCP (0: uno libre)")
+    serve.add_argument("--velocidad", type=float, default=1.0, help="Tiempo simulado por segundo de reloj")
+    serve.add_argument("--duration", type=float, default=None, help="Tiempo simulado (s); sin él, hasta Ctrl+C")
+    serve.add_argument("--seed", type=int, default=None, help="Semilla del generador de ruido")
+    serve.add_argument("--politica", choices=servidor.POLITICAS, default="descartar_viejos",
+                       help="Qué hacer cuando un cliente no lee a tiempo (cada cliente puede cambiarla)")
+    serve.add_argument("--escenario", help="Escenario de perturbaciones (JSON) o 'urbano'")
+    serve.add_argument("--desde", help="Arrancar desde un checkpoint (.npz)")
+    serve.add_argument("--quiet", action="store_true", help="No imprimir el resumen")
+    agregar_opciones_simulador(serve)
+    serve.set_defaults(func=cmd_serve)
+
+    bench = subparsers.add_parser("bench", help="Benchmarks de rendimiento con comparación contra una línea base")
+    bench.add_argument("--solo", nargs="+", choices=benchmark.GRUPOS, default=list(benchmark.GRUPOS),
+                       help="Grupos de benchmarks a ejecutar")
+    bench.add_argument("--out", help="Archivo JSON donde guardar los resultados (sirve como línea base)")
+    bench.add_argument("--baseline", help="Resultados guardados contra los que comparar; sale con código 1 "
+                                          "si alguna medición empeoró más que la tolerancia")
+    bench.add_argument("--tolerancia", type=float, default=100.0 * benchmark.TOLERANCIA,
+                       help="Empeoramiento aceptado respecto de la línea base (%%)")
+    bench.add_argument("--quiet", action="store_true", help="No imprimir los resultados")
+    bench.set_defaults(func=cmd_bench)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,92 @@
+"""
+Decimación min/max para dibujar rangos largos de una grabación.
+
+Cuando una ventana tiene más muestras que píxeles, cada píxel se representa con el
+mínimo y el máximo de sus muestras, así los picos del ciclo límite de lambda y del
+voltaje de la sonda no desaparecen. Según el largo de la ventana se lee:
+    - las muestras (ventanas cortas),
+    - el resumen por tramos de MUESTRAS_POR_RESUMEN muestras,
+    - el índice por chunk (ventanas muy largas).
+En los tres casos se leen a lo sumo unos pocos cientos de valores por píxel, así el
+costo de redibujar no depende del largo de la grabación.
+"""
+import numpy as np
+
+from sonda_lambda.telemetria import MUESTRAS_POR_RESUMEN
+
+
+def decimar_minmax(tiempo, y, n_grupos):
+    """ Reduce (tiempo, y) a n_grupos pares mínimo/máximo, en el orden temporal de cada par """
+    n = len(y)
+    if n <= 2 * n_grupos:
+        return np.asarray(tiempo), np.asarray(y)
+    tamano = -(-n // n_grupos)
+    n_grupos = -(-n // tamano)
+    relleno = n_grupos * tamano - n
+    # El último grupo se completa repitiendo la última muestra
+    y_grupos = np.concatenate([y, np.repeat(y[-1:], relleno)]).reshape(n_grupos, tamano)
+    base = np.arange(n_grupos) * tamano
+    i_min = np.minimum(base + y_grupos.argmin(axis=1), n - 1)
+    i_max = np.minimum(base + y_grupos.argmax(axis=1), n - 1)
+    indices = np.sort(np.stack([i_min, i_max], axis=1), axis=1).ravel()
+    return np.asarray(tiempo)[indices], np.asarray(y)[indices]
+
+
+def _reducir_resumen(t_inicio, t_fin, minimos, maximos, n_grupos):
+    """ Agrupa tramos ya resumidos (mínimo/máximo por tramo) en a lo sumo n_grupos pares """
+    n = len(minimos)
+    tamano = max(1, -(-n // n_grupos))
+    cortes = np.arange(0, n, tamano)
+    y_min = np.fmin.reduceat(minimos, cortes)
+    y_max = np.fmax.reduceat(maximos, cortes)
+    t0 = t_inicio[cortes]
+    t1 = t_fin[np.minimum(cortes + tamano, n) - 1]
+    return np.stack([t0, t1], axis=1).ravel(), np.stack([y_min, y_max], axis=1).ravel()
+
+
+def ventana(lector, t_inicio, t_fin, n_pixeles, canales=None):
+    """
+    Lee [t_inicio, t_fin] de un LectorTelemetria decimado a ~n_pixeles pares min/max.
+    Devuelve canal -> (tiempo, valores).
+    """
+    canales = lector.canales if canales is None else canales
+    inicio = lector.indice_de_tiempo(t_inicio, "left")
+    fin = lector.indice_de_tiempo(t_fin, "right")
+    n = fin - inicio
+    n_pixeles = max(1, int(n_pixeles))
+    if n <= 0:
+        return {canal: (np.empty(0), np.empty(0)) for canal in canales}
+
+    muestras_por_pixel = n / n_pixeles
+    if muestras_por_pixel < MUESTRAS_POR_RESUMEN:
+        # Ventana corta: muestras reales
+        datos = lector.leer(inicio, fin, ("time",) + tuple(c for c in canales if c != "time"))
+        return {canal: decimar_minmax(datos["time"], datos[canal], n_pixeles) for canal in canales}
+
+    i_tiempo = lector.canales.index("time")
+    if muestras_por_pixel < lector.muestras_por_chunk:
+        # Ventana media: resumen por tramos (aplanado a un tramo global por fila)
+        resumen = lector.resumen
+        tramos_por_chunk = resumen.shape[3]
+        a, b = inicio // MUESTRAS_POR_RESUMEN, -(-fin // MUESTRAS_POR_RESUMEN)
+        c0, c1 = a // tramos_por_chunk, (b - 1) // tramos_por_chunk
+        bloque = np.asarray(resumen[c0:c1 + 1])  # (chunks, 2, canales, tramos)
+        bloque = bloque.transpose(1, 2, 0, 3).reshape(2, len(lector.canales), -1)
+        bloque = bloque[:, :, a - c0 * tramos_por_chunk:b - c0 * tramos_por_chunk]
+        minimos, maximos = bloque[0], bloque[1]
+    else:
+        # Ventana muy larga: índice por chunk
+        c0, c1 = inicio // lector.muestras_por_chunk, (fin - 1) // lector.muestras_por_chunk
+        filas = lector.indice[c0:c1 + 1]
+        n_canales = len(lector.canales)
+        minimos = filas[:, 3:3 + n_canales].T
+        maximos = filas[:, 3 + n_canales:3 + 2 * n_canales].T
+
+    validos = ~np.isnan(minimos[i_tiempo])
+    t_inicio_tramos, t_fin_tramos = minimos[i_tiempo][validos], maximos[i_tiempo][validos]
+    resultado = {}
+    for canal in canales:
+        i = lector.canales.index(canal)
+        resultado[canal] = _reducir_resumen(t_inicio_tramos, t_fin_tramos,
+                                            minimos[i][validos], maximos[i][validos], n_pixeles)
+    return resultado
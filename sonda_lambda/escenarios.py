@@ -0,0 +1,208 @@
+"""
+Escenarios de perturbación y ciclos de manejo precompilados.
+
+Un escenario es una lista de eventos (en un archivo JSON o armada en Python):
+
+    {"duracion_s": 600, "eventos": [
+        {"tipo": "escalon", "senal": "caudal_aire", "inicio": 5, "duracion": 5, "amplitud": 2.0},
+        {"tipo": "rampa", "senal": "rpm", "inicio": 20, "duracion": 4, "amplitud": 1200, "mantener": 10},
+        {"tipo": "senoidal", "senal": "caudal_aire", "inicio": 60, "duracion": 30, "amplitud": 0.5,
+         "frecuencia_hz": 0.5},
+        {"tipo": "traza", "senal": "caudal_aire", "inicio": 100, "archivo": "maf.csv", "modo": "absoluto"},
+        {"tipo": "escalon", "senal": "calidad_combustible", "inicio": 200, "amplitud": -0.1}
+    ]}
+
+Tipos de evento (tiempos en segundos, relativos al inicio del escenario):
+    - escalon: suma 'amplitud' en [inicio, inicio + duracion) (sin duración, hasta el final),
+    - rampa: sube linealmente de 0 a 'amplitud' durante 'duracion' y la mantiene 'mantener'
+      segundos más (sin 'mantener', hasta el final),
+    - senoidal: amplitud * sin(2π frecuencia_hz (t - inicio) + fase_deg) en [inicio, inicio + duracion),
+    - traza: valores grabados ('tiempos'/'valores' o un CSV 'archivo' con columnas tiempo,valor),
+      interpolados linealmente; con "modo": "absoluto" reemplaza el valor de la señal en lugar de sumarse.
+
+Señales: caudal_aire (g/s), calidad_combustible (factor sobre pert_comb_calidad, base 1),
+rpm, temperatura (°C) y presion (hPa); estas tres parten de los valores del simulador y
+escalan el caudal de aire base por densidad: (rpm / rpm0) * (p / p0) * (T0 / T), en kelvin.
+
+compilar() evalúa todos los eventos una sola vez y muestrea el resultado a cada scan; en
+el bucle de scan la perturbación se lee por índice (O(1)), así el costo por scan no
+depende de la cantidad de eventos. Pasado el final, se mantienen los últimos valores.
+"""
+import json
+import os
+from array import array
+
+import numpy as np
+
+TIPOS = ("escalon", "rampa", "senoidal", "traza")
+SENALES = ("caudal_aire", "calidad_combustible", "rpm", "temperatura", "presion")
+CERO_ABSOLUTO_C = 273.15
+
+
+class EscenarioCompilado:
+    """ Perturbaciones muestreadas a cada scan (arreglos de largo n_scans) """
+
+    def __init__(self, scan_time_s, desvio_aire, factor_calidad, senales):
+        self.scan_time_s = scan_time_s
+        # array.array: leer un elemento en step() devuelve un float sin crear escalares de NumPy
+        self.desvio_aire = array("d", np.asarray(desvio_aire, dtype=float).tobytes())  # g/s sobre el caudal base
+        self.factor_calidad = array("d", np.asarray(factor_calidad, dtype=float).tobytes())  # Sobre pert_comb_calidad
+        self.senales = senales  # señal -> valores (para graficar o exportar)
+        self.n_scans = len(self.desvio_aire)
+        self.duracion_s = self.n_scans * scan_time_s
+
+    def __len__(self):
+        return self.n_scans
+
+    def indice(self, t):
+        """ Muestra del scan que empieza en t (relativo al escenario); pasado el final, la última """
+        k = int(t / self.scan_time_s + 0.5)
+        return k if k < self.n_scans else self.n_scans - 1
+
+    def indices(self, t):
+        """ indice() para un arreglo de tiempos (mismas operaciones) """
+        return np.minimum((t / self.scan_time_s + 0.5).astype(np.int64), self.n_scans - 1)
+
+
+def cargar(ruta):
+    """ Lee un escenario JSON; las trazas con 'archivo' se resuelven relativas al escenario """
+    with open(ruta, encoding="utf-8") as f:
+        escenario = json.load(f)
+    carpeta = os.path.dirname(os.path.abspath(ruta))
+    for evento in escenario.get("eventos", []):
+        if "archivo" in evento:
+            evento["archivo"] = os.path.join(carpeta, evento["archivo"])
+    return escenario
+
+
+def guardar(escenario, ruta):
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(escenario, f)
+
+
+def _leer_traza(evento):
+    if "archivo" in evento:
+        datos = np.loadtxt(evento["archivo"], delimiter=",", comments="#", ndmin=2)
+        return datos[:, 0], datos[:, 1]
+    return np.asarray(evento["tiempos"], dtype=float), np.asarray(evento["valores"], dtype=float)
+
+
+def _fin_evento(evento):
+    """ Último instante con efecto del evento (inf si dura hasta el final) """
+    inicio = float(evento.get("inicio", 0.0))
+    if evento["tipo"] == "traza":
+        tiempos, _ = _leer_traza(evento)
+        return inicio + float(tiempos[-1])
+    duracion = float(evento.get("duracion", np.inf))
+    if evento["tipo"] == "rampa":
+        return inicio + duracion + float(evento.get("mantener", np.inf))
+    return inicio + duracion
+
+
+def compilar(escenario, sim, duracion_s=None):
+    """
+    Evalúa los eventos del escenario (dict con 'eventos' y opcionalmente 'duracion_s') a
+    cada scan del simulador y devuelve un EscenarioCompilado.
+    """
+    eventos = escenario.get("eventos", [])
+    for evento in eventos:
+        if evento.get("tipo") not in TIPOS:
+            raise ValueError(f"Tipo de evento desconocido: {evento.get('tipo')!r} (tipos: {', '.join(TIPOS)})")
+        if evento.get("senal") not in SENALES:
+            raise ValueError(f"Señal desconocida: {evento.get('senal')!r} (señales: {', '.join(SENALES)})")
+
+    dt = sim.scan_time_s
+    if duracion_s is None:
+        duracion_s = escenario.get("duracion_s")
+    if duracion_s is None:
+        finales = [_fin_evento(evento) for evento in eventos]
+        finitos = [fin for fin in finales if np.isfinite(fin)]
+        duracion_s = max(finitos + [float(evento.get("inicio", 0.0)) for evento in eventos] + [dt])
+    n = max(1, int(round(duracion_s / dt)))
+    t = dt * np.arange(n)  # Tiempo al inicio de cada scan, como la ventana de perturbación de step()
+
+    base = {"caudal_aire": sim.caudal_aire_base_gs, "calidad_combustible": 1.0, "rpm": float(sim.rpm),
+            "temperatura": sim.temperatura_ambiente_c, "presion": sim.presion_atmosferica_hpa}
+    senales = {nombre: np.full(n, float(valor)) for nombre, valor in base.items()}
+    absolutos = []
+
+    for evento in eventos:
+        y = senales[evento["senal"]]
+        inicio = float(evento.get("inicio", 0.0))
+        fin = _fin_evento(evento)
+        k0 = int(np.searchsorted(t, inicio, side="left"))
+        k1 = int(np.searchsorted(t, fin, side="left")) if np.isfinite(fin) else n
+        if k0 >= k1:
+            continue
+        tramo = t[k0:k1] - inicio
+        tipo = evento["tipo"]
+        if tipo == "escalon":
+            y[k0:k1] += float(evento["amplitud"])
+        elif tipo == "rampa":
+            duracion = float(evento["duracion"])
+            y[k0:k1] += float(evento["amplitud"]) * np.minimum(tramo / duracion, 1.0) if duracion > 0 \
+                else float(evento["amplitud"])
+        elif tipo == "senoidal":
+            y[k0:k1] += float(evento["amplitud"]) * np.sin(
+                2.0 * np.pi * float(evento["frecuencia_hz"]) * tramo + np.radians(float(evento.get("fase_deg", 0.0))))
+        else:
+            tiempos, valores = _leer_traza(evento)
+            interpolada = np.interp(tramo, tiempos, valores)
+            if evento.get("modo", "suma") == "absoluto":
+                absolutos.append((evento["senal"], k0, k1, interpolada))
+            else:
+                y[k0:k1] += interpolada
+
+    # Las trazas absolutas reemplazan la señal completa: las de RPM, temperatura y presión
+    # antes de calcular la densidad, para que lleguen al caudal de aire
+    for senal, k0, k1, valores in absolutos:
+        if senal not in ("caudal_aire", "calidad_combustible"):
+            senales[senal][k0:k1] = valores
+    # Caudal de aire por densidad (régimen, presión y temperatura respecto de los valores del simulador)
+    densidad = (senales["rpm"] / base["rpm"]) * (senales["presion"] / base["presion"]) \
+        * ((base["temperatura"] + CERO_ABSOLUTO_C) / (senales["temperatura"] + CERO_ABSOLUTO_C))
+    senales["caudal_aire"] = base["caudal_aire"] * densidad + (senales["caudal_aire"] - base["caudal_aire"])
+    # Un caudal de aire absoluto (por ejemplo, un MAF grabado) reemplaza también el efecto de la densidad
+    for senal, k0, k1, valores in absolutos:
+        if senal in ("caudal_aire", "calidad_combustible"):
+            senales[senal][k0:k1] = valores
+
+    return EscenarioCompilado(dt, senales["caudal_aire"] - base["caudal_aire"],
+                              senales["calidad_combustible"], senales)
+
+
+def ciclo_urbano(duracion_s=1800.0, seed=0):
+    """
+    Ciclo de manejo urbano sintético: tramos de ralentí, aceleración, crucero y
+    desaceleración (rampas de RPM y de caudal de aire), con pulsos de aire en crucero,
+    una lenta deriva de temperatura y un cambio de calidad de combustible a la mitad.
+    """
+    rng = np.random.default_rng(seed)
+    eventos = [
+        {"tipo": "rampa", "senal": "temperatura", "inicio": 0.0, "duracion": duracion_s, "amplitud": 15.0},
+        {"tipo": "escalon", "senal": "calidad_combustible", "inicio": duracion_s / 2, "amplitud": -0.05},
+    ]
+    t = 0.0
+    while t < duracion_s:
+        ralenti = rng.uniform(5.0, 20.0)
+        aceleracion = rng.uniform(3.0, 8.0)
+        crucero = rng.uniform(10.0, 40.0)
+        desaceleracion = rng.uniform(3.0, 8.0)
+        delta_rpm = rng.uniform(100.0, 600.0)  # Sobre 800 rpm de ralentí: el pulso máximo compensa hasta 2x aire
+        inicio = t + ralenti
+        mantener = crucero
+        # Sube durante la aceleración, se mantiene en crucero y baja con una rampa negativa
+        eventos.append({"tipo": "rampa", "senal": "rpm", "inicio": inicio, "duracion": aceleracion,
+                        "amplitud": delta_rpm, "mantener": mantener + desaceleracion})
+        eventos.append({"tipo": "rampa", "senal": "rpm", "inicio": inicio + aceleracion + mantener,
+                        "duracion": desaceleracion, "amplitud": -delta_rpm, "mantener": 0.0})
+        # Apertura de mariposa: pulso de aire al inicio de la aceleración
+        eventos.append({"tipo": "escalon", "senal": "caudal_aire", "inicio": inicio, "duracion": 0.5,
+                        "amplitud": rng.uniform(0.5, 2.0)})
+        for _ in range(int(crucero // 5)):
+            eventos.append({"tipo": "senoidal", "senal": "caudal_aire",
+                            "inicio": inicio + aceleracion + rng.uniform(0.0, crucero),
+                            "duracion": rng.uniform(1.0, 3.0), "amplitud": rng.uniform(0.1, 0.4),
+                            "frecuencia_hz": rng.uniform(0.5, 2.0)})
+        t = inicio + aceleracion + crucero + desaceleracion
+    return {"duracion_s": duracion_s, "eventos": eventos}
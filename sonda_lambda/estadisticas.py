@@ -0,0 +1,206 @@
+"""
+Estadísticas de lazo cerrado en línea (O(1) por scan en tiempo y memoria).
+
+El simulador las actualiza en cada scan, así la GUI y las corridas sin interfaz
+pueden consultarlas en cualquier momento sin recorrer el historial:
+    - media y desvío de lambda (momentos combinados por bloques, Chan et al.),
+    - error medio y RMS,
+    - % del tiempo con lambda en la banda estequiométrica,
+    - período de conmutación rica/pobre (cruces por cero del error),
+    - scans con el término integral saturado (anti-windup) en cada límite,
+    - percentiles de lambda y de |error| sobre una ventana de los últimos scans.
+
+Los bloques de step_many() se agregan con agregar_bloque(), que combina los
+momentos del bloque con los acumulados. agregar() (un scan) solo cuenta la saturación
+y empaqueta tiempo, lambda y error en un lote que se agrega como bloque al llenarse o
+al consultar las estadísticas (resumen(), texto(), percentiles() y las propiedades).
+"""
+import math
+import struct
+from array import array
+
+import numpy as np
+
+BANDA_LAMBDA = (0.98, 1.02)  # Banda estequiométrica
+_BANDA_MIN, _BANDA_MAX = BANDA_LAMBDA
+VENTANA_PERCENTILES = 1500  # Scans de la ventana de percentiles (30 s a 20 ms)
+PERCENTILES = (5, 50, 95)
+LOTE = 256  # Scans de agregar() que se juntan antes de sumarlos como bloque
+_SCAN = struct.Struct("<3d")  # tiempo, lambda, error
+
+
+class EstadisticasLazo:
+    def __init__(self, ventana=VENTANA_PERCENTILES):
+        if ventana < 1:
+            raise ValueError("La ventana debe ser de al menos 1 scan")
+        self.ventana = ventana
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.n = 0
+        self.t_inicio = None
+        self.t_ultimo = None
+        # Lambda: media y suma de cuadrados de las desviaciones
+        self.lambda_media = 0.0
+        self._lambda_m2 = 0.0
+        self.lambda_min = math.inf
+        self.lambda_max = -math.inf
+        # Error: suma y suma de cuadrados
+        self._error_suma = 0.0
+        self._error_suma2 = 0.0
+        self.en_banda = 0
+        # Cruces por cero del error
+        self._signo = None
+        self.cruces = 0
+        self._t_primer_cruce = None
+        self._t_cruces = []  # Instantes de los últimos 3 cruces
+        # Saturación del término integral
+        self.integral_sat_max = 0
+        self.integral_sat_min = 0
+        # Ventana circular de lambda y |error| para los percentiles
+        self._ventana_lambda = array("d", bytes(8 * self.ventana))
+        self._ventana_error = array("d", bytes(8 * self.ventana))
+        self._pos = 0
+        # Lote de scans de agregar() todavía sin sumar
+        self._lote = bytearray(_SCAN.size * LOTE)
+        self._en_lote = 0
+
+    def agregar(self, t, lambda_, error, integral, integral_max):
+        """ Agrega un scan (al lote; se suma al llenarse o al consultar) """
+        if integral >= integral_max:
+            self.integral_sat_max += 1
+        elif integral <= -integral_max:
+            self.integral_sat_min += 1
+        _SCAN.pack_into(self._lote, self._en_lote * _SCAN.size, t, lambda_, error)
+        self._en_lote += 1
+        if self._en_lote == LOTE:
+            self.actualizar()
+
+    def actualizar(self):
+        """ Suma los scans pendientes de agregar(); los atributos quedan al día """
+        m = self._en_lote
+        if m == 0:
+            return
+        self._en_lote = 0
+        scans = np.frombuffer(self._lote, count=3 * m).reshape(m, 3)
+        self._sumar_bloque(scans[:, 0], scans[:, 1], scans[:, 2])
+
+    def agregar_bloque(self, t, lambda_, error, integral, integral_max):
+        """ Agrega un bloque de scans (arreglos del mismo largo) """
+        self.actualizar()
+        self.integral_sat_max += int(np.count_nonzero(integral >= integral_max))
+        self.integral_sat_min += int(np.count_nonzero(integral <= -integral_max))
+        self._sumar_bloque(t, lambda_, error)
+
+    def _sumar_bloque(self, t, lambda_, error):
+        """ Tiempo, lambda y error de un bloque (la saturación ya está contada) """
+        m = len(lambda_)
+        if m == 0:
+            return
+        if self.t_inicio is None:
+            self.t_inicio = float(t[0])
+        self.t_ultimo = float(t[-1])
+
+        # Momentos de lambda: combinación del bloque con lo acumulado (Chan et al.)
+        media_bloque = float(lambda_.mean())
+        m2_bloque = float(((lambda_ - media_bloque) ** 2).sum())
+        n = self.n + m
+        delta = media_bloque - self.lambda_media
+        self.lambda_media += delta * m / n
+        self._lambda_m2 += m2_bloque + delta * delta * self.n * m / n
+        self.n = n
+        self.lambda_min = min(self.lambda_min, float(lambda_.min()))
+        self.lambda_max = max(self.lambda_max, float(lambda_.max()))
+        self.en_banda += int(np.count_nonzero((lambda_ >= _BANDA_MIN) & (lambda_ <= _BANDA_MAX)))
+
+        self._error_suma += float(error.sum())
+        self._error_suma2 += float(np.dot(error, error))
+        signos = error > 0
+        anteriores = np.concatenate(([signos[0] if self._signo is None else self._signo], signos[:-1]))
+        # Con el ruido EMI hay cruces en casi todos los scans: se cuentan sin recorrerlos
+        cruces = np.flatnonzero(signos != anteriores)
+        if len(cruces):
+            if self._t_primer_cruce is None:
+                self._t_primer_cruce = float(t[cruces[0]])
+            self.cruces += len(cruces)
+            self._t_cruces = (self._t_cruces + t[cruces[-3:]].tolist())[-3:]
+        self._signo = bool(signos[-1])
+
+        cola = slice(max(0, m - self.ventana), m)
+        k = min(m, self.ventana)
+        posiciones = (self._pos + np.arange(k)) % self.ventana
+        np.frombuffer(self._ventana_lambda)[posiciones] = lambda_[cola]
+        np.frombuffer(self._ventana_error)[posiciones] = np.abs(error[cola])
+        self._pos = (self._pos + k) % self.ventana
+
+    @property
+    def lambda_desvio(self):
+        self.actualizar()
+        return math.sqrt(self._lambda_m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+    @property
+    def error_rms(self):
+        self.actualizar()
+        return math.sqrt(self._error_suma2 / self.n) if self.n else 0.0
+
+    @property
+    def pct_en_banda(self):
+        self.actualizar()
+        return 100.0 * self.en_banda / self.n if self.n else 0.0
+
+    @property
+    def periodo_conmutacion_s(self):
+        """ Período medio rica/pobre desde el primer cruce (dos cruces por período) """
+        self.actualizar()
+        if self.cruces < 2:
+            return math.nan
+        return 2.0 * (self._t_cruces[-1] - self._t_primer_cruce) / (self.cruces - 1)
+
+    @property
+    def periodo_ultimo_s(self):
+        """ Último período completo (entre el antepenúltimo y el último cruce) """
+        self.actualizar()
+        return self._t_cruces[-1] - self._t_cruces[0] if len(self._t_cruces) == 3 else math.nan
+
+    def percentiles(self, q=PERCENTILES):
+        """ Percentiles de lambda y de |error| en la ventana: {"lambda": [...], "error_abs": [...]} """
+        self.actualizar()
+        llenos = min(self.n, self.ventana)
+        if llenos == 0:
+            return {"lambda": [math.nan] * len(q), "error_abs": [math.nan] * len(q)}
+        ventana = np.stack([np.frombuffer(self._ventana_lambda), np.frombuffer(self._ventana_error)])
+        valores = np.percentile(ventana[:, :llenos], q, axis=1)
+        return {"lambda": valores[:, 0].tolist(), "error_abs": valores[:, 1].tolist()}
+
+    def resumen(self):
+        """ Todas las estadísticas como dict (valores float/int, serializable a JSON) """
+        self.actualizar()
+        percentiles = self.percentiles()
+        resumen = {
+            "scans": self.n,
+            "duracion_s": (self.t_ultimo - self.t_inicio) if self.n else 0.0,
+            "lambda_media": self.lambda_media,
+            "lambda_desvio": self.lambda_desvio,
+            "lambda_min": self.lambda_min if self.n else math.nan,
+            "lambda_max": self.lambda_max if self.n else math.nan,
+            "error_medio": self._error_suma / self.n if self.n else 0.0,
+            "error_rms": self.error_rms,
+            "pct_en_banda": self.pct_en_banda,
+            "cruces": self.cruces,
+            "periodo_conmutacion_s": self.periodo_conmutacion_s,
+            "periodo_ultimo_s": self.periodo_ultimo_s,
+            "integral_sat_max": self.integral_sat_max,
+            "integral_sat_min": self.integral_sat_min,
+        }
+        for nombre, valores in percentiles.items():
+            for q, valor in zip(PERCENTILES, valores):
+                resumen[f"{nombre}_p{q}"] = valor
+        return resumen
+
+    def texto(self):
+        """ Resumen de una línea (barra de estado de la GUI, salida de la CLI) """
+        p5, _, p95 = self.percentiles()["lambda"]
+        return (f"λ: {self.lambda_media:.4f} ± {self.lambda_desvio:.4f} (p5-p95 {p5:.3f}-{p95:.3f}) | "
+                f"Error RMS: {1000.0 * self.error_rms:.1f} mV | En banda: {self.pct_en_banda:.1f}% | "
+                f"Período: {1000.0 * self.periodo_conmutacion_s:.0f} ms | "
+                f"Integral saturada: {self.integral_sat_max}/{self.integral_sat_min} scans")
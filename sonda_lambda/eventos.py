@@ -0,0 +1,109 @@
+"""
+Registro de eventos del simulador sobre el módulo logging de la biblioteca estándar.
+
+En lugar de un mensaje por scan, el simulador emite eventos cuando algo cambia
+(transición rica/pobre, inicio/fin de perturbación, saturación del pulso). Cada
+evento tiene un nivel y un nombre; el texto se formatea solo si el evento pasa el
+filtro. La traza completa por scan sigue disponible como evento "scan" (DEBUG).
+"""
+import logging
+import logging.handlers
+import sys
+from collections import deque
+
+import numpy as np
+
+# Nombres de evento
+SCAN = "scan"  # Traza completa de cada scan (DEBUG)
+ESTADO = "estado"  # Transición de mezcla RICA <-> POBRE (INFO)
+PERTURBACION = "perturbacion"  # Inicio y fin de la perturbación de aire (INFO)
+SATURACION = "saturacion"  # El pulso entra o sale de los límites del inyector (WARNING)
+GUI = "gui"  # Mensajes de la interfaz (configuración, pausa, errores de entrada)
+
+EVENTOS = (SCAN, ESTADO, PERTURBACION, SATURACION, GUI)
+
+# Transición rica/pobre: el voltaje tiene que salir de la banda estequiométrica (la misma
+# del indicador de la GUI) y la mezcla mantenerse un tiempo mínimo; sin esto, el ruido EMI
+# y el ciclo límite del PI cambian el estado casi en cada scan
+BANDA_ESTADO_V = 0.05
+PERMANENCIA_ESTADO_S = 0.1
+EVENTOS_POR_DEFECTO = (ESTADO, PERTURBACION, SATURACION, GUI)
+
+FORMATO = "%(levelname)s %(evento)s | %(message)s"
+
+
+def mezcla_con_histeresis(voltaje, setpoint_v, anterior=0):
+    """
+    Mezcla de cada scan con la banda BANDA_ESTADO_V: 1 rica, -1 pobre; dentro de la banda
+    se mantiene la anterior ('anterior' hasta el primer scan fuera de ella, 0: sin definir).
+    voltaje: scans en el eje 0 y, opcionalmente, instancias en el eje 1 (setpoint por instancia).
+    """
+    voltaje = np.asarray(voltaje)
+    fuera = np.where(voltaje > setpoint_v + BANDA_ESTADO_V, 1, np.where(voltaje < setpoint_v - BANDA_ESTADO_V, -1, 0))
+    scans = np.arange(len(voltaje)).reshape((-1,) + (1,) * (voltaje.ndim - 1))
+    ultimo_fuera = np.maximum.accumulate(np.where(fuera != 0, scans, -1), axis=0)
+    mezcla = np.take_along_axis(fuera, np.maximum(ultimo_fuera, 0), axis=0)
+    return np.where(ultimo_fuera >= 0, mezcla, anterior)
+
+
+class RegistroEventos:
+    """ Filtro por nivel y por evento delante de un logger estándar """
+
+    def __init__(self, handlers=(), nivel=logging.INFO, eventos=EVENTOS_POR_DEFECTO,
+                 nombre="sonda_lambda.eventos"):
+        desconocidos = set(eventos) - set(EVENTOS)
+        if desconocidos:
+            raise ValueError(f"Eventos desconocidos: {', '.join(sorted(desconocidos))}")
+        self.eventos = set(eventos)
+        # Logger propio, fuera de logging.getLogger(): con un logger global por nombre, dos
+        # simuladores compartirían handlers y nivel
+        self.logger = logging.Logger(nombre, nivel)
+        self.logger.propagate = False
+        self.handlers = list(handlers)
+        for handler in self.handlers:
+            self.logger.addHandler(handler)
+
+    def habilitado(self, evento, nivel=logging.INFO):
+        return evento in self.eventos and self.logger.isEnabledFor(nivel)
+
+    def emitir(self, evento, nivel, mensaje, *args):
+        """ Emite un evento; mensaje se formatea con args (estilo %) solo si pasa el filtro """
+        if evento in self.eventos and self.logger.isEnabledFor(nivel):
+            self.logger.log(nivel, mensaje, *args, extra={"evento": evento})
+
+    def cerrar(self):
+        for handler in self.handlers:
+            destino = getattr(handler, "target", None)
+            handler.flush()
+            handler.close()
+            if destino is not None:
+                destino.close()
+            self.logger.removeHandler(handler)
+        self.handlers = []
+
+
+class BufferTexto(logging.Handler):
+    """ Acumula las líneas en memoria (con tope) para volcarlas en lote, por ejemplo una vez por frame """
+
+    def __init__(self, max_lineas=500):
+        super().__init__()
+        self.lineas = deque(maxlen=max_lineas)
+
+    def emit(self, record):
+        self.lineas.append(record.getMessage())
+
+    def drenar(self):
+        """ Devuelve las líneas pendientes y vacía el buffer """
+        lineas = list(self.lineas)
+        self.lineas.clear()
+        return lineas
+
+
+def handler_archivo(destino, capacidad=1000):
+    """ Handler con escritura en lotes de 'capacidad' registros; destino es una ruta o '-' (stdout) """
+    if destino == "-":
+        salida = logging.StreamHandler(sys.stdout)
+    else:
+        salida = logging.FileHandler(destino, mode="w", encoding="utf-8")
+    salida.setFormatter(logging.Formatter(FORMATO))
+    return logging.handlers.MemoryHandler(capacidad, flushLevel=logging.CRITICAL, target=salida)
@@ -0,0 +1,110 @@
+"""
+Historial columnar de capacidad fija (buffer circular de NumPy).
+
+Cada muestra se escribe dos veces (en i e i + capacidad) dentro de un arreglo de
+largo 2 * capacidad, así las últimas N muestras siempre son contiguas y se pueden
+devolver como vistas sin copiar. Opcionalmente, las muestras se vuelcan a un archivo
+de telemetría (ver sonda_lambda.telemetria) para conservar la corrida entera sin que
+crezca la memoria.
+
+agregar() no escribe en el buffer: empaqueta la muestra en un lote (struct, una sola
+llamada) y el lote pasa al buffer y al archivo de una vez al llenarse o al leer. Así
+step() no paga dos asignaciones de NumPy por scan.
+"""
+import struct
+
+import numpy as np
+
+from sonda_lambda.telemetria import EscritorTelemetria
+
+LOTE = 256  # Muestras de agregar() que se juntan antes de escribirlas
+
+
+class HistorialCircular:
+    def __init__(self, canales, capacidad, archivo=None, lote=LOTE, metadatos=None):
+        if capacidad < 1:
+            raise ValueError("La capacidad debe ser al menos 1")
+        self.canales = tuple(canales)
+        self.capacidad = capacidad
+        self._indice = {canal: i for i, canal in enumerate(self.canales)}
+        self._datos = np.zeros((len(self.canales), 2 * capacidad))
+        self._pos = 0  # Próxima posición de escritura (0 .. capacidad-1)
+        self.total = 0  # Muestras agregadas desde el inicio (incluye las descartadas)
+        # Lote de muestras de agregar() todavía no escritas, fila por muestra
+        self._fila = struct.Struct(f"<{len(self.canales)}d")
+        self.lote = max(1, lote)
+        self._lote = bytearray(self._fila.size * self.lote)
+        self._en_lote = 0
+
+        # --- Volcado a disco (retención completa) ---
+        self.archivo = archivo
+        self._metadatos = metadatos
+        self._escritor = EscritorTelemetria(archivo, self.canales, metadatos=metadatos) \
+            if archivo is not None else None
+
+    def __len__(self):
+        return min(self.total, self.capacidad)
+
+    def agregar(self, valores):
+        """ Agrega una muestra (un valor por canal, en el orden de self.canales) """
+        self._fila.pack_into(self._lote, self._en_lote * self._fila.size, *valores)
+        self._en_lote += 1
+        self.total += 1
+        if self._en_lote == self.lote:
+            self.volcar()
+
+    def agregar_bloque(self, columnas):
+        """ Agrega un bloque de muestras (arreglo n_canales x m) de una sola vez """
+        self.volcar()
+        columnas = np.asarray(columnas, dtype=float)
+        self._escribir(columnas)
+        self.total += columnas.shape[1]
+
+    def _escribir(self, columnas):
+        """ Pasa columnas (n_canales x m) al archivo y al buffer circular """
+        if self._escritor is not None:
+            self._escritor.agregar_bloque(columnas)
+        # Solo las últimas 'capacidad' muestras quedan en memoria
+        cola = columnas[:, -self.capacidad:]
+        posiciones = (self._pos + np.arange(cola.shape[1])) % self.capacidad
+        self._datos[:, posiciones] = cola
+        self._datos[:, posiciones + self.capacidad] = cola
+        self._pos = (self._pos + cola.shape[1]) % self.capacidad
+
+    def ultimos(self, canal, n=None):
+        """ Vista (sin copia) de las últimas n muestras de un canal (todas si n es None) """
+        if self._en_lote:
+            self.volcar()
+        disponibles = len(self)
+        n = disponibles if n is None else min(n, disponibles)
+        fin = self._pos + self.capacidad
+        return self._datos[self._indice[canal], fin - n:fin]
+
+    def columnas(self, n=None):
+        """ Vistas de las últimas n muestras de todos los canales """
+        return {canal: self.ultimos(canal, n) for canal in self.canales}
+
+    def volcar(self):
+        """ Escribe las muestras pendientes de agregar() en el buffer (y en el archivo) """
+        m = self._en_lote
+        if m == 0:
+            return
+        self._en_lote = 0
+        filas = np.frombuffer(self._lote, count=m * len(self.canales)).reshape(m, len(self.canales))
+        self._escribir(filas.T)
+
+    def reiniciar(self):
+        """ Descarta todas las muestras (con archivo, vuelve a empezarlo vacío) """
+        self._datos.fill(0.0)
+        self._pos = 0
+        self.total = 0
+        self._en_lote = 0
+        if self._escritor is not None:
+            self._escritor.cerrar()
+            self._escritor = EscritorTelemetria(self.archivo, self.canales, metadatos=self._metadatos)
+
+    def cerrar(self):
+        if self._escritor is not None:
+            self.volcar()
+            self._escritor.cerrar()
+            self._escritor = None
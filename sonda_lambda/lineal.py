@@ -0,0 +1,231 @@
+"""
+Modelo lineal discreto del lazo alrededor de λ = 1.
+
+Linealiza, al tiempo de scan del simulador, el mismo lazo que SondaLambdaSimulator.step():
+    - controlador PI: u = Kp e + Ki I,  I[k] = I[k-1] + Ts e[k] (sin saturaciones),
+    - inyector y planta: λ = caudal_aire / (u K_injector calidad stoich); en λ = 1 el
+      pulso de equilibrio es u0 y dλ/du = -1/u0, dλ/d(caudal) = 1/caudal,
+    - sensor: pendiente de la tanh en λ = 1, dv/dλ = -0.45 * 20; la curva está centrada en el
+      setpoint (v = setpoint + 0.45 tanh(...)), así un cambio de setpoint también entra al sensor,
+    - filtro de primer orden del sensor con α = Ts / tau (un modelo por cada tau),
+    - retardo de un scan del ADC (el error usa la medición del scan anterior).
+
+Estado al inicio de cada scan: x = [I, v] (desvíos del término integral y del voltaje
+filtrado respecto del equilibrio). Entradas: desvíos del setpoint y del caudal de aire.
+
+    x[k+1] = A x[k] + B w[k],   y[k] = C x[k] + D w[k]
+
+El lazo es de segundo orden, así los polos, la estabilidad (condiciones de Jury) y los
+márgenes se calculan en forma cerrada. Kp y Ki pueden ser arreglos (se hace broadcasting),
+para evaluar grillas completas de una vez.
+
+Con los parámetros por defecto (Kp=3, Ki=6) el modelo con la constante rápida (rica -> pobre)
+es inestable y con la lenta queda al límite: el simulador oscila en un ciclo límite acotado
+por la saturación de la tanh del sensor.
+"""
+import numpy as np
+
+ENTRADAS = ("setpoint", "caudal_aire")
+SALIDAS = ("lambda", "voltaje_sonda", "pulse_width", "error")
+PENDIENTE_SENSOR = -0.45 * 20.0  # dv/dλ de la tanh en λ = 1 (V por unidad de λ)
+
+
+def punto_operacion(sim):
+    """ Equilibrio en λ = 1: pulso, caudal de aire y ganancias de la planta y del sensor """
+    caudal = sim.caudal_aire_base_gs
+    pulso = caudal / (sim.K_injector * sim.pert_comb_calidad * sim.stoich_ratio)
+    return {
+        "pulse_width_ms": pulso,
+        "caudal_aire_gs": caudal,
+        "voltaje_sonda": sim.setpoint_v,
+        "ganancia_planta": -1.0 / pulso,  # dλ/du (1/ms)
+        "ganancia_aire": 1.0 / caudal,  # dλ/d(caudal) (s/g)
+        "ganancia_sensor": PENDIENTE_SENSOR,
+    }
+
+
+class ModeloLineal:
+    def __init__(self, Kp, Ki, scan_time_s, tau_s, ganancia_planta, ganancia_sensor, ganancia_aire):
+        self.Kp = np.asarray(Kp, dtype=float)
+        self.Ki = np.asarray(Ki, dtype=float)
+        self.scan_time_s = scan_time_s
+        self.tau_s = tau_s
+        self.ganancia_planta = ganancia_planta
+        self.ganancia_sensor = ganancia_sensor
+        self.ganancia_aire = ganancia_aire
+        self.alpha = scan_time_s / tau_s
+        # Ganancia del lazo sin el controlador: planta * sensor * α (V por ms de pulso)
+        self.g = self.alpha * ganancia_planta * ganancia_sensor
+
+    def matrices(self):
+        """ A, B (forma (..., 2, 2)) y C, D (forma (..., 4, 2)), salidas en el orden de SALIDAS """
+        dt, a, g = self.scan_time_s, self.alpha, self.g
+        kp, ki = np.broadcast_arrays(self.Kp, self.Ki)
+        c1 = kp + ki * dt  # Ganancia del PI sobre el error del scan
+        forma = kp.shape
+        A = np.empty(forma + (2, 2))
+        A[..., 0, 0], A[..., 0, 1] = 1.0, -dt
+        A[..., 1, 0], A[..., 1, 1] = g * ki, (1.0 - a) - g * c1
+        B = np.empty(forma + (2, 2))
+        B[..., 0, 0], B[..., 0, 1] = dt, 0.0
+        # El setpoint entra por el controlador y por el centro de la curva del sensor
+        B[..., 1, 0], B[..., 1, 1] = g * c1 + a, a * self.ganancia_sensor * self.ganancia_aire
+
+        gp, ga = self.ganancia_planta, self.ganancia_aire
+        C = np.zeros(forma + (4, 2))
+        D = np.zeros(forma + (4, 2))
+        # pulse_width: u = Ki I + c1 (r - v)
+        C[..., 2, 0], C[..., 2, 1], D[..., 2, 0] = ki, -c1, c1
+        # lambda: gp u + ga caudal
+        C[..., 0, :], D[..., 0, 0], D[..., 0, 1] = gp * C[..., 2, :], gp * c1, ga
+        # voltaje_sonda: voltaje medido al final del scan (el próximo estado)
+        C[..., 1, :], D[..., 1, :] = A[..., 1, :], B[..., 1, :]
+        # error: r - v del scan anterior
+        C[..., 3, 1], D[..., 3, 0] = -1.0, 1.0
+        return A, B, C, D
+
+    def _polinomio(self, k=1.0):
+        """ Coeficientes de z² + a1 z + a0 del lazo cerrado con las ganancias escaladas por k """
+        dt, a, g = self.scan_time_s, self.alpha, self.g
+        a1 = k * g * (self.Kp + self.Ki * dt) - (2.0 - a)
+        a0 = (1.0 - a) - k * g * self.Kp
+        return a1, a0
+
+    def polos(self):
+        """ Polos de lazo cerrado (forma (..., 2), complejos) """
+        a1, a0 = self._polinomio()
+        raiz = np.sqrt((a1 * a1 - 4.0 * a0).astype(complex))
+        return np.stack(np.broadcast_arrays((-a1 + raiz) / 2.0, (-a1 - raiz) / 2.0), axis=-1)
+
+    def radio_espectral(self):
+        return np.abs(self.polos()).max(axis=-1)
+
+    def estable(self):
+        """ Condiciones de Jury para z² + a1 z + a0: |a0| < 1 y 1 ± a1 + a0 > 0 """
+        a1, a0 = self._polinomio()
+        return (np.abs(a0) < 1.0) & (1.0 + a1 + a0 > 0.0) & (1.0 - a1 + a0 > 0.0)
+
+    def abierto(self, z):
+        """ Ganancia de lazo L(z) = C(z) P(z) z^-1 (cortando en el error) """
+        dt, b = self.scan_time_s, 1.0 - self.alpha
+        controlador = self.Kp + self.Ki * dt * z / (z - 1.0)
+        return controlador * self.g / (z - b)
+
+    def margenes(self):
+        """
+        Margen de ganancia (factor y dB) con su frecuencia de cruce de fase, y margen de fase
+        (grados) con su frecuencia de cruce de ganancia. Todo en forma cerrada:
+            - ganancia: el menor factor k sobre Kp y Ki que viola una condición de Jury,
+            - fase: |L(e^jw)| = 1 es una cuadrática en cos(w); sin cruce, NaN si |L| > 1 en
+              todas las frecuencias (infinito si |L| < 1).
+        """
+        dt, a, g = self.scan_time_s, self.alpha, self.g
+        kp, ki = np.broadcast_arrays(self.Kp, self.Ki)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Con ganancias positivas 1 + a1 + a0 = k g Ki Ts > 0 y a0 < 1 siempre: la única
+            # condición que se viola al subir k es el polo en z = -1 (1 - a1 + a0 = 0), en w = π
+            # ->  k = (4 - 2a) / (g (2 Kp + Ki Ts))
+            k_limite = np.where(g * (2.0 * kp + ki * dt) > 0, (4.0 - 2.0 * a) / (g * (2.0 * kp + ki * dt)), np.inf)
+
+            # |N|² = |D|² con c = cos(w):  4b c² + (2K² c1 Kp - 2(1+b)²) c + 2(1+b²) - K²(c1² + Kp²) = 0
+            b, c1 = 1.0 - a, kp + ki * dt
+            k2 = g * g
+            qa = np.full(kp.shape, 4.0 * b)
+            qb = 2.0 * k2 * c1 * kp - 2.0 * (1.0 + b) ** 2
+            qc = 2.0 * (1.0 + b * b) - k2 * (c1 * c1 + kp * kp)
+            if b != 0.0:
+                disc = np.sqrt((qb * qb - 4.0 * qa * qc).astype(complex))
+                raices = [(-qb + disc) / (2.0 * qa), (-qb - disc) / (2.0 * qa)]
+            else:
+                raices = [(-qc / qb).astype(complex)]
+            # Sin cruce de ganancia: infinito si |L| < 1 en todas las frecuencias, NaN si |L| > 1
+            margen_fase = np.where(np.abs(self.abierto(np.full(kp.shape, -1.0))) < 1.0, np.inf, np.nan)
+            w_ganancia = np.full(kp.shape, np.nan)
+            for c in raices:
+                valida = (np.abs(c.imag) < 1e-12) & (c.real >= -1.0) & (c.real < 1.0)
+                w = np.arccos(np.clip(c.real, -1.0, 1.0))
+                fase = np.degrees(np.angle(self.abierto(np.exp(1j * np.where(valida, w, np.pi / 2)))))
+                margen = np.mod(fase, 360.0) - 180.0  # 180° + fase, llevado a [-180, 180)
+                mejor = valida & ~(margen >= margen_fase)  # Con varios cruces, el peor
+                margen_fase = np.where(mejor, margen, margen_fase)
+                w_ganancia = np.where(mejor, w / dt, w_ganancia)
+
+        return {
+            "margen_ganancia": k_limite,
+            "margen_ganancia_db": 20.0 * np.log10(k_limite),
+            "frecuencia_cruce_fase_hz": np.where(np.isfinite(k_limite), 0.5 / dt, np.nan),
+            "margen_fase_deg": margen_fase,
+            "frecuencia_cruce_ganancia_hz": w_ganancia / (2.0 * np.pi),
+        }
+
+    def bode(self, frecuencias_hz=None):
+        """ Respuesta en frecuencia del lazo abierto L y del lazo cerrado setpoint -> voltaje """
+        if frecuencias_hz is None:
+            nyquist = 0.5 / self.scan_time_s
+            frecuencias_hz = np.logspace(np.log10(nyquist) - 3.0, np.log10(nyquist), 400)
+        frecuencias_hz = np.asarray(frecuencias_hz, dtype=float)
+        z = np.exp(2j * np.pi * frecuencias_hz * self.scan_time_s)
+        z = z.reshape(z.shape + (1,) * np.ndim(self.Kp + self.Ki))
+        abierto = self.abierto(z)
+        # v/r = (C P + F) / (1 + C P z^-1), con F = α z / (z - b) el filtro del sensor (setpoint en la curva)
+        cerrado = z * (abierto + self.alpha / (z - (1.0 - self.alpha))) / (1.0 + abierto)
+        return {
+            "frecuencia_hz": frecuencias_hz,
+            "abierto_db": 20.0 * np.log10(np.abs(abierto)),
+            "abierto_fase_deg": np.degrees(np.unwrap(np.angle(abierto), axis=0)),
+            "cerrado_db": 20.0 * np.log10(np.abs(cerrado)),
+            "cerrado_fase_deg": np.degrees(np.unwrap(np.angle(cerrado), axis=0)),
+        }
+
+    def respuesta_escalon(self, n_scans, entrada="setpoint", amplitud=1.0):
+        """
+        Respuesta a un escalón en la entrada ('setpoint' en V o 'caudal_aire' en g/s), desde el
+        equilibrio. Devuelve el tiempo y los desvíos de cada salida (forma (n_scans, ...)).
+        """
+        A, B, C, D = self.matrices()
+        w = np.zeros(2)
+        w[ENTRADAS.index(entrada)] = amplitud
+        bw = B @ w  # (..., 2)
+        dw = D @ w  # (..., 4)
+        x = np.zeros(A.shape[:-1])
+        salidas = np.empty((n_scans,) + dw.shape)
+        for k in range(n_scans):
+            salidas[k] = np.einsum("...ij,...j->...i", C, x) + dw
+            x = np.einsum("...ij,...j->...i", A, x) + bw
+        resultado = {"time": self.scan_time_s * np.arange(1, n_scans + 1)}
+        for i, nombre in enumerate(SALIDAS):
+            resultado[nombre] = salidas[..., i]
+        return resultado
+
+
+def linealizar(sim, Kp=None, Ki=None, tau_s=None):
+    """
+    Modelo lineal del simulador (Kp y Ki del simulador salvo que se indiquen, escalares
+    o arreglos). tau_s: constante de tiempo del sensor (por defecto, la más lenta).
+    """
+    punto = punto_operacion(sim)
+    return ModeloLineal(sim.Kp if Kp is None else Kp, sim.Ki if Ki is None else Ki, sim.scan_time_s,
+                        max(sim.tau_rica_pobre_s, sim.tau_pobre_rica_s) if tau_s is None else tau_s,
+                        punto["ganancia_planta"], punto["ganancia_sensor"], punto["ganancia_aire"])
+
+
+def modelos(sim, Kp=None, Ki=None):
+    """ Un modelo por cada constante de tiempo del sensor: {"rica_pobre": ..., "pobre_rica": ...} """
+    return {"rica_pobre": linealizar(sim, Kp, Ki, sim.tau_rica_pobre_s),
+            "pobre_rica": linealizar(sim, Kp, Ki, sim.tau_pobre_rica_s)}
+
+
+def mapa_estabilidad(sim, kp, ki):
+    """
+    Evalúa la grilla Kp x Ki completa (vectorizado) con ambas constantes de tiempo del sensor.
+    Devuelve las grillas Kp y Ki (forma (len(kp), len(ki))) y, para cada punto, el peor caso:
+    estable (con las dos tau), radio espectral, margen de ganancia (dB) y margen de fase (grados).
+    """
+    KP, KI = np.meshgrid(np.asarray(kp, dtype=float), np.asarray(ki, dtype=float), indexing="ij")
+    resultado = {"Kp": KP, "Ki": KI}
+    por_tau = [(m.estable(), m.radio_espectral(), m.margenes()) for m in modelos(sim, KP, KI).values()]
+    resultado["estable"] = np.logical_and.reduce([estable for estable, _, _ in por_tau])
+    resultado["radio_espectral"] = np.maximum.reduce([radio for _, radio, _ in por_tau])
+    resultado["margen_ganancia_db"] = np.minimum.reduce([m["margen_ganancia_db"] for _, _, m in por_tau])
+    resultado["margen_fase_deg"] = np.minimum.reduce([m["margen_fase_deg"] for _, _, m in por_tau])
+    return resultado
@@ -0,0 +1,257 @@
+"""
+Servidor de telemetría (asyncio, TCP local): un simulador, muchos clientes mirando la misma corrida.
+
+El servidor avanza el simulador al ritmo del reloj (o 'velocidad' veces más rápido) con
+step_many() cada 'periodo_s' y difunde las muestras de cada bloque a todos los clientes
+conectados. Solo acepta conexiones desde la máquina local (loopback).
+
+Frames (servidor -> cliente), binarios: FRAME (largo del resto, tipo) y luego
+    - HOLA (JSON): canales, scan_time_s y parámetros, al conectarse,
+    - MUESTRAS: MUESTRAS_ENCABEZADO (primer scan, cantidad, paso y tiempo de la primera
+      muestra) y los canales del HOLA (todos menos el tiempo) como float32, canal por canal;
+      la muestra i corresponde al tiempo t + i * paso * scan_time_s,
+    - RESPUESTA (JSON): resultado de cada comando ({"ok": true, ...} o {"ok": false, "error": ...}).
+
+Comandos (cliente -> servidor): una línea JSON por comando.
+    {"comando": "perturbacion", "amplitud": 2.0, "inicio": 5, "duracion": 5}
+    {"comando": "controlador", "kp": 3, "ki": 6, "setpoint": 0.45}
+    {"comando": "decimacion", "paso": 5}      (una muestra de cada 5 scans para este cliente)
+    {"comando": "politica", "politica": "descartar_nuevos"}
+    {"comando": "estadisticas"} / {"comando": "parametros"}
+perturbacion y controlador son los mismos cambios que los botones de la GUI.
+
+Cada cliente tiene una cola acotada de frames que un task propio escribe al socket. El
+bucle de scans nunca espera a un cliente: si la cola está llena, la política del cliente
+decide si se descarta el frame más viejo (por defecto), el nuevo, o se desconecta al cliente.
+"""
+import asyncio
+import ipaddress
+import json
+import struct
+import time
+
+import numpy as np
+
+from sonda_lambda.simulador import BLOQUE_STEP_MANY
+
+FRAME = struct.Struct("<IB")  # largo (tipo + datos), tipo
+MUESTRAS_ENCABEZADO = struct.Struct("<QHHd")  # primer scan, muestras, paso, tiempo de la primera (s)
+
+HOLA, MUESTRAS, RESPUESTA = 0, 1, 2
+
+POLITICAS = ("descartar_viejos", "descartar_nuevos", "desconectar")
+
+PUERTO = 8765
+PERIODO_S = 0.05  # Cada cuánto se simula y se difunde un bloque
+COLA_FRAMES = 64  # Frames pendientes por cliente
+LIMITE_ESCRITURA = 64 * 1024  # Bytes en el buffer del socket antes de que drain() espere
+
+
+def frame(tipo, datos):
+    return FRAME.pack(len(datos) + 1, tipo) + datos
+
+
+def frame_json(tipo, objeto):
+    return frame(tipo, json.dumps(objeto).encode("utf-8"))
+
+
+async def leer_frame(reader):
+    """ Lee un frame del servidor: (tipo, datos) """
+    largo, tipo = FRAME.unpack(await reader.readexactly(FRAME.size))
+    return tipo, await reader.readexactly(largo - 1)
+
+
+def decodificar_muestras(datos, n_canales):
+    """ Datos de un frame MUESTRAS -> (primer scan, paso, tiempo de la primera muestra, arreglo n_canales x muestras) """
+    primero, n, paso, t = MUESTRAS_ENCABEZADO.unpack_from(datos)
+    valores = np.frombuffer(datos, dtype="<f4", offset=MUESTRAS_ENCABEZADO.size).reshape(n_canales, n)
+    return primero, paso, t, valores
+
+
+class _Cliente:
+    def __init__(self, writer, politica):
+        self.writer = writer
+        self.direccion = writer.get_extra_info("peername")
+        self.cola = asyncio.Queue(COLA_FRAMES)
+        self.politica = politica
+        self.paso = 1
+        self.enviados = 0
+        self.descartados = 0
+
+    def encolar(self, datos):
+        """ Encola sin esperar; con la cola llena aplica la política. False: desconectar """
+        if self.cola.full():
+            self.descartados += 1
+            if self.politica == "desconectar":
+                return False
+            if self.politica == "descartar_nuevos":
+                return True
+            self.cola.get_nowait()
+        self.cola.put_nowait(datos)
+        return True
+
+
+class ServidorTelemetria:
+    def __init__(self, sim, host="127.0.0.1", puerto=PUERTO, velocidad=1.0, periodo_s=PERIODO_S,
+                 politica="descartar_viejos"):
+        if politica not in POLITICAS:
+            raise ValueError(f"Política desconocida: {politica!r} (políticas: {', '.join(POLITICAS)})")
+        self.sim = sim
+        self.host = host
+        self.puerto = puerto
+        self.velocidad = velocidad
+        self.periodo_s = periodo_s
+        self.politica = politica
+        self.canales = tuple(canal for canal in sim.CANALES_HISTORIAL if canal != "time")
+        self.clientes = set()
+        self.scans = 0  # Scans simulados desde que arrancó el servidor
+        self.rechazados = 0  # Conexiones no locales
+        self._servidor = None
+        self._detener = None
+        self._tareas = set()  # Tasks de atención de los clientes
+
+    async def iniciar(self):
+        """ Empieza a aceptar conexiones (con puerto=0 el sistema elige uno: ver self.puerto) """
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.puerto)
+        self.puerto = self._servidor.sockets[0].getsockname()[1]
+        self._detener = asyncio.Event()
+
+    def detener(self):
+        if self._detener is not None:
+            self._detener.set()
+
+    async def correr(self, duracion_s=None):
+        """ Simula y difunde hasta detener() o duracion_s de tiempo simulado; luego cierra todo """
+        if self._servidor is None:
+            await self.iniciar()
+        sim = self.sim
+        dt = sim.scan_time_s
+        n_final = None if duracion_s is None else int(round(duracion_s / dt))
+        inicio = time.monotonic()
+        try:
+            while not self._detener.is_set() and (n_final is None or self.scans < n_final):
+                # Scans que corresponden al reloj (como mucho un bloque por vuelta)
+                debidos = int((time.monotonic() - inicio) * self.velocidad / dt)
+                if n_final is not None:
+                    debidos = min(debidos, n_final)
+                m = min(debidos - self.scans, BLOQUE_STEP_MANY)
+                if m > 0:
+                    salidas = sim.step_many(m)
+                    self._difundir(salidas)
+                    self.scans += m
+                try:
+                    await asyncio.wait_for(self._detener.wait(), self.periodo_s)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self.cerrar()
+
+    async def cerrar(self):
+        self._servidor.close()
+        # Al cerrar el socket, la lectura de comandos de cada cliente termina sola
+        for cliente in list(self.clientes):
+            self._desconectar(cliente)
+        await asyncio.gather(*self._tareas, return_exceptions=True)
+        await self._servidor.wait_closed()
+
+    def _difundir(self, salidas):
+        """ Encola el bloque a cada cliente; un frame por paso de decimación distinto """
+        if not self.clientes:
+            return
+        valores = np.array([salidas[canal] for canal in self.canales], dtype="<f4")
+        frames = {}
+        for cliente in list(self.clientes):
+            paso = cliente.paso
+            if paso not in frames:
+                # Muestras de los scans múltiplos del paso, así todos los bloques quedan alineados
+                desde = -self.scans % paso
+                seleccion = valores[:, desde::paso]
+                frames[paso] = frame(MUESTRAS, MUESTRAS_ENCABEZADO.pack(
+                    self.scans + desde, seleccion.shape[1], paso, float(salidas["time"][desde]))
+                    + np.ascontiguousarray(seleccion).tobytes()) if seleccion.shape[1] else None
+            if frames[paso] is not None and not cliente.encolar(frames[paso]):
+                self._desconectar(cliente)
+
+    def _desconectar(self, cliente):
+        self.clientes.discard(cliente)
+        # abort() descarta lo pendiente: close() esperaría a que un cliente lento lea todo
+        cliente.writer.transport.abort()
+
+    async def _atender(self, reader, writer):
+        direccion = writer.get_extra_info("peername")
+        if not ipaddress.ip_address(direccion[0]).is_loopback:
+            self.rechazados += 1
+            writer.close()
+            return
+        writer.transport.set_write_buffer_limits(high=LIMITE_ESCRITURA)
+        cliente = _Cliente(writer, self.politica)
+        cliente.encolar(frame_json(HOLA, {"canales": list(self.canales), "scan_time_s": self.sim.scan_time_s,
+                                          "parametros": self.sim.parametros()}))
+        self.clientes.add(cliente)
+        tarea = asyncio.current_task()
+        self._tareas.add(tarea)
+        escritor = asyncio.create_task(self._escribir(cliente))
+        try:
+            while True:
+                try:
+                    linea = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    # Línea más larga que el límite del stream: se descarta el cliente sin traceback
+                    break
+                if not linea:
+                    break
+                if not cliente.encolar(frame_json(RESPUESTA, self._comando(cliente, linea))):
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            escritor.cancel()
+            self._desconectar(cliente)
+            self._tareas.discard(tarea)
+
+    async def _escribir(self, cliente):
+        try:
+            while True:
+                datos = await cliente.cola.get()
+                cliente.writer.write(datos)
+                await cliente.writer.drain()
+                cliente.enviados += 1
+        except ConnectionError:
+            self._desconectar(cliente)
+
+    def _comando(self, cliente, linea):
+        """ Aplica un comando (línea JSON) y devuelve la respuesta """
+        try:
+            comando = json.loads(linea)
+            if not isinstance(comando, dict):
+                raise ValueError("El comando debe ser un objeto JSON.")
+            nombre = comando.get("comando")
+            if nombre == "perturbacion":
+                self.sim.configurar_perturbacion(comando["amplitud"], comando["inicio"], comando["duracion"])
+            elif nombre == "controlador":
+                self.sim.configurar_controlador(comando["kp"], comando["ki"], comando["setpoint"])
+            elif nombre == "decimacion":
+                paso = int(comando["paso"])
+                if not 1 <= paso <= 0xFFFF:
+                    raise ValueError("El paso de decimación debe estar entre 1 y 65535.")
+                cliente.paso = paso
+            elif nombre == "politica":
+                if comando["politica"] not in POLITICAS:
+                    raise ValueError(f"Política desconocida (políticas: {', '.join(POLITICAS)}).")
+                cliente.politica = comando["politica"]
+            elif nombre == "estadisticas":
+                return {"ok": True, "comando": nombre, "estadisticas": self.sim.estadisticas.resumen()}
+            elif nombre != "parametros":
+                raise ValueError(f"Comando desconocido: {nombre!r}")
+            return {"ok": True, "comando": nombre, "parametros": self.sim.parametros()}
+        except KeyError as e:
+            return {"ok": False, "error": f"Falta el campo {e}"}
+        except (ValueError, TypeError) as e:
+            return {"ok": False, "error": str(e)}
+
+    def resumen(self):
+        """ Scans simulados y, por cliente, frames enviados y descartados """
+        return {"scans": self.scans, "rechazados": self.rechazados,
+                "clientes": [{"direccion": f"{c.direccion[0]}:{c.direccion[1]}", "paso": c.paso,
+                              "politica": c.politica, "enviados": c.enviados, "descartados": c.descartados}
+                             for c in self.clientes]}
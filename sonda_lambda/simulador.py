@@ -0,0 +1,789 @@
+import logging
+from array import array
+
+import numpy as np
+
+from sonda_lambda import checkpoint, escenarios, eventos
+from sonda_lambda.estadisticas import EstadisticasLazo
+from sonda_lambda.historial import HistorialCircular
+
+# Muestras de historial retenidas en memoria por defecto (5 minutos a 50 Hz)
+CAPACIDAD_HISTORIAL = 15000
+
+# Scans por bloque de ruido pregenerado en step_many()
+BLOQUE_STEP_MANY = 8192
+
+# Scans por bloque de ruido pregenerado en el lote con un generador por instancia
+BLOQUE_RUIDO_LOTE = 256
+
+
+def semillas_por_instancia(seed, n):
+    """
+    n semillas independientes derivadas de seed (SeedSequence.spawn), para
+    SondaLambdaBatchSimulator(n, semillas=...): la instancia i del lote reproduce
+    exactamente a SondaLambdaSimulator(seed=semillas[i]).
+    """
+    return np.random.SeedSequence(seed).spawn(n)
+
+
+class SondaLambdaSimulator:
+    SCAN_TIME_MS = 20  # Tiempo de scan por defecto de la ECU
+
+    # Parámetros configurables (desde la GUI, la CLI o un archivo de configuración)
+    PARAMETROS = (
+        "scan_time_ms",
+        "setpoint_v", "Kp", "Ki", "integral_max",
+        "base_pulse_width_ms", "min_pulse_width_ms", "max_pulse_width_ms", "K_injector",
+        "caudal_aire_base_gs", "stoich_ratio", "rpm", "temperatura_ambiente_c", "presion_atmosferica_hpa",
+        "perturbacion_amplitud", "perturbacion_inicio", "perturbacion_duracion",
+        "pert_comb_calidad", "pert_ruido_emi_v",
+        "tau_rica_pobre_s", "tau_pobre_rica_s",
+    )
+
+    # Canal -> lista de historial (nombres usados al exportar la corrida)
+    CANALES_HISTORIAL = {
+        "time": "time_history",
+        "setpoint": "setpoint_history",
+        "voltaje_sonda": "voltaje_sonda_history",
+        "pulse_width": "pulse_width_history",
+        "caudal_aire": "caudal_aire_history",
+        "lambda": "lambda_history",
+        "o2_percent": "o2_percent_history",
+        "error": "error_history",
+        "accion_p": "accion_p_history",
+        "accion_i": "accion_i_history",
+        "perturbacion_aplicada": "perturbacion_aplicada_history",
+    }
+
+    def __init__(self, seed=None, capacidad_historial=CAPACIDAD_HISTORIAL, archivo_historial=None,
+                 **parametros):
+        # --- Parámetros de Simulación ---
+        self.scan_time_ms = self.SCAN_TIME_MS  # Tiempo de scan de la ECU (20 ms)
+        self.scan_time_s = self.scan_time_ms / 1000.0
+        self.current_time = 0
+
+        # --- Parámetros de Control (Controlador PI) ---
+        self.setpoint_v = 0.45  # Setpoint (0.45V) - Punto estequiométrico (λ=1)
+        self.Kp = 3.0  # Ganancia Proporcional (ajustada para respuesta rápida)
+        self.Ki = 6.0  # Ganancia Integral (alta para forzar oscilación controlada)
+        self.integral_term = 0.0
+        self.integral_max = 2.5  # Límite Anti-Windup
+
+        # --- Parámetros del Actuador (Inyector) ---
+        self.base_pulse_width_ms = 4.0  # Pulso base (ms) en ralentí
+        self.min_pulse_width_ms = 1.5  # Límite mínimo de inyección
+        self.max_pulse_width_ms = 8.0  # Límite máximo de inyección
+        self.pulse_width_ms = self.base_pulse_width_ms
+        # K_injector ajustado para que el sistema inicie cerca del equilibrio
+        # Con 10 g/s de aire, necesitamos 10/14.7 = 0.68 g/s de combustible para λ=1
+        # Con pulso base de 4ms: K = 0.68/4 = 0.17 g/s por ms
+        self.K_injector = 0.165  # Ganancia (g/s por ms de pulso)
+
+        # --- Parámetros de la Planta (Motor) ---
+        self.caudal_aire_base_gs = 10.0  # Caudal de aire base (gramos/segundo)
+        self.stoich_ratio = 14.7  # Relación Estequiométrica (14.7 g aire / 1 g comb.)
+        self.rpm = 800  # RPM del motor (ralentí)
+        self.temperatura_ambiente_c = 20.0  # Temperatura ambiente (°C)
+        self.presion_atmosferica_hpa = 1013.0  # Presión atmosférica (hPa) - nivel del mar
+
+        # --- Parámetros de Perturbación (Editables desde GUI) ---
+        self.perturbacion_amplitud = 0.0  # Amplitud de la perturbación (g/s de aire)
+        self.perturbacion_inicio = 5.0  # Tiempo de inicio de la perturbación (s)
+        self.perturbacion_duracion = 5.0  # Duración de la perturbación (s)
+        self.pert_comb_calidad = 1.0  # 1.0 = ideal, 0.9 = 10% peor (fijo)
+        self.pert_ruido_emi_v = 0.015  # Ruido de +/- 15mV (20-30mV p-p según TP)
+        # Escenario precompilado (opcional, ver cargar_escenario): se suma al escalón anterior
+        self.escenario = None
+        self._escenario_t0 = 0.0
+
+        # --- Parámetros del Sensor (Sonda Lambda Bosch LSH-25) ---
+        # Constantes de tiempo asimétricas del sensor (según TP)
+        self.tau_rica_pobre_s = 0.050  # 50ms (Rica -> Pobre, 0.8V -> 0.2V)
+        self.tau_pobre_rica_s = 0.080  # 80ms (Pobre -> Rica, 0.2V -> 0.8V)
+
+        # --- Variables de Estado y Retardo ---
+        # Voltaje ideal instantáneo (sin retardo del sensor)
+        self.voltaje_sonda_ideal = 0.45
+        # Voltaje con dinámica del sensor (filtrado)
+        self.voltaje_sonda_filtrado = 0.45
+        # Voltaje de realimentación (con ruido)
+        self.voltaje_sonda_realimentacion = 0.45
+        # Estado anterior para detectar transiciones
+        self.voltaje_anterior = 0.45
+
+        # --- Generador de números aleatorios (ruido de aire y EMI) ---
+        # Con la misma semilla la corrida es reproducible
+        self.rng = np.random.default_rng(seed)
+
+        # --- Registro de eventos (opcional, ver sonda_lambda.eventos) ---
+        self.eventos = None
+        self._estado_evento = None  # Última mezcla informada (RICA/POBRE)
+        self._mezcla_evento = None  # Mezcla actual con histéresis (RICA/POBRE), todavía sin informar
+        self._t_mezcla_evento = 0.0  # Desde cuándo se mantiene esa mezcla
+        self._perturbacion_evento = 0.0  # Última perturbación informada
+        self._saturacion_evento = None  # Límite del pulso alcanzado (mínimo/máximo) o None
+
+        # --- Perfilado por etapas (opcional, ver sonda_lambda.perfil) ---
+        self.perfil = None
+
+        # --- Parámetros personalizados ---
+        if parametros:
+            self.configurar(**parametros)
+            self.pulse_width_ms = self.base_pulse_width_ms
+
+        # --- Historial para Gráficos ---
+        # Buffer circular de capacidad fija: la memoria no crece con la duración de la corrida.
+        # Con archivo_historial, además se vuelca todo a un archivo de telemetría.
+        self.historial = HistorialCircular(self.CANALES_HISTORIAL, capacidad_historial,
+                                           archivo=archivo_historial,
+                                           metadatos={"parametros": self.parametros()})
+
+        # --- Estadísticas de lazo cerrado en línea (O(1) por scan; None para desactivarlas) ---
+        self.estadisticas = EstadisticasLazo()
+
+    def configurar(self, **parametros):
+        """ Actualiza parámetros del simulador por nombre """
+        desconocidos = set(parametros) - set(self.PARAMETROS)
+        if desconocidos:
+            raise ValueError(f"Parámetros desconocidos: {', '.join(sorted(desconocidos))}")
+        for nombre, valor in parametros.items():
+            setattr(self, nombre, valor)
+        if "scan_time_ms" in parametros:
+            self.scan_time_s = self.scan_time_ms / 1000.0
+
+    def configurar_perturbacion(self, amplitud, inicio, duracion):
+        """ Escalón de aire (g/s) en [inicio, inicio + duracion), como el panel de perturbaciones de la GUI """
+        # Se valida todo antes de asignar: un valor inválido no deja la perturbación a medias
+        amplitud, inicio, duracion = float(amplitud), float(inicio), float(duracion)
+        if not np.isfinite(amplitud):
+            raise ValueError("La amplitud de la perturbación debe ser un número.")
+        if not (inicio >= 0 and duracion >= 0):
+            raise ValueError("El inicio y la duración de la perturbación deben ser valores positivos.")
+        self.perturbacion_amplitud = amplitud
+        self.perturbacion_inicio = inicio
+        self.perturbacion_duracion = duracion
+
+    def configurar_controlador(self, kp, ki, setpoint):
+        """ Ganancias y setpoint del PI, con los rangos que acepta la GUI; reinicia las estadísticas """
+        kp, ki, setpoint = float(kp), float(ki), float(setpoint)
+        if kp < 0 or ki < 0:
+            raise ValueError("Kp y Ki deben ser valores positivos.")
+        if setpoint < 0.0 or setpoint > 1.0:
+            raise ValueError("El setpoint debe estar entre 0.0V y 1.0V.")
+        self.Kp = kp
+        self.Ki = ki
+        self.setpoint_v = setpoint
+        # Las estadísticas describen al controlador actual: se reinician con los nuevos parámetros
+        if self.estadisticas is not None:
+            self.estadisticas.reiniciar()
+
+    def parametros(self):
+        """ Devuelve los valores actuales de los parámetros configurables """
+        return {nombre: getattr(self, nombre) for nombre in self.PARAMETROS}
+
+    def cerrar(self):
+        """ Termina de escribir el archivo de historial, si hay uno """
+        self.historial.cerrar()
+
+    def cargar_escenario(self, escenario, duracion_s=None):
+        """
+        Carga un escenario de perturbaciones (ruta a un JSON, dict o EscenarioCompilado, ver
+        sonda_lambda.escenarios), que empieza en el tiempo actual. None quita el escenario.
+        """
+        if escenario is not None and not isinstance(escenario, escenarios.EscenarioCompilado):
+            if isinstance(escenario, str):
+                escenario = escenarios.cargar(escenario)
+            escenario = escenarios.compilar(escenario, self, duracion_s)
+        self.escenario = escenario
+        self._escenario_t0 = self.current_time
+        return escenario
+
+    def checkpoint(self, historial=0):
+        """ Checkpoint del estado dinámico (ver sonda_lambda.checkpoint), con las últimas 'historial' muestras """
+        return checkpoint.tomar(self, historial)
+
+    def restaurar(self, estado, parametros=True, seed=None, reiniciar_tiempo=False):
+        """ Continúa desde un checkpoint (dict, bytes o ruta a un .npz); ver checkpoint.restaurar() """
+        if isinstance(estado, bytes):
+            estado = checkpoint.desde_bytes(estado)
+        elif isinstance(estado, str):
+            estado = checkpoint.cargar(estado)
+        return checkpoint.restaurar(self, estado, parametros, seed, reiniciar_tiempo)
+
+    def historial_arrays(self, n=None):
+        """ Devuelve las últimas n muestras retenidas (todas si n es None) como vistas, por canal """
+        return self.historial.columnas(n)
+
+    def step(self, voltaje_medido=None):
+        """
+        Ejecuta un ciclo de control (scan); con self.perfil, mide cada etapa (ETAPAS_STEP).
+        voltaje_medido: lectura externa (V) que reemplaza a la del ADC en este scan (hardware
+        en el lazo): queda en el historial y el controlador la usa en el scan siguiente, con
+        el mismo retardo que la medición simulada.
+        """
+        perfil = self.perfil
+        if perfil is not None:
+            perfil.marcar_inicio()
+
+        # 1. CÁLCULO DEL CONTROLADOR (PI) - Implementado en la ECU
+        # El error se calcula con la medición del ciclo ANTERIOR (modelando el retardo digital)
+        error = self.setpoint_v - self.voltaje_sonda_realimentacion
+
+        # Acción Proporcional
+        accion_p = self.Kp * error
+
+        # Acción Integral (con anti-windup)
+        self.integral_term += error * self.scan_time_s
+        self.integral_term = max(-self.integral_max, min(self.integral_term, self.integral_max))
+        accion_i = self.Ki * self.integral_term
+
+        # Corrección total (en ms)
+        correccion_pi_ms = accion_p + accion_i
+
+        # Señal de control final (saturada) - DAC/PWM convierte a pulso temporal
+        self.pulse_width_ms = self.base_pulse_width_ms + correccion_pi_ms
+        self.pulse_width_ms = max(self.min_pulse_width_ms, min(self.pulse_width_ms, self.max_pulse_width_ms))
+        if perfil is not None:
+            perfil.marcar("controlador")
+
+        # 2. SIMULAR PERTURBACIONES
+        # Perturbación de Caudal de Aire (Externa)
+        # Condiciones fijas: temperatura 20°C, presión nivel del mar, ralentí
+        caudal_aire_base_gs = self.caudal_aire_base_gs
+
+        # Aplicar perturbación tipo escalón si estamos en el rango de tiempo especificado
+        perturbacion_actual = 0.0
+        if self.perturbacion_inicio <= self.current_time < (self.perturbacion_inicio + self.perturbacion_duracion):
+            perturbacion_actual = self.perturbacion_amplitud
+
+        # Escenario precompilado: lectura por índice, sin evaluar los eventos
+        calidad_combustible = self.pert_comb_calidad
+        if self.escenario is not None:
+            k = self.escenario.indice(self.current_time - self._escenario_t0)
+            perturbacion_actual += self.escenario.desvio_aire[k]
+            calidad_combustible = calidad_combustible * self.escenario.factor_calidad[k]
+
+        # Ruido aleatorio pequeño (simulando variaciones naturales del motor)
+        # Misma cuenta que rng.uniform(-0.05, 0.05) (mismos valores) sin su costo por llamada
+        ruido_aire = -0.05 + (0.05 - -0.05) * self.rng.random()
+
+        caudal_aire_actual_gs = caudal_aire_base_gs + perturbacion_actual + ruido_aire
+
+        # Perturbación de Calidad de Combustible (Interna)
+        # Se aplica como un factor de eficiencia al flujo de combustible
+        flujo_combustible_efectivo_gs = (self.pulse_width_ms * self.K_injector) * calidad_combustible
+        if perfil is not None:
+            perfil.marcar("perturbaciones")
+
+        # 3. SIMULAR PLANTA (PROCESO DE COMBUSTIÓN EN EL MOTOR)
+        # Calcular Lambda (λ = relación aire/combustible real / relación estequiométrica)
+        if flujo_combustible_efectivo_gs > 0:
+            lambda_real = (caudal_aire_actual_gs / flujo_combustible_efectivo_gs) / self.stoich_ratio
+        else:
+            lambda_real = 5.0  # Mezcla infinitamente pobre
+
+        # Calcular %O2 en los gases de escape (salida del motor)
+        # Aproximación: relación entre lambda y %O2 en el escape
+        # λ < 1 (rica): ~0.1-0.5% O2
+        # λ = 1 (estequiométrica): ~0.5% O2
+        # λ > 1 (pobre): 0.5-4% O2
+        if lambda_real < 1.0:
+            # Mezcla rica: poco oxígeno residual
+            o2_percent = 0.1 + 0.4 * lambda_real
+        else:
+            # Mezcla pobre: oxígeno residual aumenta linealmente
+            o2_percent = 0.5 + 3.5 * (lambda_real - 1.0)
+            o2_percent = min(o2_percent, 4.0)  # Limitar a 4%
+        if perfil is not None:
+            perfil.marcar("planta")
+
+        # 4. SIMULAR SENSOR (SONDA LAMBDA BOSCH LSH-25)
+        # 4a. Característica no lineal del sensor (curva sigmoide)
+        # Usamos tanh() para simular la curva "S" con salto brusco en λ=1
+        # Si λ < 1 (rica, poco O2) → voltaje ALTO (>0.45V)
+        # Si λ > 1 (pobre, mucho O2) → voltaje BAJO (<0.45V)
+        self.voltaje_sonda_ideal = self.setpoint_v + 0.45 * np.tanh(20.0 * (1.0 - lambda_real))
+        if perfil is not None:
+            perfil.marcar("sensor")
+
+        # 4b. Aplicar dinámica del sensor (constante de tiempo asimétrica)
+        # Determinar la constante de tiempo según la dirección del cambio
+        diferencia = self.voltaje_sonda_ideal - self.voltaje_sonda_filtrado
+
+        if diferencia > 0:  # Pobre -> Rica (voltaje subiendo)
+            tau_actual = self.tau_pobre_rica_s  # 80ms (más lento)
+        else:  # Rica -> Pobre (voltaje bajando)
+            tau_actual = self.tau_rica_pobre_s  # 50ms (más rápido)
+
+        # Filtro de primer orden: dy/dt = (entrada - salida) / tau
+        # Discretización: y[k] = y[k-1] + (Ts/tau) * (entrada - y[k-1])
+        alpha = self.scan_time_s / tau_actual
+        self.voltaje_sonda_filtrado += alpha * diferencia
+        if perfil is not None:
+            perfil.marcar("filtro")
+
+        # 4c. Perturbación de Ruido EMI (Interferencia electromagnética del sistema de ignición)
+        emi = self.pert_ruido_emi_v
+        ruido_emi = -emi + (emi - -emi) * self.rng.random()
+        voltaje_sonda_medido = self.voltaje_sonda_filtrado + ruido_emi
+        if voltaje_medido is not None:
+            # El ruido se sortea igual, así la secuencia aleatoria no depende de la entrada externa
+            voltaje_sonda_medido = voltaje_medido
+
+        # 5. ADC - Conversión Analógico-Digital
+        # El voltaje medido por el ADC es la realimentación para el próximo ciclo
+        self.voltaje_sonda_realimentacion = voltaje_sonda_medido
+        if perfil is not None:
+            perfil.marcar("emi_adc")
+
+        # 6. REGISTRAR HISTORIAL
+        self.current_time += self.scan_time_s
+        self.historial.agregar((
+            self.current_time,
+            self.setpoint_v,  # Entrada de referencia
+            self.voltaje_sonda_realimentacion,  # Elemento de medición
+            self.pulse_width_ms,  # Salida del controlador
+            caudal_aire_actual_gs,  # Caudal total
+            lambda_real,  # Salida del sistema
+            o2_percent,  # %O2 en gases de escape
+            error,  # Error
+            accion_p,
+            accion_i,
+            perturbacion_actual,  # Perturbación pura
+        ))
+
+        # Guardar estado anterior
+        self.voltaje_anterior = self.voltaje_sonda_filtrado
+        if perfil is not None:
+            perfil.marcar("historial")
+
+        # 7. ESTADÍSTICAS EN LÍNEA
+        if self.estadisticas is not None:
+            self.estadisticas.agregar(self.current_time, lambda_real, error, self.integral_term, self.integral_max)
+            if perfil is not None:
+                perfil.marcar("estadisticas")
+
+        # 8. EVENTOS (Opcional)
+        if self.eventos is not None:
+            self._registrar_eventos(self.current_time, self.voltaje_sonda_realimentacion, self.pulse_width_ms,
+                                    lambda_real, error, perturbacion_actual)
+            if perfil is not None:
+                perfil.marcar("eventos")
+
+        if perfil is not None:
+            perfil.contar("scans")
+
+    def _registrar_eventos(self, t, v_sonda, pulso, lambda_real, error, perturbacion):
+        """ Emite los eventos del scan: solo cuando cambia el estado, salvo la traza "scan" """
+        registro = self.eventos
+        # Mezcla con histéresis: dentro de la banda se mantiene la anterior
+        if v_sonda > self.setpoint_v + eventos.BANDA_ESTADO_V:
+            estado = "RICA"
+        elif v_sonda < self.setpoint_v - eventos.BANDA_ESTADO_V:
+            estado = "POBRE"
+        else:
+            estado = self._mezcla_evento
+        if estado != self._mezcla_evento:
+            self._mezcla_evento = estado
+            self._t_mezcla_evento = t
+
+        if registro.habilitado(eventos.SCAN, logging.DEBUG):
+            pert_msg = f"Pert: {perturbacion:.2f}g/s" if perturbacion != 0 else "Sin Pert."
+            registro.emitir(eventos.SCAN, logging.DEBUG,
+                            "T: %.2fs | %s | Estado: %s | V_sonda: %.3fV | Lambda: %.3f | Error: %.3fV | Pulso: %.2fms",
+                            t, pert_msg, estado, v_sonda, lambda_real, error, pulso)
+
+        # Se informa cuando la mezcla nueva se mantuvo el tiempo mínimo
+        if estado != self._estado_evento and t - self._t_mezcla_evento >= eventos.PERMANENCIA_ESTADO_S:
+            self._estado_evento = estado
+            registro.emitir(eventos.ESTADO, logging.INFO, "T: %.2fs | Mezcla %s | V_sonda: %.3fV | Lambda: %.3f",
+                            t, estado, v_sonda, lambda_real)
+
+        if perturbacion != self._perturbacion_evento:
+            if perturbacion != 0:
+                registro.emitir(eventos.PERTURBACION, logging.INFO, "T: %.2fs | Inicio de perturbación: %.2fg/s",
+                                t, perturbacion)
+            else:
+                registro.emitir(eventos.PERTURBACION, logging.INFO, "T: %.2fs | Fin de perturbación", t)
+            self._perturbacion_evento = perturbacion
+
+        if pulso >= self.max_pulse_width_ms:
+            saturacion = "máximo"
+        elif pulso <= self.min_pulse_width_ms:
+            saturacion = "mínimo"
+        else:
+            saturacion = None
+        if saturacion != self._saturacion_evento:
+            if saturacion is not None:
+                registro.emitir(eventos.SATURACION, logging.WARNING, "T: %.2fs | Pulso saturado en el %s (%.2fms)",
+                                t, saturacion, pulso)
+            else:
+                registro.emitir(eventos.SATURACION, logging.INFO, "T: %.2fs | Pulso fuera de saturación (%.2fms)",
+                                t, pulso)
+            self._saturacion_evento = saturacion
+
+    def _registrar_eventos_bloque(self, bloque):
+        """ Eventos de un bloque de step_many(): solo se recorren los scans donde algo puede emitirse """
+        canales = dict(zip(self.CANALES_HISTORIAL, bloque))
+        t, v_sonda, lambda_real, error = canales["time"], canales["voltaje_sonda"], canales["lambda"], canales["error"]
+        pulso, perturbacion = canales["pulse_width"], canales["perturbacion_aplicada"]
+
+        if self.eventos.habilitado(eventos.SCAN, logging.DEBUG):
+            for k in range(len(t)):
+                self._registrar_eventos(t[k], v_sonda[k], pulso[k], lambda_real[k], error[k], perturbacion[k])
+            return
+
+        # Mezcla con histéresis (1 rica, -1 pobre, 0 sin definir), como en _registrar_eventos
+        anterior = {"RICA": 1, "POBRE": -1, None: 0}[self._mezcla_evento]
+        mezcla = eventos.mezcla_con_histeresis(v_sonda, self.setpoint_v, anterior)
+        cambio_mezcla = mezcla != np.concatenate(([anterior], mezcla[:-1]))
+        ultimo_cambio = np.maximum.accumulate(np.where(cambio_mezcla, np.arange(len(t)), -1))
+        t_mezcla = np.where(ultimo_cambio >= 0, t[ultimo_cambio], self._t_mezcla_evento)
+        permanece = t - t_mezcla >= eventos.PERMANENCIA_ESTADO_S
+
+        saturacion = np.where(pulso >= self.max_pulse_width_ms, 1, np.where(pulso <= self.min_pulse_width_ms, -1, 0))
+        cambios = np.zeros(len(t), dtype=bool)
+        cambios[1:] = (perturbacion[1:] != perturbacion[:-1]) | (saturacion[1:] != saturacion[:-1]) \
+            | (permanece[1:] & ~permanece[:-1])  # Primer scan en que la mezcla cumple la permanencia
+        cambios[0] = True  # Se compara contra el estado anterior al bloque
+
+        # Los cambios de mezcla sin permanencia no emiten nada: en lugar de recorrerlos, antes de
+        # cada scan visitado se deja la mezcla con histéresis como quedó en el scan anterior
+        nombres = {1: "RICA", -1: "POBRE", 0: None}
+        for k in np.flatnonzero(cambios).tolist():
+            if k > 0:
+                self._mezcla_evento = nombres[int(mezcla[k - 1])]
+                self._t_mezcla_evento = float(t_mezcla[k - 1])
+            self._registrar_eventos(t[k], v_sonda[k], pulso[k], lambda_real[k], error[k], perturbacion[k])
+        self._mezcla_evento = nombres[int(mezcla[-1])]
+        self._t_mezcla_evento = float(t_mezcla[-1])
+
+    def step_many(self, n):
+        """
+        Ejecuta n scans seguidos y devuelve las salidas (canal -> arreglo de largo n).
+
+        Equivale bit a bit a llamar n veces a step() con la misma semilla: el ruido se
+        pregenera por bloques con el mismo generador (en el mismo orden: aire, EMI) y el
+        lazo trabaja con variables locales, escribiendo en arreglos preasignados.
+        """
+        salida = np.empty((len(self.CANALES_HISTORIAL), n))
+        perfil = self.perfil
+        hecho = 0
+        while hecho < n:
+            m = min(BLOQUE_STEP_MANY, n - hecho)
+            # Con self.perfil, el tiempo de cada etapa del bloque (ETAPAS_STEP_MANY)
+            if perfil is not None:
+                perfil.marcar_inicio()
+            bloque, integral = self._step_bloque(m)
+            if perfil is not None:
+                perfil.marcar("kernel")
+            self.historial.agregar_bloque(bloque)
+            if perfil is not None:
+                perfil.marcar("historial")
+            if self.estadisticas is not None:
+                self._agregar_estadisticas_bloque(bloque, integral)
+                if perfil is not None:
+                    perfil.marcar("estadisticas")
+            if self.eventos is not None:
+                self._registrar_eventos_bloque(bloque)
+                if perfil is not None:
+                    perfil.marcar("eventos")
+            if perfil is not None:
+                perfil.contar("scans", m)
+            salida[:, hecho:hecho + m] = bloque
+            hecho += m
+        return dict(zip(self.CANALES_HISTORIAL, salida))
+
+    def _agregar_estadisticas_bloque(self, bloque, integral):
+        canales = dict(zip(self.CANALES_HISTORIAL, bloque))
+        self.estadisticas.agregar_bloque(canales["time"], canales["lambda"], canales["error"], integral,
+                                         self.integral_max)
+
+    def _step_bloque(self, m):
+        """ Núcleo de step_many(): m scans, devuelve un arreglo (n_canales x m) y el término integral de cada scan """
+        dt = self.scan_time_s
+        setpoint = self.setpoint_v
+
+        # Todo lo que no depende del lazo se calcula vectorizado antes del bucle, con las
+        # mismas operaciones que step() (add.accumulate suma en orden, igual que current_time += dt)
+        tiempos = np.add.accumulate(np.concatenate(([self.current_time], np.full(m, dt))))
+        t_scan = tiempos[:-1]  # Tiempo al inicio de cada scan (ventana de perturbación)
+        en_ventana = ((self.perturbacion_inicio <= t_scan)
+                      & (t_scan < (self.perturbacion_inicio + self.perturbacion_duracion)))
+        perturbaciones = np.where(en_ventana, float(self.perturbacion_amplitud), 0.0)
+        if self.escenario is None:
+            calidades = [self.pert_comb_calidad] * m
+        else:
+            k = self.escenario.indices(t_scan - self._escenario_t0)
+            perturbaciones = perturbaciones + np.frombuffer(self.escenario.desvio_aire)[k]
+            calidades = (self.pert_comb_calidad * np.frombuffer(self.escenario.factor_calidad)[k]).tolist()
+        # Ruido: mismas operaciones que rng.uniform(low, high) escalar (low + (high - low) * u),
+        # intercalado aire/EMI como en step()
+        u = self.rng.random(2 * m)
+        emi = self.pert_ruido_emi_v
+        caudales = (self.caudal_aire_base_gs + perturbaciones + (-0.05 + (0.05 - -0.05) * u[0::2])).tolist()
+        ruidos_emi = (-emi + (emi - -emi) * u[1::2]).tolist()
+
+        # Parámetros y estado en variables locales
+        tanh = np.tanh
+        kp, ki = self.Kp, self.Ki
+        integral_max = self.integral_max
+        base_pulse, min_pulse, max_pulse = self.base_pulse_width_ms, self.min_pulse_width_ms, self.max_pulse_width_ms
+        k_injector, stoich = self.K_injector, self.stoich_ratio
+        alpha_subida, alpha_bajada = dt / self.tau_pobre_rica_s, dt / self.tau_rica_pobre_s
+
+        integral = self.integral_term
+        filtrado = self.voltaje_sonda_filtrado
+        realimentacion = self.voltaje_sonda_realimentacion
+        pulso = self.pulse_width_ms
+        ideal = self.voltaje_sonda_ideal
+
+        # Salidas preasignadas (array.array: asignación por elemento sin crear escalares de NumPy)
+        ceros = array("d", bytes(8 * m))
+        out_error, out_integral, out_pulso = array("d", ceros), array("d", ceros), array("d", ceros)
+        out_lambda, out_v = array("d", ceros), array("d", ceros)
+
+        for k in range(m):
+            # 1. Controlador PI con anti-windup
+            error = setpoint - realimentacion
+            integral += error * dt
+            if integral > integral_max:
+                integral = integral_max
+            elif integral < -integral_max:
+                integral = -integral_max
+            pulso = base_pulse + (kp * error + ki * integral)
+            if pulso > max_pulse:
+                pulso = max_pulse
+            elif pulso < min_pulse:
+                pulso = min_pulse
+
+            # 3. Planta
+            flujo = (pulso * k_injector) * calidades[k]
+            lambda_real = (caudales[k] / flujo) / stoich if flujo > 0 else 5.0
+
+            # 4. Sensor: curva no lineal, dinámica asimétrica y ruido EMI
+            ideal = setpoint + 0.45 * float(tanh(20.0 * (1.0 - lambda_real)))
+            diferencia = ideal - filtrado
+            filtrado += (alpha_subida if diferencia > 0 else alpha_bajada) * diferencia
+            realimentacion = filtrado + ruidos_emi[k]
+
+            out_error[k] = error
+            out_integral[k] = integral
+            out_pulso[k] = pulso
+            out_lambda[k] = lambda_real
+            out_v[k] = realimentacion
+
+        # Guardar estado
+        self.current_time = float(tiempos[-1])
+        self.integral_term = integral
+        self.voltaje_sonda_filtrado = filtrado
+        self.voltaje_sonda_realimentacion = realimentacion
+        self.voltaje_sonda_ideal = ideal
+        self.voltaje_anterior = filtrado
+        self.pulse_width_ms = pulso
+
+        # Canales derivados, vectorizados
+        error = np.frombuffer(out_error)
+        lambda_real = np.frombuffer(out_lambda)
+        o2_percent = np.where(lambda_real < 1.0, 0.1 + 0.4 * lambda_real,
+                              np.minimum(0.5 + 3.5 * (lambda_real - 1.0), 4.0))
+        integral = np.frombuffer(out_integral)
+        return np.array([
+            tiempos[1:],
+            np.full(m, float(setpoint)),
+            np.frombuffer(out_v),
+            np.frombuffer(out_pulso),
+            caudales,
+            lambda_real,
+            o2_percent,
+            error,
+            kp * error,
+            ki * integral,
+            perturbaciones,
+        ]), integral
+
+
+# Acceso compatible a los historiales por nombre (sim.lambda_history, ...) como vistas del buffer
+for _canal, _atributo in SondaLambdaSimulator.CANALES_HISTORIAL.items():
+    setattr(SondaLambdaSimulator, _atributo,
+            property(lambda self, canal=_canal: self.historial.ultimos(canal)))
+del _canal, _atributo
+
+
+class SondaLambdaBatchSimulator:
+    """ Ejecuta N lazos de control en paralelo (vectorizado con NumPy) """
+
+    # Parámetros que pueden tomar un valor distinto en cada instancia
+    PARAMETROS_POR_INSTANCIA = (
+        "setpoint_v", "Kp", "Ki", "integral_max",
+        "base_pulse_width_ms", "min_pulse_width_ms", "max_pulse_width_ms", "K_injector",
+        "caudal_aire_base_gs", "stoich_ratio",
+        "perturbacion_amplitud", "perturbacion_inicio", "perturbacion_duracion",
+        "pert_comb_calidad", "pert_ruido_emi_v",
+        "tau_rica_pobre_s", "tau_pobre_rica_s",
+    )
+
+    # Canales que puede devolver run()
+    CANALES = (
+        "setpoint", "voltaje_sonda", "pulse_width", "caudal_aire", "lambda",
+        "o2_percent", "error", "accion_p", "accion_i", "perturbacion_aplicada",
+    )
+
+    def __init__(self, n, seed=None, semillas=None, **parametros):
+        if n < 1:
+            raise ValueError("n debe ser al menos 1")
+        if semillas is not None and (seed is not None or len(semillas) != n):
+            raise ValueError(f"semillas debe tener {n} valores (una por instancia) y excluye a seed")
+        desconocidos = set(parametros) - set(self.PARAMETROS_POR_INSTANCIA)
+        if desconocidos:
+            raise ValueError(f"Parámetros desconocidos: {', '.join(sorted(desconocidos))}")
+
+        self.n = n
+        # Los valores por defecto salen del simulador escalar
+        plantilla = SondaLambdaSimulator(capacidad_historial=1)
+        self.scan_time_ms = plantilla.scan_time_ms
+        self.scan_time_s = plantilla.scan_time_s
+        self.current_time = 0
+
+        # Cada parámetro se guarda como arreglo de largo N (escalar -> broadcast)
+        for nombre in self.PARAMETROS_POR_INSTANCIA:
+            valor = parametros.get(nombre, getattr(plantilla, nombre))
+            setattr(self, nombre, np.array(np.broadcast_to(valor, (n,)), dtype=float))
+
+        # --- Variables de Estado (una por instancia) ---
+        self.integral_term = np.zeros(n)
+        self.pulse_width_ms = self.base_pulse_width_ms.copy()
+        self.voltaje_sonda_ideal = np.full(n, plantilla.voltaje_sonda_ideal)
+        self.voltaje_sonda_filtrado = np.full(n, plantilla.voltaje_sonda_filtrado)
+        self.voltaje_sonda_realimentacion = np.full(n, plantilla.voltaje_sonda_realimentacion)
+        self.voltaje_anterior = np.full(n, plantilla.voltaje_anterior)
+
+        # --- Salidas del último scan ---
+        self.caudal_aire_actual_gs = np.full(n, plantilla.caudal_aire_base_gs)
+        self.perturbacion_actual = np.zeros(n)
+        self.lambda_real = np.ones(n)
+        self.o2_percent = np.full(n, 0.5)
+        self.error = np.zeros(n)
+        self.accion_p = np.zeros(n)
+        self.accion_i = np.zeros(n)
+
+        # Con seed, un único generador para todo el lote: con N=1 consume el flujo
+        # aleatorio en el mismo orden que SondaLambdaSimulator.step().
+        # Con semillas, un generador por instancia: la instancia i sigue el mismo flujo que
+        # SondaLambdaSimulator(seed=semillas[i]); el ruido se pregenera por bloques de
+        # BLOQUE_RUIDO_LOTE scans (aire y EMI intercalados, como en step_many())
+        self.rng = np.random.default_rng(seed) if semillas is None else None
+        self.rngs = None if semillas is None else [np.random.default_rng(s) for s in semillas]
+        self._ruido = None  # Bloque pregenerado: uniformes [0, 1) de forma (scans, 2, n)
+        self._k_ruido = 0
+
+    def restaurar(self, estado, reiniciar_tiempo=True):
+        """ Arranca todas las instancias desde un checkpoint de SondaLambdaSimulator (ver checkpoint.restaurar_lote()) """
+        if isinstance(estado, bytes):
+            estado = checkpoint.desde_bytes(estado)
+        elif isinstance(estado, str):
+            estado = checkpoint.cargar(estado)
+        return checkpoint.restaurar_lote(self, estado, reiniciar_tiempo)
+
+    def step(self):
+        """ Ejecuta un ciclo de control (scan) en las N instancias """
+
+        # 1. CONTROLADOR PI (con anti-windup)
+        error = self.setpoint_v - self.voltaje_sonda_realimentacion
+        accion_p = self.Kp * error
+        self.integral_term += error * self.scan_time_s
+        self.integral_term = np.maximum(-self.integral_max, np.minimum(self.integral_term, self.integral_max))
+        accion_i = self.Ki * self.integral_term
+        correccion_pi_ms = accion_p + accion_i
+        self.pulse_width_ms = self.base_pulse_width_ms + correccion_pi_ms
+        self.pulse_width_ms = np.maximum(self.min_pulse_width_ms,
+                                         np.minimum(self.pulse_width_ms, self.max_pulse_width_ms))
+
+        # 2. PERTURBACIONES
+        en_ventana = ((self.perturbacion_inicio <= self.current_time)
+                      & (self.current_time < (self.perturbacion_inicio + self.perturbacion_duracion)))
+        perturbacion_actual = np.where(en_ventana, self.perturbacion_amplitud, 0.0)
+        if self.rngs is None:
+            ruido_aire = self.rng.uniform(-0.05, 0.05, size=self.n)
+        else:
+            u_aire, u_emi = self._uniformes()
+            ruido_aire = -0.05 + (0.05 - -0.05) * u_aire
+        caudal_aire_actual_gs = self.caudal_aire_base_gs + perturbacion_actual + ruido_aire
+        flujo_combustible_efectivo_gs = (self.pulse_width_ms * self.K_injector) * self.pert_comb_calidad
+
+        # 3. PLANTA (lambda y %O2)
+        hay_combustible = flujo_combustible_efectivo_gs > 0
+        flujo_seguro = np.where(hay_combustible, flujo_combustible_efectivo_gs, 1.0)
+        lambda_real = np.where(hay_combustible,
+                               (caudal_aire_actual_gs / flujo_seguro) / self.stoich_ratio, 5.0)
+        o2_percent = np.where(lambda_real < 1.0,
+                              0.1 + 0.4 * lambda_real,
+                              np.minimum(0.5 + 3.5 * (lambda_real - 1.0), 4.0))
+
+        # 4. SENSOR: curva no lineal + dinámica asimétrica + ruido EMI
+        self.voltaje_sonda_ideal = self.setpoint_v + 0.45 * np.tanh(20.0 * (1.0 - lambda_real))
+        diferencia = self.voltaje_sonda_ideal - self.voltaje_sonda_filtrado
+        tau_actual = np.where(diferencia > 0, self.tau_pobre_rica_s, self.tau_rica_pobre_s)
+        alpha = self.scan_time_s / tau_actual
+        self.voltaje_sonda_filtrado += alpha * diferencia
+        if self.rngs is None:
+            ruido_emi = self.rng.uniform(-self.pert_ruido_emi_v, self.pert_ruido_emi_v, size=self.n)
+        else:
+            # Mismas operaciones que rng.uniform(low, high) escalar: low + (high - low) * u
+            ruido_emi = -self.pert_ruido_emi_v + (self.pert_ruido_emi_v - -self.pert_ruido_emi_v) * u_emi
+
+        # 5. ADC
+        self.voltaje_sonda_realimentacion = self.voltaje_sonda_filtrado + ruido_emi
+
+        # 6. GUARDAR SALIDAS DEL SCAN
+        self.current_time += self.scan_time_s
+        self.caudal_aire_actual_gs = caudal_aire_actual_gs
+        self.perturbacion_actual = perturbacion_actual
+        self.lambda_real = lambda_real
+        self.o2_percent = o2_percent
+        self.error = error
+        self.accion_p = accion_p
+        self.accion_i = accion_i
+        self.voltaje_anterior = self.voltaje_sonda_filtrado.copy()
+
+    def _uniformes(self):
+        """ Uniformes del scan (aire y EMI, un arreglo de largo N cada uno) con un generador por instancia """
+        if self._ruido is None or self._k_ruido == len(self._ruido):
+            bloque = np.array([rng.random(2 * BLOQUE_RUIDO_LOTE) for rng in self.rngs])
+            self._ruido = np.ascontiguousarray(bloque.reshape(self.n, BLOQUE_RUIDO_LOTE, 2).transpose(1, 2, 0))
+            self._k_ruido = 0
+        u = self._ruido[self._k_ruido]
+        self._k_ruido += 1
+        return u[0], u[1]
+
+    def salidas(self):
+        """ Devuelve las salidas del último scan, indexadas por canal """
+        return {
+            "setpoint": self.setpoint_v,
+            "voltaje_sonda": self.voltaje_sonda_realimentacion,
+            "pulse_width": self.pulse_width_ms,
+            "caudal_aire": self.caudal_aire_actual_gs,
+            "lambda": self.lambda_real,
+            "o2_percent": self.o2_percent,
+            "error": self.error,
+            "accion_p": self.accion_p,
+            "accion_i": self.accion_i,
+            "perturbacion_aplicada": self.perturbacion_actual,
+        }
+
+    def run(self, n_steps, canales=("lambda", "voltaje_sonda", "error")):
+        """ Avanza n_steps scans y devuelve el tiempo y los canales pedidos (n_steps x N) """
+        desconocidos = set(canales) - set(self.CANALES)
+        if desconocidos:
+            raise ValueError(f"Canales desconocidos: {', '.join(sorted(desconocidos))}")
+
+        tiempo = np.empty(n_steps)
+        historial = {canal: np.empty((n_steps, self.n)) for canal in canales}
+        for k in range(n_steps):
+            self.step()
+            tiempo[k] = self.current_time
+            salidas = self.salidas()
+            for canal in canales:
+                historial[canal][k] = salidas[canal]
+        historial["time"] = tiempo
+        return historial
@@ -0,0 +1,211 @@
+"""
+Telemetría en disco: escritura por chunks columnares y lectura con memory-map.
+
+Formato del archivo:
+    - Encabezado: firma MAGIA, largo del JSON (uint64) y un JSON con los canales, el
+      tamaño de chunk y metadatos. Los datos empiezan en el siguiente múltiplo de ALINEACION.
+    - Chunks de tamaño fijo: para cada canal, muestras_por_chunk valores float64 seguidos
+      (el último chunk se completa con NaN).
+    - Índice (al cerrar): por chunk, [n_muestras, t_inicio, t_fin, mínimos..., máximos...].
+    - Resumen (al cerrar): mínimo y máximo por canal de cada tramo de MUESTRAS_POR_RESUMEN
+      muestras, arreglo (n_chunks, 2, n_canales, tramos por chunk). Lo usa la decimación
+      para dibujar rangos largos sin leer todas las muestras.
+    - Cierre: firma MAGIA_INDICE, offset del índice y cantidad de chunks.
+
+Si la corrida se corta antes de cerrar, el lector reconstruye el índice a partir de los
+chunks completos que quedaron en disco.
+"""
+import json
+import os
+import struct
+
+import numpy as np
+
+MAGIA = b"SLTELEM1"
+MAGIA_INDICE = b"SLINDEX1"
+ALINEACION = 4096
+MUESTRAS_POR_CHUNK = 16384
+MUESTRAS_POR_RESUMEN = 256  # Debe dividir a muestras_por_chunk
+_CIERRE = struct.Struct("<8sQQ")  # firma, offset del índice, cantidad de chunks
+
+
+def resumen_chunk(datos):
+    """ Mínimo y máximo de cada tramo de un chunk (n_canales x muestras) -> (2, n_canales, tramos) """
+    tramos = datos.reshape(datos.shape[0], -1, MUESTRAS_POR_RESUMEN)
+    # fmin/fmax ignoran el relleno NaN del último chunk (los tramos vacíos quedan en NaN)
+    return np.stack([np.fmin.reduce(tramos, axis=2), np.fmax.reduce(tramos, axis=2)])
+
+
+class EscritorTelemetria:
+    def __init__(self, ruta, canales, muestras_por_chunk=MUESTRAS_POR_CHUNK, metadatos=None):
+        if muestras_por_chunk % MUESTRAS_POR_RESUMEN:
+            raise ValueError(f"muestras_por_chunk debe ser múltiplo de {MUESTRAS_POR_RESUMEN}")
+        self.ruta = ruta
+        self.canales = tuple(canales)
+        self.muestras_por_chunk = muestras_por_chunk
+        self.total = 0
+        self._buffer = np.full((len(self.canales), muestras_por_chunk), np.nan)
+        self._llenas = 0  # Muestras ocupadas en el chunk en memoria
+        self._indice = []
+        self._resumen = []
+
+        encabezado = json.dumps({"canales": self.canales, "muestras_por_chunk": muestras_por_chunk,
+                                 "dtype": "<f8", "metadatos": metadatos or {}}).encode("utf-8")
+        inicio_datos = -(-(len(MAGIA) + 8 + len(encabezado)) // ALINEACION) * ALINEACION
+        self._archivo = open(ruta, "wb")
+        self._archivo.write(MAGIA + struct.pack("<Q", len(encabezado)) + encabezado)
+        self._archivo.write(b"\0" * (inicio_datos - self._archivo.tell()))
+
+    def agregar(self, valores):
+        """ Agrega una muestra (un valor por canal) """
+        self._buffer[:, self._llenas] = valores
+        self._llenas += 1
+        self.total += 1
+        if self._llenas == self.muestras_por_chunk:
+            self._escribir_chunk()
+
+    def agregar_bloque(self, columnas):
+        """ Agrega un bloque de muestras (arreglo n_canales x m) """
+        columnas = np.asarray(columnas, dtype=float)
+        hecho, m = 0, columnas.shape[1]
+        while hecho < m:
+            k = min(m - hecho, self.muestras_por_chunk - self._llenas)
+            self._buffer[:, self._llenas:self._llenas + k] = columnas[:, hecho:hecho + k]
+            self._llenas += k
+            hecho += k
+            if self._llenas == self.muestras_por_chunk:
+                self._escribir_chunk()
+        self.total += m
+
+    def _escribir_chunk(self):
+        datos = self._buffer[:, :self._llenas]
+        self._indice.append(np.concatenate(([self._llenas, datos[0, 0], datos[0, -1]],
+                                            datos.min(axis=1), datos.max(axis=1))))
+        self._resumen.append(resumen_chunk(self._buffer))
+        self._archivo.write(self._buffer.tobytes())
+        self._buffer.fill(np.nan)
+        self._llenas = 0
+
+    def cerrar(self):
+        if self._archivo is None:
+            return
+        if self._llenas:
+            self._escribir_chunk()
+        offset_indice = self._archivo.tell()
+        indice = np.array(self._indice, dtype="<f8").reshape(-1, 3 + 2 * len(self.canales))
+        self._archivo.write(indice.tobytes())
+        for resumen in self._resumen:
+            self._archivo.write(resumen.astype("<f8").tobytes())
+        self._archivo.write(_CIERRE.pack(MAGIA_INDICE, offset_indice, len(self._indice)))
+        self._archivo.close()
+        self._archivo = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+class LectorTelemetria:
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with open(ruta, "rb") as f:
+            if f.read(len(MAGIA)) != MAGIA:
+                raise ValueError(f"{ruta} no es un archivo de telemetría")
+            largo, = struct.unpack("<Q", f.read(8))
+            encabezado = json.loads(f.read(largo).decode("utf-8"))
+        self.canales = tuple(encabezado["canales"])
+        self.metadatos = encabezado["metadatos"]
+        self.muestras_por_chunk = encabezado["muestras_por_chunk"]
+        self._canal = {canal: i for i, canal in enumerate(self.canales)}
+        inicio_datos = -(-(len(MAGIA) + 8 + largo) // ALINEACION) * ALINEACION
+        bytes_chunk = 8 * len(self.canales) * self.muestras_por_chunk
+
+        tamano = os.path.getsize(ruta)
+        n_chunks, offset_indice = None, None
+        if tamano >= inicio_datos + _CIERRE.size:
+            with open(ruta, "rb") as f:
+                f.seek(tamano - _CIERRE.size)
+                firma, offset_indice, n_chunks = _CIERRE.unpack(f.read(_CIERRE.size))
+            if firma != MAGIA_INDICE:
+                # Sin cierre válido, los últimos bytes son datos: no hay índice que leer
+                n_chunks, offset_indice = None, None
+        if n_chunks is None:
+            # Archivo sin cerrar: solo los chunks completos escritos
+            n_chunks = (tamano - inicio_datos) // bytes_chunk
+
+        self._datos = np.memmap(ruta, dtype="<f8", mode="r", offset=inicio_datos,
+                                shape=(n_chunks, len(self.canales), self.muestras_por_chunk)) \
+            if n_chunks else np.empty((0, len(self.canales), self.muestras_por_chunk))
+
+        tramos = self.muestras_por_chunk // MUESTRAS_POR_RESUMEN
+        if offset_indice is not None and n_chunks and tamano >= offset_indice:
+            largo_indice = n_chunks * (3 + 2 * len(self.canales))
+            self.indice = np.fromfile(ruta, dtype="<f8", count=largo_indice,
+                                      offset=offset_indice).reshape(n_chunks, -1)
+            self.resumen = np.memmap(ruta, dtype="<f8", mode="r", offset=offset_indice + 8 * largo_indice,
+                                     shape=(n_chunks, 2, len(self.canales), tramos))
+        else:
+            self.indice = self._reconstruir_indice()
+            self.resumen = np.array([resumen_chunk(np.asarray(chunk)) for chunk in self._datos]).reshape(
+                n_chunks, 2, len(self.canales), tramos)
+        self.muestras_chunk = self.indice[:, 0].astype(np.int64)
+        self.total = int(self.muestras_chunk.sum())
+
+    def _reconstruir_indice(self):
+        filas = []
+        for c in range(len(self._datos)):
+            datos = self._datos[c]
+            n = int(np.count_nonzero(~np.isnan(datos[0])))
+            datos = datos[:, :n]
+            filas.append(np.concatenate(([n, datos[0, 0], datos[0, -1]], datos.min(axis=1), datos.max(axis=1))))
+        return np.array(filas).reshape(-1, 3 + 2 * len(self.canales))
+
+    def __len__(self):
+        return self.total
+
+    def minimos(self, canal):
+        """ Mínimo de cada chunk (del índice, sin leer los datos) """
+        return self.indice[:, 3 + self._canal[canal]]
+
+    def maximos(self, canal):
+        """ Máximo de cada chunk (del índice, sin leer los datos) """
+        return self.indice[:, 3 + len(self.canales) + self._canal[canal]]
+
+    def indice_de_tiempo(self, t, lado="left"):
+        """ Índice global de la primera muestra con tiempo >= t (lado='left') o > t (lado='right') """
+        if self.total == 0:
+            return 0
+        c = int(np.searchsorted(self.indice[:, 1], t, side="right")) - 1
+        c = min(max(c, 0), len(self.indice) - 1)
+        tiempos = self._datos[c, 0, :self.muestras_chunk[c]]
+        k = int(np.searchsorted(tiempos, t, side=lado))
+        return c * self.muestras_por_chunk + k
+
+    def leer(self, inicio, fin, canales=None):
+        """
+        Muestras [inicio, fin) por índice global, canal -> arreglo. Si el rango cae en un solo
+        chunk se devuelven vistas del memory-map; si no, se concatena solo ese rango.
+        """
+        canales = self.canales if canales is None else canales
+        inicio, fin = max(0, inicio), min(fin, self.total)
+        if fin <= inicio:
+            return {canal: np.empty(0) for canal in canales}
+        c0, k0 = divmod(inicio, self.muestras_por_chunk)
+        c1, k1 = divmod(fin - 1, self.muestras_por_chunk)
+        resultado = {}
+        for canal in canales:
+            i = self._canal[canal]
+            if c0 == c1:
+                resultado[canal] = self._datos[c0, i, k0:k1 + 1]
+            else:
+                partes = [self._datos[c0, i, k0:]]
+                partes.extend(self._datos[c, i] for c in range(c0 + 1, c1))
+                partes.append(self._datos[c1, i, :k1 + 1])
+                resultado[canal] = np.concatenate(partes)
+        return resultado
+
+    def rango(self, t_inicio, t_fin, canales=None):
+        """ Muestras con t_inicio <= tiempo <= t_fin, canal -> arreglo """
+        return self.leer(self.indice_de_tiempo(t_inicio, "left"), self.indice_de_tiempo(t_fin, "right"), canales)
@@ -0,0 +1,216 @@
+"""
+Ejecución en tiempo real: un scan cada scan_time_ms de reloj, para pruebas con hardware en el lazo.
+
+EjecutorTiempoReal agenda los scans contra el reloj monotónico (time.monotonic_ns): el
+scan k se libera en t0 + k * dt, independientemente de lo que tarden los anteriores. La
+espera combina sleep con una espera activa corta antes de la liberación, porque sleep
+solo se despierta con una precisión de décimas de milisegundo.
+
+Si el scan se atrasa un período o más, la política decide:
+    - "recuperar": ejecuta los scans atrasados seguidos hasta volver a la grilla (como
+      mucho los últimos max_recuperar; los anteriores se saltan),
+    - "saltar": descarta los scans perdidos y sigue en la próxima liberación.
+En ambos casos el tiempo simulado avanza un scan por scan ejecutado.
+
+Por cada scan se registran, en un Perfil (histogramas O(1), ver sonda_lambda.perfil):
+    - latencia: inicio del scan - liberación,
+    - jitter: |intervalo entre inicios consecutivos - dt|,
+    - ejecucion: duración del scan (incluida la E/S),
+y los contadores scans, vencidos (el scan terminó después de la liberación siguiente),
+saltados, recibidos y enviados.
+
+E/S local opcional por datagramas (UDP en 'host:puerto' o socket Unix en una ruta),
+para que otro proceso cierre el lazo:
+    - entrada: MENSAJE_ENTRADA (secuencia, voltaje de sonda en V). El último voltaje
+      recibido reemplaza a la lectura del ADC del scan (ver SondaLambdaSimulator.step()):
+      es lo que registran el historial, la telemetría y los eventos, y lo que usa el
+      controlador en el scan siguiente. Si no llega otro en vencimiento_entrada_s, vuelve
+      el sensor simulado,
+    - salida: MENSAJE_SALIDA (scan, tiempo simulado en s, ancho de pulso en ms), un
+      datagrama por scan.
+"""
+import errno
+import os
+import socket
+import struct
+import time
+
+from sonda_lambda.perfil import Perfil
+
+POLITICAS = ("recuperar", "saltar")
+ETAPAS = ("latencia", "jitter", "ejecucion")
+
+MENSAJE_ENTRADA = struct.Struct("<Id")  # secuencia, voltaje_sonda_v
+MENSAJE_SALIDA = struct.Struct("<Idd")  # scan, tiempo_s, pulse_width_ms
+
+ESPERA_ACTIVA_US = 300  # Último tramo de la espera sin sleep
+MAX_RECUPERAR = 10  # Scans atrasados que "recuperar" ejecuta seguidos antes de saltar
+
+
+def direccion(texto):
+    """ 'host:puerto' -> (familia, (host, puerto)) para UDP; otra cosa -> socket Unix en esa ruta """
+    host, separador, puerto = texto.rpartition(":")
+    if separador and puerto.isdigit():
+        return socket.AF_INET, (host or "127.0.0.1", int(puerto))
+    return socket.AF_UNIX, texto
+
+
+def abrir_entrada(texto):
+    """ Socket de datagramas no bloqueante escuchando en la dirección """
+    familia, destino = direccion(texto)
+    sock = socket.socket(familia, socket.SOCK_DGRAM)
+    if familia == socket.AF_UNIX and os.path.exists(destino):
+        os.unlink(destino)
+    sock.bind(destino)
+    sock.setblocking(False)
+    return sock
+
+
+def abrir_salida(texto):
+    """ Socket de datagramas no bloqueante y su destino (sin conectar: el receptor puede aparecer después) """
+    familia, destino = direccion(texto)
+    sock = socket.socket(familia, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    return sock, destino
+
+
+class EjecutorTiempoReal:
+    def __init__(self, sim, politica="recuperar", entrada=None, salida=None,
+                 espera_activa_us=ESPERA_ACTIVA_US, max_recuperar=MAX_RECUPERAR, vencimiento_entrada_s=0.1):
+        if politica not in POLITICAS:
+            raise ValueError(f"Política desconocida: {politica!r} (políticas: {', '.join(POLITICAS)})")
+        self.sim = sim
+        self.politica = politica
+        self.entrada = abrir_entrada(entrada) if isinstance(entrada, str) else entrada  # Socket o dirección
+        # Ruta del socket Unix de entrada abierto acá: se borra al cerrar
+        self._ruta_entrada = self.entrada.getsockname() \
+            if isinstance(entrada, str) and self.entrada.family == socket.AF_UNIX else None
+        # Salida: dirección o socket ya conectado
+        self.salida, self._destino = abrir_salida(salida) if isinstance(salida, str) else (salida, None)
+        self.espera_activa_ns = int(espera_activa_us * 1000)
+        self.max_recuperar = max_recuperar
+        self.vencimiento_entrada_ns = int(vencimiento_entrada_s * 1e9)
+        self.medicion = Perfil()
+        self.voltaje_externo = None  # Último voltaje recibido
+        self._t_voltaje_externo = 0
+        self._detener = False
+
+    def detener(self):
+        """ Termina correr() después del scan en curso (se puede llamar desde otro hilo) """
+        self._detener = True
+
+    def cerrar(self):
+        for sock in (self.entrada, self.salida):
+            if sock is not None:
+                sock.close()
+        if self._ruta_entrada is not None and os.path.exists(self._ruta_entrada):
+            os.unlink(self._ruta_entrada)
+            self._ruta_entrada = None
+
+    def _esperar(self, objetivo):
+        """ Espera hasta objetivo (ns del reloj monotónico): sleep y luego espera activa """
+        reloj = time.monotonic_ns
+        while True:
+            restante = objetivo - reloj()
+            if restante <= 0:
+                return
+            if restante > self.espera_activa_ns:
+                time.sleep((restante - self.espera_activa_ns) / 1e9)
+
+    def _leer_entrada(self, ahora):
+        """ Vacía la cola de entrada y se queda con el último voltaje """
+        while True:
+            try:
+                datos = self.entrada.recv(64)
+            except BlockingIOError:
+                break
+            if len(datos) == MENSAJE_ENTRADA.size:
+                _, self.voltaje_externo = MENSAJE_ENTRADA.unpack(datos)
+                self._t_voltaje_externo = ahora
+                self.medicion.contar("recibidos")
+        if self.voltaje_externo is not None and ahora - self._t_voltaje_externo > self.vencimiento_entrada_ns:
+            self.voltaje_externo = None  # Sin datos recientes: vuelve el sensor simulado
+
+    def _enviar_salida(self, scan):
+        mensaje = MENSAJE_SALIDA.pack(scan & 0xFFFFFFFF, self.sim.current_time, self.sim.pulse_width_ms)
+        try:
+            if self._destino is None:
+                self.salida.send(mensaje)
+            else:
+                self.salida.sendto(mensaje, self._destino)
+            self.medicion.contar("enviados")
+        except OSError as e:
+            # Sin receptor o con la cola llena se descarta el datagrama: el scan no espera
+            if e.errno not in (errno.EAGAIN, errno.ECONNREFUSED, errno.ENOENT, errno.ENOBUFS):
+                raise
+            self.medicion.contar("descartados")
+
+    def correr(self, duracion_s=None, n_scans=None):
+        """ Ejecuta scans al ritmo del reloj hasta completar duracion_s / n_scans o detener() """
+        sim = self.sim
+        medicion = self.medicion
+        reloj = time.monotonic_ns
+        dt_ns = int(round(sim.scan_time_s * 1e9))
+        if n_scans is None and duracion_s is not None:
+            n_scans = int(round(duracion_s / sim.scan_time_s))
+        self._detener = False
+
+        hechos = 0
+        k = 0  # Liberación actual en la grilla
+        inicio_anterior = None
+        t0 = reloj()
+        while not self._detener and (n_scans is None or hechos < n_scans):
+            liberacion = t0 + k * dt_ns
+            ahora = reloj()
+            if ahora < liberacion:
+                self._esperar(liberacion)
+                ahora = reloj()
+            else:
+                atrasados = (ahora - liberacion) // dt_ns
+                # "saltar" descarta todos los atrasados; "recuperar", solo los que pasan de max_recuperar
+                saltar = atrasados if self.politica == "saltar" else max(0, atrasados - self.max_recuperar)
+                if saltar:
+                    k += saltar
+                    liberacion += saltar * dt_ns
+                    medicion.contar("saltados", saltar)
+
+            if self.entrada is not None:
+                self._leer_entrada(ahora)
+            sim.step(self.voltaje_externo)
+            if self.salida is not None:
+                self._enviar_salida(k)
+            fin = reloj()
+
+            medicion.registrar("latencia", ahora - liberacion)
+            medicion.registrar("ejecucion", fin - ahora)
+            if inicio_anterior is not None:
+                medicion.registrar("jitter", abs(ahora - inicio_anterior - dt_ns))
+            inicio_anterior = ahora
+            if fin > liberacion + dt_ns:
+                medicion.contar("vencidos")
+            medicion.contar("scans")
+            hechos += 1
+            k += 1
+        return hechos
+
+    def resumen(self):
+        """ Latencia, jitter y ejecución (µs) y contadores, como dict """
+        contadores = self.medicion.contadores
+        scans = contadores.get("scans", 0)
+        resumen = {nombre: contadores.get(nombre, 0)
+                   for nombre in ("scans", "vencidos", "saltados", "recibidos", "enviados", "descartados")}
+        resumen["pct_vencidos"] = 100.0 * resumen["vencidos"] / scans if scans else 0.0
+        resumen["etapas"] = self.medicion.resumen()
+        return resumen
+
+    def texto(self):
+        """ Contadores y tabla de p50/p99/máximo de latencia, jitter y ejecución """
+        resumen = self.resumen()
+        lineas = [f"{resumen['scans']} scans | vencidos: {resumen['vencidos']} ({resumen['pct_vencidos']:.2f}%) | "
+                  f"saltados: {resumen['saltados']}",
+                  f"{'':12s}{'p50 µs':>10s}{'p99 µs':>10s}{'máx µs':>10s}"]
+        for etapa in ETAPAS:
+            if etapa in resumen["etapas"]:
+                valores = resumen["etapas"][etapa]
+                lineas.append(f"{etapa:12s}{valores['p50_us']:10.1f}{valores['p99_us']:10.1f}{valores['max_us']:10.1f}")
+        return "\n".join(lineas)
@@ -0,0 +1,74 @@
+"""
+Barrido de parámetros: reparto de bloques entre procesos, reproducibilidad y reanudación.
+"""
+import json
+
+import pytest
+
+from sonda_lambda import barrido
+
+GRILLA = {"Kp": [1.0, 2.0, 3.0], "Ki": [2.0, 6.0]}
+DURACION_S = 12.0  # Incluye la perturbación por defecto (de 5 s a 10 s)
+
+
+def _metricas(filas):
+    # Como JSON, para comparar también los NaN
+    return json.dumps([{nombre: fila[nombre] for nombre in ("indice", "Kp", "Ki", *barrido.METRICAS)}
+                       for fila in filas])
+
+
+def test_resultados_independientes_del_reparto():
+    serie = barrido.ejecutar_barrido(GRILLA, duracion_s=DURACION_S, seed=3, procesos=1)
+    assert len(serie) == 6
+    assert _metricas(serie) == _metricas(barrido.ejecutar_barrido(GRILLA, duracion_s=DURACION_S, seed=3,
+                                                                   procesos=1, tamano_bloque=4))
+    assert _metricas(serie) == _metricas(barrido.ejecutar_barrido(GRILLA, duracion_s=DURACION_S, seed=3,
+                                                                   procesos=3))
+
+
+def test_grilla_chica_usa_todos_los_procesos():
+    # 6 puntos y 4 procesos: bloques de 2 (antes, un único bloque de 64 en un solo núcleo)
+    assert barrido._repartir(list(range(6)), 4, 64) == [[0, 1], [2, 3], [4, 5]]
+    assert len(barrido._repartir(list(range(100)), 8, 64)) == 8
+    assert all(len(bloque) <= 16 for bloque in barrido._repartir(list(range(1000)), 4, 16))
+
+
+def test_reanuda_sin_repetir_puntos(tmp_path):
+    archivo = tmp_path / "barrido.jsonl"
+    completo = barrido.ejecutar_barrido(GRILLA, duracion_s=DURACION_S, seed=1, procesos=1, archivo=str(archivo))
+    lineas = archivo.read_text(encoding="utf-8").splitlines()
+    # Interrupción a mitad de una línea: quedan 3 filas completas y una cortada
+    archivo.write_text("\n".join(lineas[:4]) + "\n" + lineas[4][:10], encoding="utf-8")
+    reanudado = barrido.ejecutar_barrido(GRILLA, duracion_s=DURACION_S, seed=1, procesos=1, archivo=str(archivo))
+    assert _metricas(reanudado) == _metricas(completo)
+    filas = [json.loads(linea) for linea in archivo.read_text(encoding="utf-8").splitlines()[1:]]
+    assert sorted(fila["indice"] for fila in filas) == list(range(6))
+
+
+def test_interrupcion_al_reanudar_conserva_resultados(tmp_path, monkeypatch):
+    archivo = tmp_path / "barrido.jsonl"
+    barrido.ejecutar_barrido(GRILLA, duracion_s=DURACION_S, seed=1, procesos=1, archivo=str(archivo))
+    original = archivo.read_text(encoding="utf-8")
+
+    def interrumpir(*args):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(barrido.os, "replace", interrumpir)
+    with pytest.raises(KeyboardInterrupt):
+        barrido.ejecutar_barrido(GRILLA, duracion_s=DURACION_S, seed=1, procesos=1, archivo=str(archivo))
+    assert archivo.read_text(encoding="utf-8") == original
+
+
+def test_conmutacion_sin_contar_el_ruido():
+    filas = barrido.ejecutar_barrido({"Kp": [0.5, 3.0], "Ki": [6.0]}, duracion_s=20.0, procesos=1,
+                                     perturbacion_amplitud=0.0)
+    # Con Kp bajo el lazo es estable: el ruido EMI alrededor del setpoint no es conmutación
+    assert filas[0]["frecuencia_conmutacion_hz"] < 0.5
+    assert filas[1]["frecuencia_conmutacion_hz"] > 1.0
+
+
+def test_archivo_de_otro_barrido(tmp_path):
+    archivo = tmp_path / "barrido.jsonl"
+    barrido.ejecutar_barrido(GRILLA, duracion_s=DURACION_S, seed=1, procesos=1, archivo=str(archivo))
+    with pytest.raises(ValueError):
+        barrido.ejecutar_barrido(GRILLA, duracion_s=DURACION_S, seed=2, procesos=1, archivo=str(archivo))
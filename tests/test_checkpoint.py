@@ -0,0 +1,76 @@
+"""
+Checkpoints: restaurar y continuar da exactamente la misma corrida que no haberse detenido.
+"""
+import numpy as np
+import pytest
+
+from sonda_lambda import SondaLambdaSimulator, checkpoint, escenarios
+
+SEMILLA = 7
+ANTES, DESPUES = 1200, 1800  # Scans hasta el checkpoint y desde el checkpoint
+
+
+def _iguales(a, b):
+    assert a.keys() == b.keys()
+    for canal in a:
+        np.testing.assert_array_equal(a[canal], b[canal], err_msg=canal)
+
+
+def _corrida_completa(escenario=None):
+    sim = SondaLambdaSimulator(seed=SEMILLA)
+    if escenario is not None:
+        sim.cargar_escenario(escenario)
+    sim.step_many(ANTES)
+    estado = sim.checkpoint()
+    sim.step_many(DESPUES)
+    return estado, sim.historial.columnas(DESPUES)
+
+
+@pytest.mark.parametrize("serializar", [False, True], ids=["dict", "npz"])
+@pytest.mark.parametrize("por_scan", [False, True], ids=["step_many", "step"])
+def test_continua_igual(serializar, por_scan):
+    estado, referencia = _corrida_completa()
+    if serializar:
+        estado = checkpoint.desde_bytes(checkpoint.a_bytes(estado))
+    sim = SondaLambdaSimulator(seed=123, Kp=1.0)  # Parámetros y semilla los pone el checkpoint
+    sim.restaurar(estado)
+    if por_scan:
+        for _ in range(DESPUES):
+            sim.step()
+    else:
+        sim.step_many(DESPUES)
+    _iguales(referencia, sim.historial.columnas(DESPUES))
+
+
+def test_continua_a_mitad_del_escenario():
+    escenario = escenarios.ciclo_urbano(60.0, seed=SEMILLA)
+    estado, referencia = _corrida_completa(escenario)
+    assert estado["escenario_t"] == pytest.approx(ANTES * 0.02)
+    sim = SondaLambdaSimulator()
+    sim.cargar_escenario(escenario)
+    sim.restaurar(checkpoint.desde_bytes(checkpoint.a_bytes(estado)))
+    sim.step_many(DESPUES)
+    _iguales(referencia, sim.historial.columnas(DESPUES))
+    # También al volver a t=0: el escenario queda en el mismo punto relativo
+    sim = SondaLambdaSimulator()
+    sim.cargar_escenario(escenario)
+    sim.restaurar(estado, reiniciar_tiempo=True)
+    sim.step_many(DESPUES)
+    np.testing.assert_array_equal(sim.historial.ultimos("lambda"), referencia["lambda"])
+
+
+def test_escenario_nuevo_empieza_al_restaurar():
+    estado, _ = _corrida_completa()
+    assert estado["escenario_t"] is None
+    escenario = escenarios.ciclo_urbano(60.0, seed=SEMILLA)
+    sim = SondaLambdaSimulator()
+    sim.cargar_escenario(escenario)
+    sim.restaurar(estado)
+    assert sim._escenario_t0 == sim.current_time == estado["current_time"]
+
+
+def test_version_desconocida():
+    estado, _ = _corrida_completa()
+    estado["version"] = 99
+    with pytest.raises(ValueError):
+        SondaLambdaSimulator().restaurar(estado)
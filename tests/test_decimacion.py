@@ -0,0 +1,74 @@
+"""
+Decimación min/max: los extremos de cada ventana sobreviven en los tres niveles de lectura.
+"""
+import numpy as np
+import pytest
+
+from sonda_lambda import decimacion
+from sonda_lambda.telemetria import MUESTRAS_POR_RESUMEN, EscritorTelemetria, LectorTelemetria
+
+POR_CHUNK = 4 * MUESTRAS_POR_RESUMEN
+N = 20 * POR_CHUNK + 123
+DT = 0.02
+PICOS = {3001: 5.0, 17000: -4.0}  # Muestras aisladas que una decimación por paso perdería
+
+
+def _senal(n=N):
+    k = np.arange(n)
+    y = np.sin(2 * np.pi * k / 97.0)
+    for i, valor in PICOS.items():
+        if i < n:
+            y[i] = valor
+    return DT * k, y
+
+
+def test_decimar_minmax_conserva_extremos():
+    t, y = _senal()
+    for n_grupos in (1, 7, 100, 1000):
+        td, yd = decimacion.decimar_minmax(t, y, n_grupos)
+        assert len(yd) <= 2 * n_grupos
+        assert yd.max() == y.max() == 5.0 and yd.min() == y.min() == -4.0
+        assert np.all(np.diff(td) >= 0)
+        # Cada grupo aporta su mínimo y su máximo
+        tamano = -(-len(y) // n_grupos)
+        for g in range(0, len(y), tamano):
+            grupo = y[g:g + tamano]
+            en_grupo = yd[(td >= t[g]) & (td <= t[min(g + tamano, len(y)) - 1])]
+            assert en_grupo.min() == grupo.min() and en_grupo.max() == grupo.max()
+
+
+def test_decimar_minmax_pocas_muestras_sin_cambios():
+    t, y = _senal(50)
+    td, yd = decimacion.decimar_minmax(t, y, 25)
+    np.testing.assert_array_equal(yd, y)
+    np.testing.assert_array_equal(td, t)
+
+
+@pytest.fixture(scope="module")
+def lector(tmp_path_factory):
+    ruta = tmp_path_factory.mktemp("decimacion") / "senal.sltl"
+    t, y = _senal()
+    with EscritorTelemetria(str(ruta), ("time", "y"), muestras_por_chunk=POR_CHUNK) as escritor:
+        escritor.agregar_bloque(np.stack([t, y]))
+    return LectorTelemetria(str(ruta))
+
+
+# Muestras, resumen por tramos e índice por chunk
+@pytest.mark.parametrize("n_pixeles", [N // 10, N // (2 * MUESTRAS_POR_RESUMEN), 4], ids=["muestras", "resumen",
+                                                                                         "indice"])
+def test_ventana_conserva_extremos(lector, n_pixeles):
+    t, y = _senal()
+    tiempo, valores = decimacion.ventana(lector, t[0], t[-1], n_pixeles, ["y"])["y"]
+    assert len(valores) <= 2 * n_pixeles + 2
+    assert valores.max() == 5.0 and valores.min() == -4.0
+    assert tiempo[0] >= t[0] and tiempo[-1] <= t[-1]
+
+
+@pytest.mark.parametrize("n_pixeles", [500, 20, 2])
+def test_subventana_incluye_su_pico(lector, n_pixeles):
+    t, y = _senal()
+    desde, hasta = 2000, 9000
+    _, valores = decimacion.ventana(lector, t[desde], t[hasta], n_pixeles, ["y"])["y"]
+    # Con resumen o índice los tramos del borde pueden sumar muestras vecinas, nunca perder las propias
+    assert valores.max() >= y[desde:hasta + 1].max() == 5.0
+    assert valores.min() <= y[desde:hasta + 1].min()
@@ -0,0 +1,38 @@
+"""
+Equivalencia entre los caminos del simulador, con semilla fija: step_many() contra n
+llamadas a step().
+"""
+import numpy as np
+
+from sonda_lambda import SondaLambdaSimulator
+
+SEMILLA = 7
+N_SCANS = 3000  # 60 s: incluye la perturbación por defecto (de 5 s a 10 s)
+
+
+def _por_scan(sim, n=N_SCANS):
+    for _ in range(n):
+        sim.step()
+    return sim.historial.columnas(n)
+
+
+def _iguales(a, b):
+    assert a.keys() == b.keys()
+    for canal in a:
+        np.testing.assert_array_equal(a[canal], b[canal], err_msg=canal)
+
+
+def test_step_many_igual_a_step():
+    referencia = _por_scan(SondaLambdaSimulator(seed=SEMILLA))
+    sim = SondaLambdaSimulator(seed=SEMILLA)
+    salidas = sim.step_many(N_SCANS)
+    _iguales(referencia, salidas)
+    _iguales(referencia, sim.historial.columnas(N_SCANS))
+
+
+def test_step_many_en_varias_llamadas():
+    referencia = _por_scan(SondaLambdaSimulator(seed=SEMILLA))
+    sim = SondaLambdaSimulator(seed=SEMILLA)
+    for n in (1, 999, 2000):
+        sim.step_many(n)
+    _iguales(referencia, sim.historial.columnas(N_SCANS))
@@ -0,0 +1,91 @@
+"""
+Escenarios precompilados: mismos resultados por scan, por bloque y con perfil, y la forma
+de los eventos al compilar.
+"""
+import numpy as np
+import pytest
+
+from sonda_lambda import SondaLambdaSimulator, escenarios
+from sonda_lambda.perfil import Perfil
+
+SEMILLA = 7
+N_SCANS = 3000  # 60 s
+
+# Escalón de aire, senoidal de temperatura, traza absoluta de RPM y escalón de calidad de combustible
+ESCENARIO = {
+    "duracion_s": 60,
+    "eventos": [
+        {"tipo": "escalon", "senal": "caudal_aire", "inicio": 12, "duracion": 4, "amplitud": 1.5},
+        {"tipo": "senoidal", "senal": "temperatura", "inicio": 15, "duracion": 20, "amplitud": 10.0,
+         "frecuencia_hz": 0.2},
+        {"tipo": "traza", "senal": "rpm", "inicio": 20, "tiempos": [0, 10], "valores": [800, 1400],
+         "modo": "absoluto"},
+        {"tipo": "escalon", "senal": "calidad_combustible", "inicio": 35, "amplitud": -0.05},
+    ],
+}
+
+
+def _simulador(escenario, perfil=False):
+    sim = SondaLambdaSimulator(seed=SEMILLA)
+    sim.cargar_escenario(escenario)
+    sim.perfil = Perfil() if perfil else None
+    return sim
+
+
+def _por_scan(sim):
+    for _ in range(N_SCANS):
+        sim.step()
+    return sim.historial.columnas(N_SCANS)
+
+
+def _iguales(a, b):
+    assert a.keys() == b.keys()
+    for canal in a:
+        np.testing.assert_array_equal(a[canal], b[canal], err_msg=canal)
+
+
+@pytest.mark.parametrize("escenario", [ESCENARIO, "urbano"])
+def test_escenario_step_many_igual_a_step(escenario):
+    if escenario == "urbano":
+        escenario = escenarios.ciclo_urbano(60.0, seed=SEMILLA)
+    referencia = _por_scan(_simulador(escenario))
+    assert np.ptp(referencia["perturbacion_aplicada"]) > 0
+    sim = _simulador(escenario)
+    sim.step_many(N_SCANS)
+    _iguales(referencia, sim.historial.columnas(N_SCANS))
+    _iguales(referencia, _por_scan(_simulador(escenario, perfil=True)))
+
+
+def test_traza_absoluta_de_rpm_cambia_el_caudal():
+    sim = SondaLambdaSimulator(seed=SEMILLA)
+    compilado = escenarios.compilar(ESCENARIO, sim)
+    desvio = np.asarray(compilado.desvio_aire)
+    k = int(round(29.0 / sim.scan_time_s))  # Cerca del final de la rampa de 800 a 1400 RPM
+    assert desvio[k] > 5.0
+
+
+def test_forma_de_los_eventos():
+    sim = SondaLambdaSimulator(seed=SEMILLA)
+    dt = sim.scan_time_s
+    compilado = escenarios.compilar({"duracion_s": 10, "eventos": [
+        {"tipo": "escalon", "senal": "caudal_aire", "inicio": 1, "duracion": 1, "amplitud": 2.0},
+        {"tipo": "rampa", "senal": "caudal_aire", "inicio": 4, "duracion": 2, "amplitud": 1.0, "mantener": 1},
+        {"tipo": "escalon", "senal": "calidad_combustible", "inicio": 5, "amplitud": -0.1},
+    ]}, sim)
+    assert len(compilado) == int(round(10 / dt))
+    aire = np.asarray(compilado.desvio_aire)
+    t = dt * np.arange(len(compilado))
+    np.testing.assert_allclose(aire[(t >= 1) & (t < 2)], 2.0)
+    np.testing.assert_allclose(aire[(t >= 4) & (t < 6)], (t[(t >= 4) & (t < 6)] - 4) / 2, atol=1e-12)
+    np.testing.assert_allclose(aire[(t >= 6) & (t < 7)], 1.0)
+    assert not np.any(aire[(t < 1) | ((t >= 2) & (t < 4)) | (t >= 7)])
+    calidad = np.asarray(compilado.factor_calidad)
+    np.testing.assert_allclose(calidad, np.where(t >= 5, 0.9, 1.0))
+    # Pasado el final se mantiene la última muestra
+    assert compilado.indice(1000.0) == len(compilado) - 1
+
+
+@pytest.mark.parametrize("evento", [{"tipo": "pulso", "senal": "rpm"}, {"tipo": "escalon", "senal": "humedad"}])
+def test_evento_invalido(evento):
+    with pytest.raises(ValueError):
+        escenarios.compilar({"eventos": [evento]}, SondaLambdaSimulator())
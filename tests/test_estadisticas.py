@@ -0,0 +1,59 @@
+"""
+Estadísticas de lazo en línea: por scan y por bloque dan lo mismo, y coinciden con
+calcularlas de una vez sobre el historial.
+"""
+import numpy as np
+import pytest
+
+from sonda_lambda import SondaLambdaSimulator
+from sonda_lambda.estadisticas import BANDA_LAMBDA, PERCENTILES, VENTANA_PERCENTILES
+
+SEMILLA = 7
+N_SCANS = 3000
+
+
+def _por_scan():
+    sim = SondaLambdaSimulator(seed=SEMILLA)
+    for _ in range(N_SCANS):
+        sim.step()
+    return sim
+
+
+def test_estadisticas_por_bloque_equivalentes():
+    por_scan = _por_scan()
+    por_bloque = SondaLambdaSimulator(seed=SEMILLA)
+    for n in (1, 999, 2000):
+        por_bloque.step_many(n)
+    a, b = por_scan.estadisticas.resumen(), por_bloque.estadisticas.resumen()
+    assert a.keys() == b.keys()
+    for clave in a:
+        if isinstance(a[clave], float):
+            assert b[clave] == pytest.approx(a[clave], rel=1e-12, abs=1e-15, nan_ok=True), clave
+        else:
+            assert a[clave] == b[clave], clave
+
+
+def test_estadisticas_coinciden_con_el_historial():
+    sim = _por_scan()
+    columnas = sim.historial.columnas(N_SCANS)
+    lambda_, error = columnas["lambda"], columnas["error"]
+    resumen = sim.estadisticas.resumen()
+    assert resumen["scans"] == N_SCANS
+    assert resumen["lambda_media"] == pytest.approx(lambda_.mean(), rel=1e-12)
+    assert resumen["lambda_desvio"] == pytest.approx(lambda_.std(ddof=1), rel=1e-9)
+    assert resumen["error_rms"] == pytest.approx(np.sqrt(np.mean(error ** 2)), rel=1e-12)
+    en_banda = (lambda_ >= BANDA_LAMBDA[0]) & (lambda_ <= BANDA_LAMBDA[1])
+    assert resumen["pct_en_banda"] == pytest.approx(100.0 * en_banda.mean())
+    signos = error > 0
+    assert resumen["cruces"] == np.count_nonzero(signos[1:] != signos[:-1])
+    ventana = lambda_[-VENTANA_PERCENTILES:]
+    for q, valor in zip(PERCENTILES, np.percentile(ventana, PERCENTILES)):
+        assert resumen[f"lambda_p{q}"] == pytest.approx(valor)
+
+
+def test_nuevo_controlador_reinicia():
+    sim = _por_scan()
+    sim.configurar_controlador(3.0, 6.0, 0.5)
+    assert sim.estadisticas.n == 0
+    sim.step_many(10)
+    assert sim.estadisticas.resumen()["scans"] == 10
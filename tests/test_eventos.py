@@ -0,0 +1,41 @@
+"""
+Registro de eventos: cada simulador con su propio logger (handlers y nivel) y la
+histéresis de las transiciones rica/pobre.
+"""
+import logging
+
+from sonda_lambda import SondaLambdaSimulator, eventos
+
+N_SCANS = 1000
+
+
+def _simulador(nivel=logging.INFO):
+    sim = SondaLambdaSimulator(seed=1)
+    buffer = eventos.BufferTexto(max_lineas=10000)
+    sim.eventos = eventos.RegistroEventos([buffer], nivel=nivel)
+    return sim, buffer
+
+
+def test_dos_simuladores_sin_cruce():
+    solo, buffer_solo = _simulador()
+    solo.step_many(N_SCANS)
+    esperadas = buffer_solo.drenar()
+    assert esperadas
+
+    primero, buffer_primero = _simulador()
+    segundo, buffer_segundo = _simulador(nivel=logging.WARNING)
+    primero.step_many(N_SCANS)
+    segundo.step_many(N_SCANS)
+    # Sin líneas repetidas y sin que el nivel del segundo afecte al primero
+    assert buffer_primero.drenar() == esperadas
+    lineas_segundo = buffer_segundo.drenar()
+    assert len(lineas_segundo) < len(esperadas)
+    assert set(lineas_segundo) <= set(esperadas)
+
+
+def test_eventos_de_estado_con_histeresis():
+    sim, buffer = _simulador()
+    sim.eventos.eventos = {eventos.ESTADO}
+    sim.step_many(30000)
+    # Con banda y permanencia mínima, muchos menos eventos que scans
+    assert 0 < len(buffer.drenar()) < 30000 // 20
@@ -0,0 +1,91 @@
+"""
+Historial circular: las últimas muestras, al dar la vuelta, como vistas contiguas sin copia.
+"""
+import numpy as np
+import pytest
+
+from sonda_lambda.historial import HistorialCircular
+from sonda_lambda.telemetria import LectorTelemetria
+
+CANALES = ("time", "a", "b")
+CAPACIDAD = 7
+
+
+def _muestras(n, desde=0):
+    """ Muestras distinguibles: canal c de la muestra k vale k + 1000 c """
+    k = np.arange(desde, desde + n, dtype=float)
+    return np.stack([k + 1000.0 * c for c in range(len(CANALES))])
+
+
+def _esperado(total, n):
+    return _muestras(total)[:, max(0, total - n):]
+
+
+@pytest.mark.parametrize("total", [0, 1, CAPACIDAD - 1, CAPACIDAD, CAPACIDAD + 1, 3 * CAPACIDAD + 2])
+def test_vuelta_del_buffer(total):
+    historial = HistorialCircular(CANALES, CAPACIDAD)
+    for columna in _muestras(total).T:
+        historial.agregar(columna)
+    assert len(historial) == min(total, CAPACIDAD)
+    assert historial.total == total
+    for n in (None, 1, 3, CAPACIDAD, 100):
+        esperado = _esperado(total, CAPACIDAD if n is None else min(n, CAPACIDAD))
+        for i, canal in enumerate(CANALES):
+            np.testing.assert_array_equal(historial.ultimos(canal, n), esperado[i])
+
+
+def test_vistas_contiguas_sin_copia():
+    historial = HistorialCircular(CANALES, CAPACIDAD)
+    for columna in _muestras(CAPACIDAD + 3).T:
+        historial.agregar(columna)
+    for vista in historial.columnas().values():
+        assert vista.flags.c_contiguous
+        assert np.shares_memory(vista, historial._datos)
+    # Una vista vieja no cambia de lugar: sigue en el buffer, no es una copia
+    vista = historial.ultimos("a")
+    historial.agregar(_muestras(1, desde=CAPACIDAD + 3)[:, 0])
+    assert np.shares_memory(vista, historial._datos)
+
+
+@pytest.mark.parametrize("bloques", [[3, 2, 1], [CAPACIDAD], [CAPACIDAD + 4], [5, 3 * CAPACIDAD, 2]])
+def test_bloques_igual_a_muestras(bloques):
+    por_bloque = HistorialCircular(CANALES, CAPACIDAD)
+    por_muestra = HistorialCircular(CANALES, CAPACIDAD)
+    desde = 0
+    for m in bloques:
+        columnas = _muestras(m, desde)
+        por_bloque.agregar_bloque(columnas)
+        for columna in columnas.T:
+            por_muestra.agregar(columna)
+        desde += m
+        por_bloque.agregar(_muestras(1, desde)[:, 0])
+        por_muestra.agregar(_muestras(1, desde)[:, 0])
+        desde += 1
+        for canal in CANALES:
+            np.testing.assert_array_equal(por_bloque.ultimos(canal), por_muestra.ultimos(canal))
+    assert por_bloque.total == por_muestra.total == desde
+
+
+def test_reiniciar():
+    historial = HistorialCircular(CANALES, CAPACIDAD)
+    historial.agregar_bloque(_muestras(10))
+    historial.reiniciar()
+    assert len(historial) == 0 and historial.total == 0
+    assert all(len(vista) == 0 for vista in historial.columnas().values())
+    historial.agregar(_muestras(1, desde=50)[:, 0])
+    np.testing.assert_array_equal(historial.ultimos("a"), [1050.0])
+
+
+def test_volcado_conserva_toda_la_corrida(tmp_path):
+    ruta = tmp_path / "historial.sltl"
+    historial = HistorialCircular(CANALES, CAPACIDAD, archivo=str(ruta), lote=3)
+    for columna in _muestras(11).T:
+        historial.agregar(columna)
+    historial.agregar_bloque(_muestras(20, desde=11))
+    historial.agregar(_muestras(1, desde=31)[:, 0])
+    historial.cerrar()
+    lector = LectorTelemetria(str(ruta))
+    assert len(lector) == 32
+    todo = lector.leer(0, 32)
+    for i, canal in enumerate(CANALES):
+        np.testing.assert_array_equal(todo[canal], _muestras(32)[i])
@@ -0,0 +1,92 @@
+"""
+Modelo lineal: las fórmulas cerradas (Jury, márgenes) contra barridos de fuerza bruta.
+"""
+import numpy as np
+import pytest
+
+from sonda_lambda import SondaLambdaSimulator, lineal
+
+N_ESCALON = 1500  # 30 s
+KP = np.linspace(0.05, 6.0, 18)
+KI = np.linspace(0.5, 20.0, 14)  # Con Ki = 0 el integrador deja un polo en z = 1
+
+
+@pytest.fixture(scope="module", params=["rica_pobre", "pobre_rica"])
+def modelo(request):
+    KP_, KI_ = np.meshgrid(KP, KI, indexing="ij")
+    return lineal.modelos(SondaLambdaSimulator(), KP_, KI_)[request.param]
+
+
+def _con_ganancias(modelo, kp, ki):
+    return lineal.ModeloLineal(kp, ki, modelo.scan_time_s, modelo.tau_s, modelo.ganancia_planta,
+                               modelo.ganancia_sensor, modelo.ganancia_aire)
+
+
+def test_polos_y_jury_contra_autovalores(modelo):
+    A, _, _, _ = modelo.matrices()
+    autovalores = np.linalg.eigvals(A)
+    radio = np.abs(autovalores).max(axis=-1)
+    np.testing.assert_allclose(modelo.radio_espectral(), radio, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(np.sort_complex(modelo.polos().reshape(-1, 2)),
+                               np.sort_complex(autovalores.reshape(-1, 2)), atol=1e-9)
+    # Lejos del borde, Jury y los autovalores coinciden
+    lejos = np.abs(radio - 1.0) > 1e-9
+    np.testing.assert_array_equal(modelo.estable()[lejos], (radio < 1.0)[lejos])
+    assert modelo.estable().any() and not modelo.estable().all()
+
+
+def test_margen_de_ganancia_contra_barrido(modelo):
+    k_limite = modelo.margenes()["margen_ganancia"]
+    factores = np.geomspace(0.01, 100.0, 2001)
+    for i, j in np.ndindex(k_limite.shape):
+        kp, ki = KP[i], KI[j]
+        estables = _con_ganancias(modelo, factores * kp, factores * ki).estable()
+        # Primer factor inestable del barrido (con ganancias positivas, estable por debajo del límite)
+        inestables = np.flatnonzero(~estables)
+        if not np.isfinite(k_limite[i, j]) or k_limite[i, j] > factores[-1]:
+            assert inestables.size == 0 or factores[inestables[0]] >= factores[-1]
+            continue
+        # El límite cae entre el último factor estable y el primero inestable del barrido
+        assert inestables[0] > 0 and np.all(estables[:inestables[0]])
+        assert factores[inestables[0] - 1] <= k_limite[i, j] * (1 + 1e-9)
+        assert factores[inestables[0]] >= k_limite[i, j] * (1 - 1e-9)
+        assert np.all(~estables[factores > k_limite[i, j] * (1 + 1e-9)])
+    # Estable si y solo si el margen es mayor que 1
+    np.testing.assert_array_equal(modelo.estable(), k_limite > 1.0)
+
+
+def test_margen_de_fase_contra_barrido(modelo):
+    margenes = modelo.margenes()
+    dt = modelo.scan_time_s
+    w = np.linspace(1e-6, np.pi, 50001)
+    z = np.exp(1j * w)
+    for i, j in np.ndindex(margenes["margen_fase_deg"].shape):
+        L = _con_ganancias(modelo, KP[i], KI[j]).abierto(z)
+        modulo = np.abs(L)
+        cruces = np.flatnonzero(np.diff(np.sign(modulo - 1.0)) != 0)
+        esperado = margenes["margen_fase_deg"][i, j]
+        if cruces.size == 0:
+            # Sin cruce: infinito con |L| < 1 en todo el rango, NaN con |L| > 1
+            assert (np.isinf(esperado) and modulo[-1] < 1.0) or (np.isnan(esperado) and modulo[-1] > 1.0)
+            continue
+        fases = np.mod(np.degrees(np.angle(L[cruces])), 360.0) - 180.0
+        assert esperado == pytest.approx(fases.min(), abs=0.05)
+        f_cruce = w[cruces[np.argmin(fases)]] / dt / (2.0 * np.pi)
+        assert margenes["frecuencia_cruce_ganancia_hz"][i, j] == pytest.approx(f_cruce, rel=1e-3, abs=1e-3)
+    # En esta grilla los inestables son los que tienen |L| > 1 en todas las frecuencias
+    np.testing.assert_array_equal(np.isnan(margenes["margen_fase_deg"]), ~modelo.estable())
+
+
+def test_respuesta_escalon_contra_matrices():
+    modelo = lineal.linealizar(SondaLambdaSimulator(), Kp=0.8, Ki=2.0)
+    A, B, C, D = modelo.matrices()
+    respuesta = modelo.respuesta_escalon(N_ESCALON, entrada="caudal_aire", amplitud=0.5)
+    x, w = np.zeros(2), np.array([0.0, 0.5])
+    for k in range(N_ESCALON):
+        y = C @ x + D @ w
+        for s, nombre in enumerate(lineal.SALIDAS):
+            assert respuesta[nombre][k] == pytest.approx(y[s], abs=1e-12)
+        x = A @ x + B @ w
+    # Estable y con acción integral: el error vuelve a cero
+    assert modelo.estable()
+    assert abs(respuesta["error"][-1]) < 1e-2 * np.abs(respuesta["error"]).max()
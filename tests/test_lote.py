@@ -0,0 +1,42 @@
+"""
+Simulador por lotes: equivalencia con SondaLambdaSimulator con una semilla para todo
+el lote (N=1) y con una semilla por instancia.
+"""
+import numpy as np
+import pytest
+
+from sonda_lambda import SondaLambdaBatchSimulator, SondaLambdaSimulator, semillas_por_instancia
+
+SEMILLA = 7
+N_SCANS = 3000  # Más de un bloque de ruido pregenerado por instancia
+
+
+def test_lote_de_una_instancia_igual_a_step():
+    sim = SondaLambdaSimulator(seed=SEMILLA)
+    for _ in range(N_SCANS):
+        sim.step()
+    referencia = sim.historial.columnas(N_SCANS)
+    lote = SondaLambdaBatchSimulator(1, seed=SEMILLA)
+    historial = lote.run(N_SCANS, canales=SondaLambdaBatchSimulator.CANALES)
+    np.testing.assert_array_equal(historial["time"], referencia["time"])
+    for canal in SondaLambdaBatchSimulator.CANALES:
+        np.testing.assert_array_equal(historial[canal][:, 0], referencia[canal], err_msg=canal)
+
+
+def test_semillas_por_instancia_reproducen_cada_simulador():
+    semillas = semillas_por_instancia(SEMILLA, 3)
+    parametros = {"Kp": [1.0, 3.0, 5.0], "pert_ruido_emi_v": [0.01, 0.02, 0.04]}
+    lote = SondaLambdaBatchSimulator(3, semillas=semillas, **parametros)
+    historial = lote.run(N_SCANS, canales=SondaLambdaBatchSimulator.CANALES)
+    for i, semilla in enumerate(semillas):
+        sim = SondaLambdaSimulator(seed=semilla, **{nombre: valores[i] for nombre, valores in parametros.items()})
+        columnas = sim.step_many(N_SCANS)
+        for canal in SondaLambdaBatchSimulator.CANALES:
+            np.testing.assert_array_equal(historial[canal][:, i], columnas[canal], err_msg=f"{canal} [{i}]")
+
+
+def test_semillas_invalidas():
+    with pytest.raises(ValueError):
+        SondaLambdaBatchSimulator(3, semillas=[1, 2])
+    with pytest.raises(ValueError):
+        SondaLambdaBatchSimulator(2, seed=1, semillas=[1, 2])
@@ -0,0 +1,50 @@
+"""
+Perfilado por etapas: con perfil activo el simulador da exactamente lo mismo que sin él.
+"""
+import numpy as np
+import pytest
+
+from sonda_lambda import SondaLambdaSimulator
+from sonda_lambda.perfil import ETAPAS_STEP, ETAPAS_STEP_MANY, Perfil, cubeta, limites_cubeta
+
+SEMILLA = 7
+N_SCANS = 3000
+
+
+def _columnas_por_scan(sim, n=N_SCANS):
+    for _ in range(n):
+        sim.step()
+    return sim.historial.columnas(n)
+
+
+@pytest.mark.parametrize("bloques", [False, True], ids=["step", "step_many"])
+def test_perfilado_igual_a_sin_perfil(bloques):
+    referencia = _columnas_por_scan(SondaLambdaSimulator(seed=SEMILLA))
+    sim = SondaLambdaSimulator(seed=SEMILLA)
+    sim.perfil = Perfil()
+    if bloques:
+        sim.step_many(N_SCANS)
+        columnas = sim.historial.columnas(N_SCANS)
+    else:
+        columnas = _columnas_por_scan(sim)
+    assert referencia.keys() == columnas.keys()
+    for canal in referencia:
+        np.testing.assert_array_equal(referencia[canal], columnas[canal], err_msg=canal)
+    assert sim.perfil.contadores["scans"] == N_SCANS
+    etapas = ETAPAS_STEP_MANY if bloques else ETAPAS_STEP
+    assert set(sim.perfil.resumen()) <= set(etapas)
+
+
+def test_cubetas_contienen_la_duracion():
+    for ns in [0, 1, 7, 8, 9, 100, 12345, 10 ** 9, 2 ** 40 + 3]:
+        inferior, superior = limites_cubeta(cubeta(ns))
+        assert inferior <= ns < superior or (ns == 0 and inferior == 0)
+
+
+def test_percentiles_aproximados():
+    perfil = Perfil()
+    for ns in range(1000, 101000, 100):
+        perfil.registrar("etapa", ns)
+    assert perfil.percentil("etapa", 50) == pytest.approx(50500, rel=0.12)
+    assert perfil.percentil("etapa", 99) == pytest.approx(99500, rel=0.12)
+    assert perfil.percentil("etapa", 100) <= perfil.maximos["etapa"] == 100900
@@ -0,0 +1,211 @@
+"""
+Servidor de telemetría: comandos, y clientes reales por TCP contra 127.0.0.1:0.
+"""
+import asyncio
+import json
+import socket
+
+import numpy as np
+
+from sonda_lambda import SondaLambdaSimulator, servidor as modulo
+from sonda_lambda.servidor import (HOLA, MUESTRAS, RESPUESTA, ServidorTelemetria, decodificar_muestras,
+                                   leer_frame)
+
+SEMILLA = 7
+
+
+def _servidor(**opciones):
+    # Más rápido que el reloj: cada prueba dura alrededor de un segundo
+    opciones = {"velocidad": 50.0, "periodo_s": 0.005, **opciones}
+    return ServidorTelemetria(SondaLambdaSimulator(seed=SEMILLA), puerto=0, **opciones)
+
+
+async def _conectar(servidor):
+    reader, writer = await asyncio.open_connection("127.0.0.1", servidor.puerto)
+    tipo, datos = await leer_frame(reader)
+    assert tipo == HOLA
+    return reader, writer, json.loads(datos)
+
+
+async def _comando(reader, writer, comando):
+    """ Envía un comando y devuelve su respuesta, salteando los frames de muestras """
+    writer.write((json.dumps(comando) + "\n").encode("utf-8"))
+    await writer.drain()
+    while True:
+        tipo, datos = await leer_frame(reader)
+        if tipo == RESPUESTA:
+            return json.loads(datos)
+
+
+def _correr(prueba, servidor):
+    async def principal():
+        await servidor.iniciar()
+        corrida = asyncio.create_task(servidor.correr())
+        try:
+            return await prueba()
+        finally:
+            servidor.detener()
+            await corrida
+    return asyncio.run(asyncio.wait_for(principal(), 30))
+
+
+def test_hola():
+    servidor = _servidor()
+
+    async def prueba():
+        _, writer, hola = await _conectar(servidor)
+        writer.close()
+        return hola
+
+    hola = _correr(prueba, servidor)
+    assert hola["canales"] == list(servidor.canales)
+    assert "time" not in hola["canales"]
+    assert hola["scan_time_s"] == servidor.sim.scan_time_s
+    assert hola["parametros"] == json.loads(json.dumps(servidor.sim.parametros()))
+
+
+def test_muestras_decimadas():
+    servidor = _servidor()
+    paso = 5
+
+    async def prueba():
+        reader, writer, hola = await _conectar(servidor)
+        assert (await _comando(reader, writer, {"comando": "decimacion", "paso": paso}))["ok"]
+        muestras, tiempos = {}, {}
+        while len(muestras) < 500:
+            tipo, datos = await leer_frame(reader)
+            if tipo != MUESTRAS:
+                continue
+            primero, paso_frame, t, valores = decodificar_muestras(datos, len(hola["canales"]))
+            if paso_frame != paso:
+                continue  # Frames encolados antes del comando
+            assert primero % paso == 0
+            tiempos[primero] = t
+            for i in range(valores.shape[1]):
+                muestras[primero + i * paso] = valores[:, i]
+        writer.close()
+        return hola["canales"], muestras, tiempos
+
+    canales, muestras, tiempos = _correr(prueba, servidor)
+    # Las muestras son las de la misma corrida sin servidor, como float32
+    scans = sorted(muestras)
+    assert np.all(np.diff(scans) == paso)
+    referencia = SondaLambdaSimulator(seed=SEMILLA).step_many(scans[-1] + 1)
+    esperadas = np.array([referencia[canal][scans] for canal in canales], dtype="<f4")
+    np.testing.assert_array_equal(np.array([muestras[k] for k in scans]).T, esperadas)
+    for primero, t in tiempos.items():
+        assert t == referencia["time"][primero]
+
+
+def test_comandos():
+    servidor = _servidor()
+    sim = servidor.sim
+    originales = (sim.Kp, sim.Ki, sim.setpoint_v)
+
+    async def prueba():
+        reader, writer, _ = await _conectar(servidor)
+        respuestas = [
+            await _comando(reader, writer, {"comando": "perturbacion", "amplitud": 2.5, "inicio": 3,
+                                            "duracion": 4}),
+            await _comando(reader, writer, {"comando": "controlador", "kp": 3, "ki": 6, "setpoint": 0.5}),
+            await _comando(reader, writer, {"comando": "controlador", "kp": originales[0],
+                                            "ki": originales[1], "setpoint": originales[2]}),
+            await _comando(reader, writer, {"comando": "estadisticas"}),
+        ]
+        writer.close()
+        return respuestas
+
+    perturbacion, controlador, restaurado, estadisticas = _correr(prueba, servidor)
+    assert all(r["ok"] for r in (perturbacion, controlador, restaurado, estadisticas))
+    assert (sim.perturbacion_amplitud, sim.perturbacion_inicio, sim.perturbacion_duracion) == (2.5, 3.0, 4.0)
+    assert controlador["parametros"] != restaurado["parametros"]
+    assert (sim.Kp, sim.Ki, sim.setpoint_v) == originales
+    assert "estadisticas" in estadisticas
+
+
+def test_comandos_invalidos():
+    servidor = _servidor()
+
+    async def prueba():
+        reader, writer, _ = await _conectar(servidor)
+        respuestas = []
+        for linea in (b"no es json\n", b"[1, 2]\n", b'{"comando": "volar"}\n',
+                      b'{"comando": "controlador", "kp": 3}\n', b'{"comando": "decimacion", "paso": 0}\n',
+                      b'{"comando": "politica", "politica": "ignorar"}\n'):
+            writer.write(linea)
+            await writer.drain()
+            while True:
+                tipo, datos = await leer_frame(reader)
+                if tipo == RESPUESTA:
+                    respuestas.append(json.loads(datos))
+                    break
+        # El cliente sigue conectado después de los errores
+        respuestas.append(await _comando(reader, writer, {"comando": "parametros"}))
+        writer.close()
+        return respuestas
+
+    *errores, parametros = _correr(prueba, servidor)
+    assert not any(r["ok"] for r in errores)
+    assert all(r["error"] for r in errores)
+    assert "Falta el campo" in errores[3]["error"]
+    assert parametros["ok"]
+
+
+def test_perturbacion_invalida_no_cambia_nada():
+    servidor = _servidor()
+    sim = servidor.sim
+    antes = (sim.perturbacion_amplitud, sim.perturbacion_inicio, sim.perturbacion_duracion)
+    for comando in ({"amplitud": 3.0, "inicio": 1.0, "duracion": -1.0},
+                    {"amplitud": 3.0, "inicio": 1.0, "duracion": "x"},
+                    {"amplitud": float("nan"), "inicio": 1.0, "duracion": 2.0}):
+        respuesta = servidor._comando(None, json.dumps({"comando": "perturbacion", **comando}))
+        assert not respuesta["ok"]
+        assert (sim.perturbacion_amplitud, sim.perturbacion_inicio, sim.perturbacion_duracion) == antes
+
+
+def _cliente_lento(servidor, politica, monkeypatch):
+    """ Un cliente que nunca lee, con buffers chicos: su cola se llena enseguida """
+    monkeypatch.setattr(modulo, "COLA_FRAMES", 4)
+    monkeypatch.setattr(modulo, "LIMITE_ESCRITURA", 1024)
+
+    async def prueba():
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        sock.setblocking(False)
+        await asyncio.get_running_loop().sock_connect(sock, ("127.0.0.1", servidor.puerto))
+        _, writer = await asyncio.open_connection(sock=sock)
+        while not servidor.clientes:
+            await asyncio.sleep(0.001)
+        cliente = next(iter(servidor.clientes))
+        writer.write((json.dumps({"comando": "politica", "politica": politica}) + "\n").encode("utf-8"))
+        await writer.drain()
+        # Mientras tanto otro cliente, que sí lee, sigue recibiendo
+        reader_rapido, writer_rapido, _ = await _conectar(servidor)
+        recibidos = 0
+        while not cliente.descartados:
+            tipo, _ = await leer_frame(reader_rapido)
+            recibidos += tipo == MUESTRAS
+        for _ in range(20):
+            tipo, _ = await leer_frame(reader_rapido)
+            recibidos += tipo == MUESTRAS
+        writer_rapido.close()
+        writer.close()
+        return cliente, recibidos
+
+    return _correr(prueba, servidor)
+
+
+def test_cliente_lento_descarta_viejos(monkeypatch):
+    servidor = _servidor(velocidad=2000.0)
+    cliente, recibidos = _cliente_lento(servidor, "descartar_viejos", monkeypatch)
+    assert recibidos > 0
+    assert cliente.descartados > 0
+    assert cliente.cola.qsize() <= 4
+
+
+def test_cliente_lento_desconectado(monkeypatch):
+    servidor = _servidor(velocidad=2000.0)
+    cliente, recibidos = _cliente_lento(servidor, "desconectar", monkeypatch)
+    assert recibidos > 0
+    assert cliente.descartados == 1
+    assert cliente not in servidor.clientes
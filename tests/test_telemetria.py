@@ -0,0 +1,80 @@
+"""
+Telemetría en disco: ida y vuelta por chunks, y lectura de una corrida que no se cerró.
+"""
+import numpy as np
+import pytest
+
+from sonda_lambda.telemetria import MUESTRAS_POR_RESUMEN, EscritorTelemetria, LectorTelemetria
+
+CANALES = ("time", "lambda", "error")
+POR_CHUNK = 2 * MUESTRAS_POR_RESUMEN
+
+
+def _columnas(n, desde=0):
+    k = np.arange(desde, desde + n, dtype=float)
+    return np.stack([0.02 * k, 1.0 + 0.01 * np.sin(k), np.cos(k)])
+
+
+def _escribir(ruta, n, cerrar=True):
+    escritor = EscritorTelemetria(str(ruta), CANALES, muestras_por_chunk=POR_CHUNK, metadatos={"seed": 7})
+    datos = _columnas(n)
+    # Mezcla de muestras sueltas y bloques que cruzan chunks
+    for columna in datos[:, :10].T:
+        escritor.agregar(columna)
+    escritor.agregar_bloque(datos[:, 10:n - 5])
+    for columna in datos[:, n - 5:].T:
+        escritor.agregar(columna)
+    if cerrar:
+        escritor.cerrar()
+    else:
+        escritor._archivo.flush()
+    return escritor, datos
+
+
+def test_ida_y_vuelta(tmp_path):
+    n = 3 * POR_CHUNK + 100
+    _, datos = _escribir(tmp_path / "corrida.sltl", n)
+    lector = LectorTelemetria(str(tmp_path / "corrida.sltl"))
+    assert lector.canales == CANALES
+    assert lector.metadatos == {"seed": 7}
+    assert len(lector) == n
+    todo = lector.leer(0, n)
+    for i, canal in enumerate(CANALES):
+        np.testing.assert_array_equal(todo[canal], datos[i])
+        np.testing.assert_array_equal(lector.minimos(canal),
+                                      [datos[i, k:k + POR_CHUNK].min() for k in range(0, n, POR_CHUNK)])
+        np.testing.assert_array_equal(lector.maximos(canal),
+                                      [datos[i, k:k + POR_CHUNK].max() for k in range(0, n, POR_CHUNK)])
+    # Rangos dentro de un chunk (vistas del memory-map) y entre chunks
+    for inicio, fin in [(5, 17), (POR_CHUNK - 3, 2 * POR_CHUNK + 4), (n - 1, n + 10)]:
+        np.testing.assert_array_equal(lector.leer(inicio, fin, ["error"])["error"], datos[2, inicio:fin])
+    tramo = lector.rango(datos[0, 600], datos[0, 900])
+    np.testing.assert_array_equal(tramo["time"], datos[0, 600:901])
+
+
+def test_archivo_sin_cerrar(tmp_path):
+    ruta = tmp_path / "cortada.sltl"
+    n = 2 * POR_CHUNK + 37
+    escritor, datos = _escribir(ruta, n, cerrar=False)
+    try:
+        lector = LectorTelemetria(str(ruta))
+        # Solo llegaron a disco los chunks completos; el índice se reconstruye de los datos
+        assert len(lector) == 2 * POR_CHUNK
+        assert lector.resumen.shape == (2, 2, len(CANALES), POR_CHUNK // MUESTRAS_POR_RESUMEN)
+        for i, canal in enumerate(CANALES):
+            np.testing.assert_array_equal(lector.leer(0, n)[canal], datos[i, :2 * POR_CHUNK])
+            assert lector.maximos(canal)[1] == datos[i, POR_CHUNK:2 * POR_CHUNK].max()
+        # Cortada a mitad de un chunk: ese chunk se ignora
+        cortada = tmp_path / "a_medias.sltl"
+        cortada.write_bytes(ruta.read_bytes()[:-100])
+        assert len(LectorTelemetria(str(cortada))) == POR_CHUNK
+    finally:
+        escritor.cerrar()
+    assert len(LectorTelemetria(str(ruta))) == n
+
+
+def test_archivo_ajeno(tmp_path):
+    ruta = tmp_path / "otro.bin"
+    ruta.write_bytes(b"no es telemetria" * 10)
+    with pytest.raises(ValueError):
+        LectorTelemetria(str(ruta))
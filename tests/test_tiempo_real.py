@@ -0,0 +1,82 @@
+"""
+Ejecución en tiempo real con un reloj simulado: scans saltados al atrasarse y voltaje externo.
+"""
+import socket
+
+import numpy as np
+import pytest
+
+from sonda_lambda import SondaLambdaSimulator, tiempo_real
+from sonda_lambda.tiempo_real import MENSAJE_ENTRADA, EjecutorTiempoReal
+
+DT_NS = 20_000_000
+
+
+class _Reloj:
+    """ Reloj monotónico simulado: solo avanza con sleep() y con las demoras de los scans """
+
+    def __init__(self):
+        self.ns = 0
+
+    def monotonic_ns(self):
+        return self.ns
+
+    def sleep(self, segundos):
+        self.ns += int(segundos * 1e9)
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = _Reloj()
+    monkeypatch.setattr(tiempo_real.time, "monotonic_ns", reloj.monotonic_ns)
+    monkeypatch.setattr(tiempo_real.time, "sleep", reloj.sleep)
+    return reloj
+
+
+def _con_demora(sim, reloj, demoras):
+    """ step() que adelanta el reloj: demoras[i] scans de reloj en el scan i """
+    step = sim.step
+    scans = []
+
+    def demorado(*args):
+        scans.append(len(scans))
+        reloj.ns += int(demoras.get(len(scans) - 1, 0) * DT_NS)
+        return step(*args)
+    sim.step = demorado
+    return sim
+
+
+@pytest.mark.parametrize("politica, saltados", [("recuperar", 24 - 10), ("saltar", 24)])
+def test_scans_saltados(reloj, politica, saltados):
+    # El primer scan se traba 25.5 períodos: al terminar hay 24 liberaciones vencidas
+    sim = _con_demora(SondaLambdaSimulator(seed=7), reloj, {0: 25.5})
+    ejecutor = EjecutorTiempoReal(sim, politica=politica, espera_activa_us=0, max_recuperar=10)
+    ejecutor.correr(n_scans=40)
+    resumen = ejecutor.resumen()
+    assert resumen["saltados"] == saltados
+    assert resumen["scans"] == 40
+    # Al final todos los scans salen en su liberación
+    assert reloj.ns == (40 - 1 + saltados) * DT_NS
+
+
+def test_voltaje_externo_en_el_historial(reloj):
+    entrada, remitente = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    entrada.setblocking(False)
+    sim = SondaLambdaSimulator(seed=7)
+    ejecutor = EjecutorTiempoReal(sim, entrada=entrada, espera_activa_us=0)
+    try:
+        ejecutor.correr(n_scans=5)
+        remitente.send(MENSAJE_ENTRADA.pack(1, 0.8))
+        ejecutor.correr(n_scans=5)
+    finally:
+        ejecutor.cerrar()
+        remitente.close()
+    columnas = sim.historial.columnas(10)
+    assert not np.any(columnas["voltaje_sonda"][:5] == 0.8)
+    np.testing.assert_array_equal(columnas["voltaje_sonda"][5:], 0.8)
+    # El controlador la usa en el scan siguiente
+    np.testing.assert_allclose(columnas["error"][6:], sim.setpoint_v - 0.8)
+    # Misma secuencia aleatoria que sin entrada externa: el lambda de los primeros scans coincide
+    referencia = SondaLambdaSimulator(seed=7)
+    referencia.step_many(6)
+    np.testing.assert_array_equal(columnas["lambda"][:6], referencia.historial.ultimos("lambda"))